@@ -0,0 +1,59 @@
+"""
+Backtest throughput: bars replayed per minute by one moving average cross run (with protective stops,
+so resting orders are scanned too), and wall time of a parameter sweep at several pool sizes. Bars are a
+synthetic 1m random walk written as a memory-mapped .npy.
+
+    python benchmarks/bench_backtest.py --bars 5000000 --runs 8 --processes 1,2,4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bot.backtest import Bars, MovingAverageCross, load_bars, param_grid, run_backtest, sweep
+
+
+def random_walk(n, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n)))
+    return Bars.from_arrays(1.7e12 + np.arange(n) * 60000.0, open_, high, low, close)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, default=5000000)
+    parser.add_argument('--runs', type=int, default=8, help='Sweep size.')
+    parser.add_argument('--processes', default='1,2,4', help='Pool sizes to time the sweep with.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bars.npy')
+        random_walk(args.bars).save(path)
+        bars = load_bars(path)
+
+        for params in ({'fast': 20, 'slow': 100}, {'fast': 20, 'slow': 100, 'stop_pct': 0.5}):
+            start = time.perf_counter()
+            client = run_backtest(MovingAverageCross(**params), bars, 'BTCUSDT')
+            elapsed = time.perf_counter() - start
+            print(f"{str(params):<45} {elapsed:6.2f}s  {len(bars) / elapsed * 60 / 1e6:7.1f}M bars/min  "
+                  f"orders={len(client.orders)}")
+
+        runs = param_grid({'fast': [10, 20, 30, 40], 'slow': [100, 200, 300, 400]})[:args.runs]
+        for processes in (int(p) for p in args.processes.split(',')):
+            start = time.perf_counter()
+            sweep(path, 'BTCUSDT', MovingAverageCross, runs, processes=processes)
+            elapsed = time.perf_counter() - start
+            print(f"sweep of {len(runs)} with {processes} process(es): {elapsed:6.2f}s  "
+                  f"{len(runs) * len(bars) / elapsed * 60 / 1e6:7.1f}M bars/min total")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Compares the original connect-per-call database functions with the pooled WAL connection layer
+in bot.database. Each worker process stands in for a uvicorn worker and runs several threads
+(its request threadpool) that insert orders and read history/settings concurrently.
+
+    python benchmarks/bench_db.py --workers 4 --threads 4 --ops 2000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import database
+
+ORDER = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.002, 'price': None}
+RESPONSE = {'orderId': 1, 'status': 'NEW', 'executedQty': '0.000', 'avgPrice': '0.00'}
+
+
+class LegacyDatabase:
+    """
+    The connect/execute/commit/close implementation bot.database used before connection pooling.
+    """
+    def log_order(self, order_data, response):
+        conn = sqlite3.connect(database.DB_FILE, timeout=30)
+        c = conn.cursor()
+        c.execute(database.INSERT_ORDER_SQL,
+                  (datetime.now().isoformat(), order_data['symbol'], order_data['side'], order_data['type'],
+                   order_data['quantity'], order_data.get('price'), response.get('status', 'UNKNOWN'),
+                   str(response.get('orderId', '')), json.dumps(response)))
+        conn.commit()
+        conn.close()
+
+    def get_history(self, limit=database.HISTORY_PAGE_SIZE):
+        conn = sqlite3.connect(database.DB_FILE, timeout=30)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM orders ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_setting(self, key):
+        conn = sqlite3.connect(database.DB_FILE, timeout=30)
+        row = conn.execute(database.GET_SETTING_SQL, (key,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+
+def _backend(name):
+    return LegacyDatabase() if name == 'legacy' else database
+
+
+def _worker(backend_name, db_file, mode, threads, ops, results):
+    database.DB_FILE = db_file
+    backend = _backend(backend_name)
+
+    def run():
+        for _ in range(ops):
+            if mode == 'insert':
+                backend.log_order(ORDER, RESPONSE)
+            else:
+                # What a dashboard request reads: one history page plus the two settings lookups
+                backend.get_history()
+                backend.get_setting('BINANCE_API_KEY')
+                backend.get_setting('BINANCE_API_SECRET')
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(threads * ops)
+
+
+def run_case(backend_name, mode, workers, threads, ops, db_file):
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_worker, args=(backend_name, db_file, mode, threads, ops, results))
+             for _ in range(workers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    total = sum(results.get() for _ in procs)
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='Processes, one per simulated uvicorn worker.')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker.')
+    parser.add_argument('--ops', type=int, default=500, help='Operations per thread.')
+    parser.add_argument('--seed-rows', type=int, default=10000, help='Orders inserted before the read test.')
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} threads={args.threads} ops/thread={args.ops}")
+    print(f"{'backend':<10}{'inserts/sec':>14}{'reads/sec':>14}")
+    for backend_name in ('legacy', 'pooled'):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = os.path.join(tmp, 'bench.db')
+            database.DB_FILE = db_file
+            database.init_db()
+            database.close_connections()
+            if backend_name == 'legacy':
+                # Start from the rollback journal the legacy code ran with
+                conn = sqlite3.connect(db_file)
+                conn.execute("PRAGMA journal_mode=DELETE")
+                conn.close()
+
+            inserts = run_case(backend_name, 'insert', args.workers, args.threads, args.ops, db_file)
+
+            conn = sqlite3.connect(db_file)
+            conn.executemany(database.INSERT_ORDER_SQL,
+                             [(datetime.now().isoformat(), 'BTCUSDT', 'BUY', 'MARKET', 0.002, None, 'NEW', '1', '{}')]
+                             * args.seed_rows)
+            conn.commit()
+            conn.close()
+
+            reads = run_case(backend_name, 'read', args.workers, args.threads, args.ops, db_file)
+        print(f"{backend_name:<10}{inserts:>14.0f}{reads:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
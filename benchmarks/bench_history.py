@@ -0,0 +1,127 @@
+"""
+History query and render cost on a large orders table: the old layout (raw response as a JSON
+details column, re-parsed per row on render) against typed columns with a compressed raw payload.
+Builds a legacy database, times the one-off migration, then compares both.
+
+    python benchmarks/bench_history.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from jinja2 import Environment, FileSystemLoader
+
+from bot import database
+
+LEGACY_SCHEMA = ("CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, symbol TEXT, side TEXT, "
+                 "type TEXT, quantity REAL, price REAL, status TEXT, order_id TEXT, details TEXT)")
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT', 'XRPUSDT']
+STATUSES = ['NEW', 'FILLED', 'FILLED', 'FILLED', 'CANCELED', 'PARTIALLY_FILLED']
+
+
+def fake_order(n, rng):
+    symbol = rng.choice(SYMBOLS)
+    side = rng.choice(['BUY', 'SELL'])
+    order_type = rng.choice(['MARKET', 'LIMIT'])
+    status = rng.choice(STATUSES)
+    qty = round(rng.uniform(0.001, 2), 3)
+    price = round(rng.uniform(100, 70000), 2)
+    response = {
+        'orderId': 4000000000 + n, 'symbol': symbol, 'status': status, 'clientOrderId': f"x-{n:024x}",
+        'price': str(price if order_type == 'LIMIT' else 0), 'avgPrice': str(price if status != 'NEW' else '0.00'),
+        'origQty': str(qty), 'executedQty': str(qty if status == 'FILLED' else 0), 'cumQty': '0', 'cumQuote': '0.00000',
+        'timeInForce': 'GTC', 'type': order_type, 'reduceOnly': False, 'closePosition': False, 'side': side,
+        'positionSide': 'BOTH', 'stopPrice': '0', 'workingType': 'CONTRACT_PRICE', 'priceProtect': False,
+        'origType': order_type, 'priceMatch': 'NONE', 'selfTradePreventionMode': 'EXPIRE_MAKER', 'goodTillDate': 0,
+        'updateTime': 1760000000000 + n * 1000,
+    }
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(1760000000 + n))
+    return (timestamp, symbol, side, order_type, qty, price if order_type == 'LIMIT' else None, status,
+            str(response['orderId']), json.dumps(response))
+
+
+def build_legacy(path, rows):
+    rng = random.Random(7)
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    for index in ("symbol, id", "side, id", "status, id"):
+        conn.execute(f"CREATE INDEX idx_orders_{index.split(',')[0]} ON orders ({index})")
+    chunk = 50000
+    for start in range(0, rows, chunk):
+        conn.executemany("INSERT INTO orders (timestamp, symbol, side, type, quantity, price, status, order_id, details) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [fake_order(n, rng) for n in range(start, min(rows, start + chunk))])
+        conn.commit()
+    conn.close()
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    template = Environment(loader=FileSystemLoader(os.path.join(ROOT, 'templates'))).get_template('index.html')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        start = time.perf_counter()
+        build_legacy(legacy_path, args.rows)
+        print(f"built {args.rows} legacy rows in {time.perf_counter() - start:.1f}s")
+
+        typed_path = os.path.join(tmp, 'typed.db')
+        shutil.copy(legacy_path, typed_path)
+        database.DB_FILE = typed_path
+        start = time.perf_counter()
+        database.init_db()
+        print(f"migration (backfill + compress + drop details): {time.perf_counter() - start:.1f}s")
+        database.get_connection().execute("VACUUM")
+        legacy = sqlite3.connect(legacy_path)
+        legacy.row_factory = sqlite3.Row
+        middle = args.rows // 2
+
+        def legacy_page(where="", params=()):
+            rows = legacy.execute(f"SELECT * FROM orders {where} ORDER BY id DESC LIMIT 50", params).fetchall()
+            # What the from_json filter did for every row on every render
+            return [dict(row, parsed=json.loads(row['details'])) for row in rows]
+
+        def render(rows):
+            return template.render(history=rows, next_cursor=rows[-1]['id'], api_key='', has_secret=False)
+
+        cases = [
+            ("first page", lambda: legacy_page(), lambda: database.get_history(limit=50)),
+            ("deep page", lambda: legacy_page("WHERE id < ?", (middle,)),
+             lambda: database.get_history(limit=50, before_id=middle)),
+            ("symbol+status", lambda: legacy_page("WHERE symbol = ? AND status = ?", ('ETHUSDT', 'FILLED')),
+             lambda: database.get_history(limit=50, symbol='ETHUSDT', status='FILLED')),
+            ("page + render", lambda: render(legacy_page()), lambda: render(database.get_history(limit=50))),
+        ]
+        print(f"{'':<16}{'legacy ms':>12}{'typed ms':>12}")
+        for name, old, new in cases:
+            print(f"{name:<16}{timed(old, args.repeat):12.3f}{timed(new, args.repeat):12.3f}")
+
+        legacy.close()
+        database.close_connections()
+        print(f"{'file size MB':<16}{os.path.getsize(legacy_path) / 1e6:12.1f}{os.path.getsize(typed_path) / 1e6:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-order logging cost on the calling thread: the old setup (handlers writing synchronously, three
+eager f-string INFO lines including the full response dict) against the queued setup with lazy
+%-style messages, where only one summary line is at INFO.
+
+    python benchmarks/bench_logging.py --orders 20000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import logging_config
+
+PARAMS = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.002, 'price': 60000.0, 'timeInForce': 'GTC'}
+RESPONSE = {'orderId': 4061234567, 'symbol': 'BTCUSDT', 'status': 'NEW', 'clientOrderId': 'x-Cb7ytekJ7d5c2f0e1a9b',
+            'price': '60000.00', 'avgPrice': '0.00', 'origQty': '0.002', 'executedQty': '0', 'cumQty': '0',
+            'cumQuote': '0.00000', 'timeInForce': 'GTC', 'type': 'LIMIT', 'reduceOnly': False, 'closePosition': False,
+            'side': 'BUY', 'positionSide': 'BOTH', 'stopPrice': '0', 'workingType': 'CONTRACT_PRICE',
+            'priceProtect': False, 'origType': 'LIMIT', 'updateTime': 1760000000000}
+
+
+def legacy_order(logger):
+    symbol, side, order_type, quantity, price, stop_price = 'BTCUSDT', 'BUY', 'LIMIT', 0.002, 60000.0, None
+    logger.info(f"Placing order: Symbol={symbol}, Side={side}, Type={order_type}, Qty={quantity}, Price={price}, StopPrice={stop_price}")
+    logger.info(f"Sending params to Binance: {PARAMS}")
+    logger.info(f"Order placed successfully: {RESPONSE}")
+
+
+def queued_order(logger):
+    symbol, side, order_type, quantity, price, stop_price = 'BTCUSDT', 'BUY', 'LIMIT', 0.002, 60000.0, None
+    logger.debug("Sending params to Binance: %s", PARAMS)
+    logger.info("Order placed: %s %s %s qty=%s price=%s stop=%s -> id=%s status=%s", symbol, side, order_type,
+                quantity, price, stop_price, RESPONSE.get('orderId'), RESPONSE.get('status'))
+    logger.debug("Order response: %s", RESPONSE)
+
+
+def measure(name, func, logger, orders, drain=None):
+    samples = []
+    start = time.perf_counter()
+    for _ in range(orders):
+        t = time.perf_counter()
+        func(logger)
+        samples.append(time.perf_counter() - t)
+    caller = time.perf_counter() - start
+    if drain:
+        drain()
+    total = time.perf_counter() - start
+    samples.sort()
+    print(f"{name:<16} mean={statistics.fmean(samples) * 1e6:7.1f}us  p50={samples[len(samples) // 2] * 1e6:7.1f}us  "
+          f"p99={samples[int(len(samples) * 0.99)] * 1e6:8.1f}us  caller={caller:.2f}s  until written={total:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, 'w')
+    stderr, sys.stderr = sys.stderr, devnull
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # The old setup_logging, with the console silenced
+            legacy = logging.getLogger("bench_legacy")
+            legacy.setLevel(logging.INFO)
+            legacy.propagate = False
+            console = logging.StreamHandler(devnull)
+            console.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+            file_handler = RotatingFileHandler(os.path.join(tmp, 'legacy.log'), maxBytes=10*1024*1024, backupCount=5)
+            file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            legacy.addHandler(console)
+            legacy.addHandler(file_handler)
+            measure("sync f-string", legacy_order, legacy, args.orders)
+            file_handler.close()
+
+            for log_format in ("text", "json"):
+                logging_config.setup_logging(os.path.join(tmp, f'queued.{log_format}.log'), log_format=log_format)
+                logging.getLogger("trading_bot").propagate = False
+                measure(f"queued {log_format}", queued_order, logging.getLogger("trading_bot.client"), args.orders,
+                        drain=logging_config.shutdown_logging)
+    finally:
+        sys.stderr = stderr
+        devnull.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Order logging latency as seen by a request handler: the old inline path (one INSERT and commit
+per order on a single writer thread) against the write-behind journal + batched writer.
+
+    python benchmarks/bench_order_log.py --orders 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import database
+
+ORDER = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.002}
+RESPONSE = {'orderId': 1, 'status': 'FILLED', 'executedQty': '0.002', 'avgPrice': '60000.0', 'updateTime': 0}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(log, total, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await log(ORDER, RESPONSE)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, elapsed, latencies):
+    print(f"{name:<14} {len(latencies) / elapsed:9.0f} orders/s   "
+          f"p50={statistics.median(latencies) * 1000:6.2f}ms  p99={percentile(latencies, 99) * 1000:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, 'bench.db')
+        database.init_db()
+        inline_executor = ThreadPoolExecutor(max_workers=1)
+
+        async def inline(order_data, response):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(inline_executor, database.log_order, order_data, response)
+
+        report("inline", *asyncio.run(run(inline, args.orders, args.concurrency)))
+        report("write-behind", *asyncio.run(run(database.log_order_async, args.orders, args.concurrency)))
+        metrics = database.get_order_writer().metrics()
+        database.close_order_writer()
+        print(f"writer: {metrics['batches']} batches, avg {metrics['avg_batch_size']} rows, "
+              f"journal fsync={'on' if database.ORDER_JOURNAL_FSYNC else 'off'}")
+        database.close_connections()
+
+
+if __name__ == '__main__':
+    main()
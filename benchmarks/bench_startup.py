@@ -0,0 +1,74 @@
+"""
+Wall time of whole `cli.py` invocations against a local mock exchange: --help, an order run in-process
+(imports python-binance, connects, fetches exchange info) and the same order forwarded to `cli.py daemon`.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from bot.daemon import request, DaemonUnavailable
+from bot.mock_exchange import MockExchange
+
+ORDER = ['--symbol', 'BTCUSDT', '--side', 'BUY', '--type', 'MARKET', '--quantity', '0.002']
+
+
+def run(args, env, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(cwd, 'cli.py')] + args, env=env, cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def report(name, samples):
+    print(f"{name:<22} median={statistics.median(samples) * 1000:8.1f}ms  min={min(samples) * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, MockExchange() as exchange:
+        # A copy of the CLI without data/, so the run doesn't touch the real order log
+        shutil.copy(os.path.join(ROOT, 'cli.py'), tmp)
+        shutil.copytree(os.path.join(ROOT, 'bot'), os.path.join(tmp, 'bot'))
+        socket_path = os.path.join(tmp, 'bot.sock')
+        env = dict(os.environ, BINANCE_FUTURES_URL=exchange.url, BINANCE_API_KEY='bench', BINANCE_API_SECRET='bench',
+                   TRADING_BOT_SOCKET=socket_path)
+
+        report("--help", [run(['--help'], env, tmp) for _ in range(args.runs)])
+        report("order (in-process)", [run(ORDER, env, tmp) for _ in range(args.runs)])
+
+        daemon = subprocess.Popen([sys.executable, 'cli.py', 'daemon'], env=env, cwd=tmp,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    request("ping", socket_path)
+                    break
+                except DaemonUnavailable:
+                    if time.time() > deadline or daemon.poll() is not None:
+                        raise SystemExit("daemon did not start")
+                    time.sleep(0.1)
+            report("order (via daemon)", [run(ORDER, env, tmp) for _ in range(args.runs)])
+            request("stop", socket_path)
+            daemon.wait(10)
+        finally:
+            if daemon.poll() is None:
+                daemon.kill()
+        print(f"mock exchange received {len(exchange.orders)} orders (expected {args.runs * 2})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Per-tick cost of the client-side trigger engine with many resting triggers, against checking every
+trigger on every tick. Triggers are spread over symbols as stops, take-profits and trailing stops;
+ticks are small random moves, so each one fires only a few.
+
+    python benchmarks/bench_triggers.py --triggers 50000 --symbols 50 --ticks 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.triggers import TriggerEngine
+
+
+class NullClient:
+    def place_order(self, symbol, side, order_type, quantity):
+        return {'orderId': 0}
+
+
+def naive_tick(triggers, symbol, price):
+    fired = []
+    for trigger in triggers[symbol]:
+        if trigger['done']:
+            continue
+        if trigger['kind'] == 'TRAILING_STOP':
+            trigger['peak'] = max(trigger['peak'], price)
+            hit = price <= trigger['peak'] * (1 - trigger['rate'])
+        elif trigger['kind'] == 'STOP':
+            hit = price <= trigger['level']
+        else:
+            hit = price >= trigger['level']
+        if hit:
+            trigger['done'] = True
+            fired.append(trigger)
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--triggers', type=int, default=50000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--ticks', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    symbols = [f"SYM{n}USDT" for n in range(args.symbols)]
+    engine = TriggerEngine(NullClient())
+    naive = {symbol: [] for symbol in symbols}
+    for symbol in symbols:
+        engine.on_price(symbol, 100.0)
+
+    start = time.perf_counter()
+    for _ in range(args.triggers):
+        symbol, roll = rng.choice(symbols), rng.random()
+        if roll < 0.4:
+            level = rng.uniform(50, 99.9)
+            engine.add_stop(symbol, 'SELL', 1, level)
+            naive[symbol].append({'kind': 'STOP', 'level': level, 'done': False})
+        elif roll < 0.8:
+            level = rng.uniform(100.1, 150)
+            engine.add_take_profit(symbol, 'SELL', 1, level)
+            naive[symbol].append({'kind': 'TAKE_PROFIT', 'level': level, 'done': False})
+        else:
+            rate = round(rng.uniform(0.1, 5), 1)
+            engine.add_trailing_stop(symbol, 'SELL', 1, rate)
+            naive[symbol].append({'kind': 'TRAILING_STOP', 'peak': 100.0, 'rate': rate / 100, 'done': False})
+    print(f"added {args.triggers} triggers: {(time.perf_counter() - start) / args.triggers * 1e6:.1f}us each")
+
+    ticks = [(rng.choice(symbols), 100 + rng.uniform(-0.5, 0.5)) for _ in range(args.ticks)]
+    for name, tick in (("engine", engine.on_price), ("naive scan", lambda s, p: naive_tick(naive, s, p))):
+        samples, fired = [], 0
+        for symbol, price in ticks:
+            t = time.perf_counter()
+            fired += len(tick(symbol, price))
+            samples.append(time.perf_counter() - t)
+        samples.sort()
+        print(f"{name:<11} p50={samples[len(samples) // 2] * 1e6:8.1f}us  p99={samples[int(len(samples) * 0.99)] * 1e6:8.1f}us  "
+              f"mean={statistics.fmean(samples) * 1e6:8.1f}us  fired={fired}")
+    engine.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Load test for POST /order against a local mock exchange.
+Starts bot.mock_exchange with a fixed round-trip latency and the FastAPI server in-process
+(on a throwaway database), then fires concurrent order submissions and reports throughput
+and latency percentiles. A /history probe runs alongside to show the event loop stays responsive.
+
+    python benchmarks/load_orders.py --requests 400 --concurrency 50 --latency 0.1 [--jitter 0.05] [--error-rate 0.01] [--json]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import aiohttp
+import uvicorn
+
+from bot import client, database
+from bot.mock_exchange import MockExchange
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    os.chdir(ROOT)
+    import server
+    config = uvicorn.Config(server.app, host='127.0.0.1', port=port, log_level='warning')
+    srv = uvicorn.Server(config)
+    threading.Thread(target=srv.run, daemon=True).start()
+    while not srv.started:
+        time.sleep(0.05)
+    return srv
+
+
+async def submit(session, url, latencies, sizes, failures, headers):
+    form = {'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': '0.002'}
+    start = time.perf_counter()
+    async with session.post(f"{url}/order", data=form, headers=headers) as resp:
+        sizes.append(len(await resp.read()))
+        if resp.status == 502:
+            # The exchange failed the order (see --error-rate); the server reported it
+            failures.append(resp.status)
+        else:
+            resp.raise_for_status()
+    latencies.append(time.perf_counter() - start)
+
+
+async def probe(session, url, latencies, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        async with session.get(f"{url}/history?limit=1") as resp:
+            await resp.read()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run(url, total, concurrency, headers):
+    order_latencies, probe_latencies, sizes, failures = [], [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency + 1)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def bounded():
+            async with semaphore:
+                await submit(session, url, order_latencies, sizes, failures, headers)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(session, url, probe_latencies, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe_task
+    return elapsed, order_latencies, probe_latencies, sizes, failures
+
+
+def load_test(requests=400, concurrency=50, latency=0.1, jitter=0.0, error_rate=0.0, seed=None, json_replies=False,
+              rate_limit=False):
+    """
+    Runs the server against a fresh mock exchange and database and returns the measurements.
+    The server module can only be started once per process.
+    """
+    if not rate_limit:
+        # The mock exchange doesn't enforce limits; measure the server rather than the pacing
+        client.FUTURES_RATE_LIMITS = []
+
+    tmp = tempfile.TemporaryDirectory()
+    database.close_connections()
+    database.DB_FILE = os.path.join(tmp.name, 'load.db')
+    database.init_db()
+    database.save_setting('BINANCE_API_KEY', 'load-test-key')
+    database.save_setting('BINANCE_API_SECRET', 'load-test-secret')
+
+    with MockExchange(latency=latency, latency_jitter=jitter, error_rate=error_rate, seed=seed) as exchange:
+        os.environ['BINANCE_FUTURES_URL'] = exchange.url
+        port = free_port()
+        srv = start_server(port)
+
+        headers = {'Accept': 'application/json'} if json_replies else {}
+        elapsed, orders, probes, sizes, failures = asyncio.run(run(f"http://127.0.0.1:{port}", requests, concurrency, headers))
+        exchange_client = sys.modules['server'].get_client().sync_client
+        srv.should_exit = True
+    tmp.cleanup()
+
+    return {
+        'orders': len(orders),
+        'failed': len(failures),
+        'injected_errors': exchange.errors,
+        'retries': exchange_client.order_retries,
+        'throughput': len(orders) / elapsed,
+        'response_bytes': statistics.mean(sizes),
+        'p50_ms': statistics.median(orders) * 1000,
+        'p99_ms': percentile(orders, 99) * 1000,
+        'probe_p50_ms': statistics.median(probes) * 1000 if probes else None,
+        'probe_p99_ms': percentile(probes, 99) * 1000 if probes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400, help='Total orders to submit.')
+    parser.add_argument('--concurrency', type=int, default=50, help='Orders in flight at once.')
+    parser.add_argument('--latency', type=float, default=0.1, help='Mock exchange round-trip in seconds.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random exchange delay, up to this many seconds.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of orders the exchange fails with a 503.')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the jitter and error injection.')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help="Keep the client's Binance rate limits (caps orders at 270 per 10s).")
+    parser.add_argument('--json', action='store_true', help='Ask for the JSON reply the dashboard uses instead of the full page.')
+    args = parser.parse_args()
+
+    result = load_test(args.requests, args.concurrency, args.latency, args.jitter, args.error_rate, args.seed,
+                       args.json, args.rate_limit)
+
+    print(f"orders={result['orders']} concurrency={args.concurrency} exchange_latency={args.latency * 1000:.0f}ms"
+          f"+{args.jitter * 1000:.0f}ms jitter")
+    print(f"failed orders:  {result['failed']:8d} ({result['injected_errors']} injected exchange errors, "
+          f"{result['retries']} retried)")
+    print(f"throughput:     {result['throughput']:8.1f} orders/sec")
+    print(f"response size:  {result['response_bytes']:8.0f} bytes")
+    print(f"order latency:  p50={result['p50_ms']:7.1f}ms  p99={result['p99_ms']:7.1f}ms")
+    if result['probe_p50_ms'] is not None:
+        print(f"/history probe: p50={result['probe_p50_ms']:7.1f}ms  p99={result['probe_p99_ms']:7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Worker scaling load test: requests/sec served by `python server.py` with WEB_CONCURRENCY=1, 2, 4, ...
+worker processes on one database, against a local mock exchange. Load comes from several client
+processes so the generator isn't the bottleneck. The default path renders a page of order history
+(SQLite read plus JSON encoding), which is CPU-bound per request and so scales with worker processes
+up to the number of cores; a single worker already overlaps exchange round-trips on its event loop.
+
+    python benchmarks/load_workers.py --workers 1,2,4 --duration 10 --clients 4 [--path /history?limit=50]
+
+Throughput can only grow with workers while there are idle cores: run it with at least as many
+cores as the largest worker count plus the client processes.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import aiohttp
+
+from bot import database
+from bot.mock_exchange import MockExchange
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed(db_file, orders):
+    entries = [({'symbol': 'BTCUSDT', 'side': 'BUY' if n % 2 else 'SELL', 'type': 'LIMIT', 'quantity': 0.002,
+                 'price': 60000 + n},
+                {'orderId': n, 'clientOrderId': f"load-{n}", 'status': 'FILLED', 'executedQty': '0.002',
+                 'avgPrice': str(60000 + n)}, datetime.now().isoformat()) for n in range(1, orders + 1)]
+    database.write_orders(db_file, entries)
+    database.DB_FILE = db_file
+    database.save_setting('BINANCE_API_KEY', 'load-test-key')
+    database.save_setting('BINANCE_API_SECRET', 'load-test-secret')
+    database.close_connections()
+
+
+def start_server(workers, port, env):
+    process = subprocess.Popen([sys.executable, 'server.py'], cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL,
+                               env=dict(env, WEB_CONCURRENCY=str(workers), PORT=str(port)))
+    # Ready once every worker has answered (each reports its own pid)
+    pids = set()
+    deadline = time.monotonic() + 60
+    while len(pids) < workers:
+        if time.monotonic() > deadline or process.poll() is not None:
+            process.kill()
+            raise RuntimeError(f"Server with {workers} workers did not start")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/status", timeout=2) as resp:
+                pids.add(json.loads(resp.read())['worker']['pid'])
+        except OSError:
+            time.sleep(0.1)
+    return process
+
+
+async def hammer(url, duration, concurrency):
+    latencies = []
+    deadline = time.monotonic() + duration
+
+    async def loop(session):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            async with session.get(url) as resp:
+                await resp.read()
+                resp.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(loop(session) for _ in range(concurrency)))
+    return latencies
+
+
+def client_process(args):
+    return asyncio.run(hammer(*args))
+
+
+def measure(url, duration, clients, concurrency):
+    with multiprocessing.Pool(clients) as pool:
+        start = time.perf_counter()
+        results = pool.map(client_process, [(url, duration, concurrency)] * clients)
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for result in results for latency in result)
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='Worker counts to measure.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per worker count.')
+    parser.add_argument('--clients', type=int, default=4, help='Load generator processes.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight per client process.')
+    parser.add_argument('--path', default='/history?limit=50', help='Request path to load.')
+    parser.add_argument('--orders', type=int, default=5000, help='Orders in the history being served.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, MockExchange() as exchange:
+        db_file = os.path.join(tmp, 'load.db')
+        seed(db_file, args.orders)
+        env = dict(os.environ, TRADING_BOT_DB=db_file, BINANCE_FUTURES_URL=exchange.url)
+
+        print(f"{os.cpu_count()} CPU(s), {args.clients} client processes x {args.concurrency} in flight, "
+              f"GET {args.path}")
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(',')):
+            port = free_port()
+            server = start_server(workers, port, env)
+            try:
+                result = measure(f"http://127.0.0.1:{port}{args.path}", args.duration, args.clients, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            baseline = baseline or result['throughput']
+            print(f"workers={workers:<3} {result['throughput']:9.1f} req/s  x{result['throughput'] / baseline:4.2f}  "
+                  f"p50={result['p50_ms']:7.1f}ms  p99={result['p99_ms']:7.1f}ms  ({result['requests']} requests)")
+
+
+if __name__ == '__main__':
+    main()
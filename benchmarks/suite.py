@@ -0,0 +1,236 @@
+"""
+Benchmark suite for the order path: parameter building and place_order overhead, order logging and
+history queries at several table sizes, dashboard rendering with large history pages, and POST /order
+throughput against the mock exchange. Writes the results as JSON and, given a baseline file from an
+earlier run, reports every metric that got worse by more than the threshold (exit status 1 if any did).
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/suite.py --quick --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from jinja2 import Environment, FileSystemLoader
+
+from bot import database
+from bot.client import BinanceFuturesClient, RateLimiter, build_order_params
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT', 'XRPUSDT']
+STATUSES = ['NEW', 'FILLED', 'FILLED', 'FILLED', 'CANCELED', 'PARTIALLY_FILLED']
+RESPONSE = {'orderId': 4061234567, 'symbol': 'BTCUSDT', 'status': 'NEW', 'clientOrderId': 'x-Cb7ytekJ7d5c2f0e1a9b',
+            'price': '60000', 'avgPrice': '0.00', 'origQty': '0.002', 'executedQty': '0', 'cumQty': '0',
+            'cumQuote': '0.00000', 'timeInForce': 'GTC', 'type': 'LIMIT', 'reduceOnly': False, 'side': 'BUY',
+            'positionSide': 'BOTH', 'stopPrice': '0', 'workingType': 'CONTRACT_PRICE', 'origType': 'LIMIT',
+            'updateTime': 1760000000000}
+SEED_CHUNK = 50000
+
+
+class StubExchange:
+    """
+    Stands in for python-binance's Client so place_order runs without any network I/O.
+    """
+    def futures_create_order(self, **params):
+        return RESPONSE
+
+
+def per_call(func, number, repeat=7):
+    """
+    Median seconds per call over repeat samples of number calls each.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def fake_entry(n, rng):
+    symbol = rng.choice(SYMBOLS)
+    side = rng.choice(['BUY', 'SELL'])
+    order_type = rng.choice(['MARKET', 'LIMIT'])
+    status = rng.choice(STATUSES)
+    qty = round(rng.uniform(0.001, 2), 3)
+    price = round(rng.uniform(100, 70000), 2)
+    response = dict(RESPONSE, orderId=4000000000 + n, symbol=symbol, side=side, type=order_type, origType=order_type,
+                    status=status, origQty=str(qty), executedQty=str(qty if status == 'FILLED' else 0),
+                    avgPrice=str(price if status != 'NEW' else '0.00'), clientOrderId=f"x-{n:024x}",
+                    updateTime=1760000000000 + n * 1000)
+    order = {'symbol': symbol, 'side': side, 'type': order_type, 'quantity': qty,
+             'price': price if order_type == 'LIMIT' else None}
+    return order, response
+
+
+def seed(rows, total, rng):
+    """
+    Grows the orders table from rows to total rows.
+    """
+    for start in range(rows, total, SEED_CHUNK):
+        database.log_orders([fake_entry(n, rng) for n in range(start, min(total, start + SEED_CHUNK))])
+
+
+def bench_client(results):
+    results['client.build_order_params_us'] = per_call(
+        lambda: build_order_params('BTCUSDT', 'BUY', 'STOP', 0.002, 60000, 59000), 20000) * 1e6
+
+    client = BinanceFuturesClient(testnet=True, api_key='bench', api_secret='bench')
+    client.client.session.close()
+    client.client = StubExchange()
+    client.rate_limiter = RateLimiter(limits=[])
+    results['client.place_order_us'] = per_call(
+        lambda: client.place_order('BTCUSDT', 'BUY', 'LIMIT', 0.002, price=60000), 5000) * 1e6
+
+
+def bench_history(results, sizes, tmp):
+    template = Environment(loader=FileSystemLoader(os.path.join(ROOT, 'templates'))).get_template('index.html')
+    database.close_connections()
+    database.DB_FILE = os.path.join(tmp, 'history.db')
+    database.init_db()
+    rng = random.Random(7)
+    rows = 0
+
+    for size in sorted(sizes):
+        seed(rows, size, rng)
+        rows = size
+        order, response = fake_entry(size, rng)
+        inserts = 500
+        results[f'db.log_order_us@{size}'] = per_call(lambda: database.log_order(order, response), inserts, 3) * 1e6
+        rows += inserts * 3
+
+        middle = rows // 2
+        results[f'db.get_history_ms@{size}'] = per_call(lambda: database.get_history(limit=50), 200) * 1e3
+        results[f'db.get_history_deep_ms@{size}'] = per_call(
+            lambda: database.get_history(limit=50, before_id=middle), 200) * 1e3
+        results[f'db.get_history_filtered_ms@{size}'] = per_call(
+            lambda: database.get_history(limit=50, symbol='ETHUSDT', status='FILLED'), 200) * 1e3
+
+    # Rendering only depends on the page size, not on how many rows are behind it
+    for limit in (database.HISTORY_PAGE_SIZE, database.MAX_HISTORY_PAGE_SIZE):
+        history = database.get_history(limit=limit)
+        results[f'render.index_ms@{limit}_rows'] = per_call(
+            lambda: template.render(history=history, next_cursor=history[-1]['id'], api_key='',
+                                    has_secret=False), 20) * 1e3
+    database.close_connections()
+
+
+def bench_load(results, requests, concurrency, latency):
+    from load_orders import load_test
+
+    # JSON replies, as the dashboard asks for; full-page rendering is covered by render.index_ms.
+    # The server module only starts once per process, so this is the one load test per run.
+    outcome = load_test(requests, concurrency, latency, json_replies=True)
+    results['server.order_throughput_per_s'] = outcome['throughput']
+    results['server.order_p50_ms'] = outcome['p50_ms']
+    results['server.order_p99_ms'] = outcome['p99_ms']
+    results['server.history_probe_p99_ms'] = outcome['probe_p99_ms']
+
+
+def higher_is_better(name):
+    return '_per_s' in name
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints each metric next to its baseline and returns the names that regressed beyond threshold.
+    """
+    regressions = []
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, value in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:<44}{'-':>12}{value:12.3f}")
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better(name) else change
+        flag = ''
+        if worse > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        elif worse < -threshold:
+            flag = '  improved'
+        print(f"{name:<44}{before:12.3f}{value:12.3f}{change:+9.1%}{flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000,1000000', help='Comma-separated orders table sizes.')
+    parser.add_argument('--requests', type=int, default=400, help='Orders submitted in the /order load test.')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help='Mock exchange round-trip in seconds.')
+    parser.add_argument('--quick', action='store_true', help='10k/100k rows and 200 requests, for a fast check.')
+    parser.add_argument('--skip', default='', help='Comma-separated groups to skip: client, history, load.')
+    parser.add_argument('--output', help='Write results JSON here (default: stdout).')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Relative change that counts as a regression.')
+    parser.add_argument('--save-baseline', help='Also write the results here, to compare later runs against.')
+    args = parser.parse_args()
+    if args.quick:
+        args.rows, args.requests = '10000,100000', 200
+    sizes = [int(n) for n in args.rows.split(',') if n]
+    skip = set(filter(None, args.skip.split(',')))
+
+    results = {}
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        if 'client' not in skip:
+            bench_client(results)
+        if 'history' not in skip:
+            bench_history(results, sizes, tmp)
+        if 'load' not in skip:
+            bench_load(results, args.requests, args.concurrency, args.latency)
+
+    report = {
+        'meta': {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seconds': round(time.perf_counter() - started, 1),
+            'args': {'rows': sizes, 'requests': args.requests, 'concurrency': args.concurrency,
+                     'latency': args.latency},
+        },
+        'results': {name: round(value, 4) for name, value in results.items()},
+    }
+    text = json.dumps(report, indent=2)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    if not args.output:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(report['results'], baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Named exchange accounts (e.g. Binance sub-accounts) that orders can be routed to. Credentials of named
+accounts live in the accounts table; the "default" account is the one configured through the dashboard
+settings or the BINANCE_API_KEY / BINANCE_API_SECRET environment.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from .database import DEFAULT_ACCOUNT, credentials_version, get_account, get_setting
+
+logger = logging.getLogger("trading_bot.accounts")
+
+# Account names travel in URLs, form fields and the orders table
+MAX_ACCOUNT_NAME = 64
+
+
+class AccountError(ValueError):
+    pass
+
+
+def parse_accounts(value):
+    """
+    Turns "a, b" or ["a", "b,c"] into a list of distinct account names, defaulting to the default account.
+    """
+    if isinstance(value, str):
+        value = [value]
+    names = []
+    for part in value or ():
+        for name in str(part).split(','):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+    return names or [DEFAULT_ACCOUNT]
+
+
+def check_account_name(name):
+    name = (name or '').strip()
+    if not name or len(name) > MAX_ACCOUNT_NAME or ',' in name:
+        raise AccountError(f"Account names must be 1-{MAX_ACCOUNT_NAME} characters without commas.")
+    return name
+
+
+def account_credentials(name=None):
+    """
+    Returns (api_key, api_secret, testnet) for an account. Raises AccountError for an unknown name.
+    """
+    if not name or name == DEFAULT_ACCOUNT:
+        return (get_setting('BINANCE_API_KEY') or os.getenv("BINANCE_API_KEY") or "",
+                get_setting('BINANCE_API_SECRET') or os.getenv("BINANCE_API_SECRET") or "", True)
+    account = get_account(name)
+    if account is None:
+        raise AccountError(f"Unknown account: {name}")
+    return account['api_key'], account['api_secret'], bool(account['testnet'])
+
+
+def account_client(name=None):
+    """
+    Returns the shared, warmed BinanceFuturesClient for an account from the process-wide registry.
+    """
+    from .client import get_client
+
+    api_key, api_secret, testnet = account_credentials(name)
+    return get_client(api_key or None, api_secret or None, testnet=testnet)
+
+
+class AccountPool:
+    """
+    One AsyncBinanceFuturesClient per account, created on first use and kept warm. Each has its own
+    connection pool, executor and rate limiter, so accounts never queue behind each other's order budget.
+
+    Requests hold a lease on the client they use (use()); invalidate() swaps in a fresh client for the
+    next request and closes the old one only once the last lease on it is released.
+
+    Keys can also change in another process (another server worker, the CLI): whenever version()
+    changes, refresh() compares each open client's keys with the stored ones and replaces the clients
+    whose keys changed, then calls on_replace(name) for each.
+    """
+    def __init__(self, credentials=account_credentials, base_url=None, version=credentials_version, on_replace=None):
+        self.credentials = credentials
+        self.base_url = base_url
+        self.version = version
+        self.on_replace = on_replace
+        self._version = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _create(self, name, credentials):
+        from .client import AsyncBinanceFuturesClient, BinanceFuturesClient
+
+        api_key, api_secret, testnet = credentials
+        sync_client = BinanceFuturesClient(testnet=testnet, api_key=api_key or None, api_secret=api_secret or None,
+                                           base_url=self.base_url)
+        logger.info("Opening exchange client for account %s", name)
+        return AsyncBinanceFuturesClient(sync_client.start())
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            credentials = self.credentials(name)
+            entry = self._entries[name] = {"client": self._create(name, credentials), "credentials": credentials,
+                                           "leases": 0, "retired": False}
+        return entry
+
+    def refresh(self):
+        """
+        Replaces the clients whose keys changed (or whose account was deleted) since they were opened.
+        Costs one version check unless something changed. Returns the names of the replaced clients.
+        """
+        if self.version is None:
+            return []
+        version = self.version()
+        with self._lock:
+            if version == self._version:
+                return []
+            self._version = version
+            entries = dict(self._entries)
+        stale = []
+        for name, entry in entries.items():
+            try:
+                credentials = self.credentials(name)
+            except AccountError:
+                credentials = None
+            if credentials != entry["credentials"] and self._retire(name, entry):
+                stale.append(name)
+        for name in stale:
+            logger.info("Keys of account %s changed, replacing its client", name)
+            if self.on_replace:
+                try:
+                    self.on_replace(name)
+                except Exception as e:
+                    logger.error("Client replacement callback failed for %s: %s", name, e)
+        return stale
+
+    def get(self, name=None):
+        """
+        Returns the account's client without leasing it (for reads that don't outlive a key change).
+        """
+        self.refresh()
+        with self._lock:
+            return self._entry(name or DEFAULT_ACCOUNT)["client"]
+
+    @contextmanager
+    def use(self, name=None):
+        """
+        Leases the account's client for the duration of the block.
+        """
+        self.refresh()
+        with self._lock:
+            entry = self._entry(name or DEFAULT_ACCOUNT)
+            entry["leases"] += 1
+        try:
+            yield entry["client"]
+        finally:
+            with self._lock:
+                entry["leases"] -= 1
+                close = entry["retired"] and entry["leases"] == 0
+            if close:
+                self._close(entry)
+
+    def invalidate(self, name=None):
+        """
+        Drops the account's client (after its keys changed or it was deleted); the next request opens a new one.
+        """
+        self._retire(name or DEFAULT_ACCOUNT)
+
+    def _retire(self, name, entry=None):
+        """
+        Removes the account's client (only if it is still entry, when given) and closes it once unleased.
+        """
+        with self._lock:
+            current = self._entries.get(name)
+            if current is None or (entry is not None and current is not entry):
+                return False
+            del self._entries[name]
+            current["retired"] = True
+            close = current["leases"] == 0
+        if close:
+            self._close(current)
+        return True
+
+    @staticmethod
+    def _close(entry):
+        entry["client"].close()
+        entry["client"].sync_client.close()
+
+    def clients(self):
+        """
+        The open clients by account name.
+        """
+        with self._lock:
+            return {name: entry["client"] for name, entry in self._entries.items()}
+
+    def metrics(self):
+        with self._lock:
+            entries = dict(self._entries)
+        return {name: dict(entry["client"].sync_client.health(), leases=entry["leases"])
+                for name, entry in entries.items()}
+
+    def close(self):
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            self._close(entry)
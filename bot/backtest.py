@@ -0,0 +1,428 @@
+"""
+Backtests: historical klines or trades replayed through BacktestClient, which has the order methods of
+BinanceFuturesClient (place_order, place_batch_orders, cancel_order), so OrderManager and strategies run
+against it unchanged. The simulated orders are written to a separate database with the orders schema.
+
+Bar files (CSV as published on data.binance.vision, or Parquet when pyarrow is installed) are converted
+once into a column-major .npy next to them and memory-mapped from then on: runs start without parsing,
+and sweep workers share one copy in the page cache. Resting orders are matched with vectorized scans of
+the bars between strategy events instead of a Python loop over every bar.
+
+Fill model (a strategy acts on bar i after it closes):
+- MARKET fills at close[i], moved against the order by slippage_bps.
+- A LIMIT at or through close[i] fills at close[i]; otherwise it rests until the first later bar whose
+  low (BUY) or high (SELL) reaches its price, and fills at the price, or at that bar's open if better.
+- STOP_MARKET rests until the first later bar whose high (BUY) or low (SELL) reaches the stop, and fills
+  at the stop, or at that bar's open if worse, plus slippage. One that would trigger at once is rejected.
+Orders fill in full; bar volume is not checked.
+"""
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .database import write_orders
+from .matching import OrderRejected
+from .positions import apply_fill
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+logger = logging.getLogger("trading_bot.backtest")
+
+BAR_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+# Header names accepted for each field; trade files have one price for open, high, low and close
+FIELD_NAMES = {
+    'time': ('open_time', 'time', 'timestamp', 'transact_time'),
+    'open': ('open', 'price'),
+    'high': ('high', 'price'),
+    'low': ('low', 'price'),
+    'close': ('close', 'price'),
+    'volume': ('volume', 'qty', 'quantity'),
+}
+# Column positions in headerless Binance files, by column count: klines, trades and aggTrades
+HEADERLESS_COLUMNS = {
+    12: (0, 1, 2, 3, 4, 5),
+    6: (4, 1, 1, 1, 1, 2),
+    7: (5, 1, 1, 1, 1, 2),
+}
+# Bars compared per vectorized step when looking for a resting order's fill
+SCAN_CHUNK = 65536
+ORDER_TYPES = ('MARKET', 'LIMIT', 'STOP_MARKET')
+
+
+class BacktestError(ValueError):
+    pass
+
+
+class Bars:
+    """
+    Bar columns as contiguous float64 arrays (times in ms since the epoch), views of one (6, n) array.
+    """
+    def __init__(self, data):
+        self.data = data
+        for row, name in enumerate(BAR_FIELDS):
+            setattr(self, name, data[row])
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    @classmethod
+    def from_arrays(cls, time, open, high, low, close, volume=None):
+        columns = [time, open, high, low, close, np.zeros(len(close)) if volume is None else volume]
+        return cls(np.ascontiguousarray(np.vstack([np.asarray(c, dtype=np.float64) for c in columns])))
+
+    def save(self, path):
+        np.save(path, self.data)
+
+
+def _csv_columns(path):
+    """
+    Returns (positions of BAR_FIELDS, rows to skip) for a CSV file, from its header or column count.
+    """
+    with open(path) as f:
+        first = f.readline().strip().split(',')
+    try:
+        float(first[0])
+    except ValueError:
+        return _header_positions([name.strip().lower() for name in first], path), 1
+    if len(first) not in HEADERLESS_COLUMNS:
+        raise BacktestError(f"{path}: expected 12 (klines), 6 (trades) or 7 (aggTrades) columns, got {len(first)}")
+    return HEADERLESS_COLUMNS[len(first)], 0
+
+
+def _header_positions(header, path):
+    positions = []
+    for field in BAR_FIELDS:
+        found = [header.index(name) for name in FIELD_NAMES[field] if name in header]
+        if not found:
+            raise BacktestError(f"{path}: no {field} column (looked for {', '.join(FIELD_NAMES[field])})")
+        positions.append(found[0])
+    return tuple(positions)
+
+
+def _read_csv(path):
+    positions, skip = _csv_columns(path)
+    usecols = sorted(set(positions))
+    table = np.loadtxt(path, delimiter=',', skiprows=skip, usecols=usecols, dtype=np.float64, ndmin=2)
+    return np.ascontiguousarray(table.T[[usecols.index(p) for p in positions]])
+
+
+def _read_parquet(path):
+    if pq is None:
+        raise BacktestError("Parquet bar files need pyarrow (pip install pyarrow).")
+    table = pq.read_table(path)
+    names = [name.lower() for name in table.column_names]
+    positions = _header_positions(names, path)
+    return np.ascontiguousarray(np.vstack([table.column(p).to_numpy().astype(np.float64) for p in positions]))
+
+
+def load_bars(path):
+    """
+    Memory-maps the bars of a .npy, CSV or Parquet file. CSV and Parquet files are converted to
+    <path>.npy on first use (and again whenever the source is newer).
+    """
+    if path.endswith('.npy'):
+        cache = path
+    else:
+        cache = path + '.npy'
+        if not os.path.exists(cache) or os.path.getmtime(cache) < os.path.getmtime(path):
+            started = time.perf_counter()
+            data = _read_parquet(path) if path.lower().endswith('.parquet') else _read_csv(path)
+            # Sorted by time, so bar order is replay order whatever the file's order
+            data = np.ascontiguousarray(data[:, np.argsort(data[0], kind='stable')])
+            tmp = f"{cache}.{os.getpid()}.tmp.npy"
+            np.save(tmp, data)
+            os.replace(tmp, cache)
+            logger.info("Converted %d bars from %s in %.1fs", data.shape[1], path, time.perf_counter() - started)
+    data = np.load(cache, mmap_mode='r')
+    if data.ndim != 2 or data.shape[0] != len(BAR_FIELDS):
+        raise BacktestError(f"{cache} is not a bar file")
+    return Bars(data)
+
+
+class BacktestClient:
+    """
+    Simulated exchange for one symbol's bars. The strategy runner moves it forward with advance();
+    orders are placed at the current bar's close and resting ones fill on later bars.
+    """
+    # No exchange behind it: OrderManager validates against the cached exchange info snapshot, if any
+    client = None
+    testnet = True
+    base_url = None
+
+    def __init__(self, symbol, bars, slippage_bps=0.0, fee_bps=0.0, run_id='bt'):
+        self.symbol = symbol.upper()
+        self.bars = bars
+        self.slippage = slippage_bps / 10000
+        self.fee_rate = fee_bps / 10000
+        self.run_id = run_id
+        self.index = 0
+        self.orders = []
+        self.resting = []
+        self.position = {'net_qty': 0.0, 'avg_entry': 0.0, 'realized_pnl': 0.0}
+        self.fees = 0.0
+        self.fills = 0
+        self._by_client_id = {}
+
+    def _time(self, index):
+        return int(self.bars.time[index])
+
+    def _slipped(self, price, buy):
+        return price * (1 + self.slippage) if buy else price * (1 - self.slippage)
+
+    def place_order(self, symbol, side, order_type, quantity, price=None, stop_price=None, client_order_id=None):
+        """
+        Places an order at the current bar. Raises OrderRejected with Binance's code where the exchange would.
+        """
+        if symbol.upper() != self.symbol:
+            raise OrderRejected(-1121, "Invalid symbol.")
+        if order_type not in ORDER_TYPES:
+            raise OrderRejected(-1116, "Invalid orderType.")
+        if not quantity or quantity <= 0:
+            raise OrderRejected(-4003, "Quantity less than or equal to zero.")
+        if order_type == 'LIMIT' and not price:
+            raise OrderRejected(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+        if order_type == 'STOP_MARKET' and not stop_price:
+            raise OrderRejected(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+        # Ids follow placement order, so an order's id is its position in self.orders
+        order_id = len(self.orders) + 1
+        client_order_id = client_order_id or f"{self.run_id}-{order_id}"
+        if client_order_id in self._by_client_id:
+            raise OrderRejected(-4116, "ClientOrderId is duplicated.")
+
+        buy = side == 'BUY'
+        close = float(self.bars.close[self.index])
+        if order_type == 'STOP_MARKET' and (close >= stop_price if buy else close <= stop_price):
+            raise OrderRejected(-2021, "Order would immediately trigger.")
+        order = {'orderId': order_id, 'clientOrderId': client_order_id, 'symbol': self.symbol, 'side': side,
+                 'type': order_type, 'origQty': float(quantity), 'price': float(price or 0),
+                 'stopPrice': float(stop_price or 0), 'status': 'NEW', 'executedQty': 0.0, 'avgPrice': 0.0,
+                 'time': self._time(self.index), 'updateTime': self._time(self.index)}
+        self.orders.append(order)
+        self._by_client_id[client_order_id] = order
+        if order_type == 'MARKET':
+            self._fill(order, self.index, self._slipped(close, buy))
+        elif order_type == 'LIMIT' and (price >= close if buy else price <= close):
+            self._fill(order, self.index, close)
+        else:
+            self.resting.append(order)
+        return self._response(order)
+
+    def place_batch_orders(self, orders):
+        """
+        Places orders one by one; results have the shape of BinanceFuturesClient.place_batch_orders.
+        """
+        results = []
+        for order in orders:
+            try:
+                response = self.place_order(order['symbol'], order['side'], order['type'], order['quantity'],
+                                            order.get('price'), order.get('stop_price'))
+                results.append({"order": order, "response": response})
+            except OrderRejected as e:
+                results.append({"order": order, "error": e.msg, "code": e.code})
+        return results
+
+    def cancel_order(self, symbol, order_id=None, client_order_id=None):
+        if order_id is None and client_order_id is None:
+            raise ValueError("order_id or client_order_id is required to cancel an order.")
+        order = (self._by_client_id.get(client_order_id) if order_id is None
+                 else next((o for o in self.resting if o['orderId'] == order_id), None))
+        if order is None or order['status'] != 'NEW':
+            raise OrderRejected(-2011, "Unknown order sent.")
+        order['status'] = 'CANCELED'
+        order['updateTime'] = self._time(self.index)
+        self.resting.remove(order)
+        return self._response(order)
+
+    def get_order(self, symbol, order_id):
+        if symbol.upper() != self.symbol or not 0 < order_id <= len(self.orders):
+            raise OrderRejected(-2013, "Order does not exist.")
+        return self._response(self.orders[order_id - 1])
+
+    def open_orders(self):
+        return [self._response(order) for order in self.resting]
+
+    def advance(self, index):
+        """
+        Moves to bar index, filling resting orders on the bars passed, earliest first.
+        """
+        start = self.index + 1
+        if self.resting and start <= index:
+            hits = []
+            for order in self.resting:
+                hit = self._first_hit(order, start, index + 1)
+                if hit is not None:
+                    hits.append((hit, order['orderId'], order))
+            hits.sort(key=lambda h: h[:2])
+            for hit, _, order in hits:
+                self._fill(order, hit, self._resting_fill_price(order, hit))
+            if hits:
+                self.resting = [order for order in self.resting if order['status'] == 'NEW']
+        self.index = max(self.index, index)
+
+    def _first_hit(self, order, start, stop):
+        """
+        The first bar in [start, stop) on which the resting order fills, or None.
+        """
+        buy = order['side'] == 'BUY'
+        if order['type'] == 'LIMIT':
+            series, level, rising = (self.bars.low, order['price'], False) if buy else (self.bars.high, order['price'], True)
+        else:
+            series, level, rising = (self.bars.high, order['stopPrice'], True) if buy else (self.bars.low, order['stopPrice'], False)
+        for chunk in range(start, stop, SCAN_CHUNK):
+            window = series[chunk:min(chunk + SCAN_CHUNK, stop)]
+            hit = window >= level if rising else window <= level
+            i = int(hit.argmax())
+            if hit[i]:
+                return chunk + i
+        return None
+
+    def _resting_fill_price(self, order, index):
+        buy = order['side'] == 'BUY'
+        bar_open = float(self.bars.open[index])
+        if order['type'] == 'LIMIT':
+            return min(order['price'], bar_open) if buy else max(order['price'], bar_open)
+        return self._slipped(max(order['stopPrice'], bar_open) if buy else min(order['stopPrice'], bar_open), buy)
+
+    def _fill(self, order, index, price):
+        order.update(status='FILLED', executedQty=order['origQty'], avgPrice=price, updateTime=self._time(index))
+        apply_fill(self.position, order['side'], order['origQty'], price)
+        self.fees += order['origQty'] * price * self.fee_rate
+        self.fills += 1
+
+    @staticmethod
+    def _response(order):
+        """
+        The order as Binance returns it: decimals as strings, times in ms.
+        """
+        response = dict(order)
+        for key in ('origQty', 'price', 'stopPrice', 'executedQty', 'avgPrice'):
+            response[key] = f"{order[key]:.8f}".rstrip('0').rstrip('.')
+        return response
+
+    def entries(self, account=None):
+        """
+        (order_data, response, timestamp) per order, in placement order, for database.write_orders.
+        """
+        account = account or self.run_id
+        return [({'symbol': o['symbol'], 'side': o['side'], 'type': o['type'], 'quantity': o['origQty'],
+                  'price': o['price'] or None, 'account': account},
+                 self._response(o), datetime.fromtimestamp(o['time'] / 1000).isoformat())
+                for o in self.orders]
+
+    def summary(self):
+        last_close = float(self.bars.close[len(self.bars) - 1]) if len(self.bars) else 0.0
+        net_qty, avg_entry = self.position['net_qty'], self.position['avg_entry']
+        unrealized = net_qty * (last_close - avg_entry) if net_qty else 0.0
+        return {
+            "run_id": self.run_id, "symbol": self.symbol, "bars": len(self.bars), "orders": len(self.orders),
+            "fills": self.fills, "net_qty": net_qty, "avg_entry": avg_entry,
+            "realized_pnl": self.position['realized_pnl'], "unrealized_pnl": unrealized, "fees": self.fees,
+            "pnl": self.position['realized_pnl'] + unrealized - self.fees,
+        }
+
+
+def run_backtest(strategy, bars, symbol, slippage_bps=0.0, fee_bps=0.0, run_id='bt'):
+    """
+    Replays bars through a BacktestClient for strategy, which has on_bar(client, index) and optionally
+    signals(bars), the indices it wants on_bar for (computed vectorized); without it on_bar sees every
+    bar. Returns the client, moved to the last bar.
+    """
+    client = BacktestClient(symbol, bars, slippage_bps=slippage_bps, fee_bps=fee_bps, run_id=run_id)
+    events = strategy.signals(bars) if hasattr(strategy, 'signals') else range(len(bars))
+    for index in events:
+        index = int(index)
+        client.advance(index)
+        strategy.on_bar(client, index)
+    if len(bars):
+        client.advance(len(bars) - 1)
+    return client
+
+
+class MovingAverageCross:
+    """
+    Long while the fast simple moving average of closes is above the slow one, short while below: each
+    cross flips the position with one MARKET order. With stop_pct, every entry also gets a STOP_MARKET
+    stop_pct percent away that closes it.
+    """
+    def __init__(self, fast=10, slow=50, quantity=1.0, stop_pct=None):
+        if not 0 < fast < slow:
+            raise BacktestError("fast must be positive and shorter than slow")
+        self.fast = fast
+        self.slow = slow
+        self.quantity = quantity
+        self.stop_pct = stop_pct
+        self._sides = {}
+        self._stop = None
+
+    def signals(self, bars):
+        close = np.asarray(bars.close)
+        if len(close) < self.slow:
+            return np.empty(0, dtype=np.int64)
+        sums = np.concatenate(([0.0], np.cumsum(close)))
+        index = np.arange(self.slow - 1, len(close))
+        above = (sums[index + 1] - sums[index + 1 - self.fast]) / self.fast > \
+                (sums[index + 1] - sums[index + 1 - self.slow]) / self.slow
+        crosses = np.flatnonzero(above[1:] != above[:-1]) + 1
+        self._sides = dict(zip(index[crosses].tolist(), np.where(above[crosses], 'BUY', 'SELL').tolist()))
+        return index[crosses]
+
+    def on_bar(self, client, index):
+        side = self._sides[index]
+        if self._stop is not None and client.get_order(client.symbol, self._stop)['status'] == 'NEW':
+            client.cancel_order(client.symbol, order_id=self._stop)
+        target = self.quantity if side == 'BUY' else -self.quantity
+        quantity = round(abs(target - client.position['net_qty']), 8)
+        if quantity:
+            client.place_order(client.symbol, side, 'MARKET', quantity)
+        if self.stop_pct:
+            close = float(client.bars.close[index])
+            stop = close * (1 - self.stop_pct / 100) if side == 'BUY' else close * (1 + self.stop_pct / 100)
+            self._stop = client.place_order(client.symbol, 'SELL' if side == 'BUY' else 'BUY', 'STOP_MARKET',
+                                            self.quantity, stop_price=stop)['orderId']
+
+
+def _sweep_run(job):
+    path, symbol, strategy_class, params, options, run_id, db_path = job
+    bars = load_bars(path)
+    started = time.perf_counter()
+    client = run_backtest(strategy_class(**params), bars, symbol, run_id=run_id, **options)
+    elapsed = time.perf_counter() - started
+    if db_path:
+        write_orders(db_path, client.entries())
+    return dict(client.summary(), params=params, seconds=elapsed,
+                bars_per_second=len(bars) / elapsed if elapsed else None)
+
+
+def param_grid(grid):
+    """
+    Every combination of the parameter lists in grid: {"fast": [5, 10], "slow": [50]} gives
+    [{"fast": 5, "slow": 50}, {"fast": 10, "slow": 50}].
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def sweep(path, symbol, strategy_class, runs, processes=None, db_path=None, **options):
+    """
+    Runs strategy_class(**params) for each params dict in runs over the bars in path, across a pool of
+    processes (inline with processes=1), and returns one summary per run, in order. With db_path, each
+    run's orders are written there with its run id as the account.
+    """
+    # Converted here, once, so the workers only map the .npy
+    load_bars(path)
+    path = path if path.endswith('.npy') else path + '.npy'
+    session = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    jobs = [(path, symbol, strategy_class, params, options, f"bt-{session}-{n}", db_path)
+            for n, params in enumerate(runs, start=1)]
+    if processes == 1 or len(jobs) <= 1:
+        return [_sweep_run(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_sweep_run, jobs))
@@ -1,18 +1,301 @@
 import os
+import asyncio
+import functools
+import heapq
+import itertools
 import logging
+import random
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
 from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 from dotenv import load_dotenv
 
+from .metrics import timer
+
 load_dotenv()
 
 logger = logging.getLogger("trading_bot.client")
 
+# Upper bound on exchange requests in flight at once from AsyncBinanceFuturesClient
+ORDER_EXECUTOR_WORKERS = int(os.getenv("ORDER_EXECUTOR_WORKERS", "16"))
+
+# Binance accepts at most 5 orders per batchOrders call
+MAX_BATCH_ORDERS = 5
+# Batch chunks sent to the exchange concurrently
+BATCH_CONCURRENCY = 4
+# Since 2025-12-09 these go to the algo order endpoint, which has no batch variant
+CONDITIONAL_ORDER_TYPES = ('STOP', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET', 'TRAILING_STOP_MARKET')
+
+# Keep-alive connections held per client session; at least as many as concurrent order threads
+HTTP_POOL_SIZE = max(ORDER_EXECUTOR_WORKERS, BATCH_CONCURRENCY) + 4
+# Background health check cadence and how often the server clock offset is re-measured
+HEALTH_CHECK_INTERVAL = 30
+TIME_SYNC_INTERVAL = 300
+
+# Every new order carries a client order id from next_client_order_id(), so a request whose
+# outcome is unknown (timeout, 5xx) can be looked up by that id and resent under it without risking
+# a second execution. Such orders are retried up to ORDER_RETRIES times with full-jitter backoff.
+CLIENT_ORDER_ID_PREFIX = 'tb-'
+ORDER_RETRIES = int(os.getenv("ORDER_RETRIES", "3"))
+RETRY_BACKOFF = 0.05
+RETRY_BACKOFF_MAX = 1.0
+# Binance errors meaning the request may or may not have been executed: internal error, unexpected
+# response, backend timeout. -4116 (duplicate client order id) means an earlier attempt landed.
+UNKNOWN_OUTCOME_CODES = (-1001, -1006, -1007, -4116)
+ORDER_NOT_FOUND_CODE = -2013
+
+# Binance USD-M futures limits: (name, counts, limit, window seconds, response header)
+# "weight" buckets count request weight per IP, "orders" buckets count new orders per account.
+FUTURES_RATE_LIMITS = [
+    ('REQUEST_WEIGHT_1M', 'weight', 2400, 60, 'X-MBX-USED-WEIGHT-1M'),
+    ('ORDERS_10S', 'orders', 300, 10, 'X-MBX-ORDER-COUNT-10S'),
+    ('ORDERS_1M', 'orders', 1200, 60, 'X-MBX-ORDER-COUNT-1M'),
+]
+# Fraction of each limit held back for clock skew and requests straddling a window edge
+RATE_LIMIT_HEADROOM = 0.1
+
+# Scheduling priorities: lower runs first when requests are queued on the rate limiter
+PRIORITY_CANCEL = 0
+PRIORITY_ORDER = 1
+PRIORITY_QUERY = 2
+
+# Request weights (per Binance docs) used to charge the limiter before sending
+ORDER_WEIGHT = 1
+BATCH_ORDER_WEIGHT = 5
+QUERY_WEIGHT = 1
+EXCHANGE_INFO_WEIGHT = 1
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RateLimiter:
+    """
+    Client-side model of Binance's rate limits.
+
+    Binance counts weight and orders in fixed windows aligned to its clock (every minute, every
+    10s), so each bucket refills all at once at the window boundary rather than continuously.
+    Usage is corrected from the X-MBX-* response headers, 429/418 responses pause all traffic
+    for Retry-After, and queued requests are released in priority order (cancels first).
+    """
+    def __init__(self, limits=None, headroom=RATE_LIMIT_HEADROOM, clock=time.time):
+        self.clock = clock
+        self.buckets = {}
+        for name, kind, limit, window, header in (FUTURES_RATE_LIMITS if limits is None else limits):
+            self.buckets[name] = {
+                "kind": kind, "limit": limit, "window": window, "header": header,
+                "budget": max(1, int(limit * (1 - headroom))), "used": 0, "window_id": None,
+            }
+        self.blocked_until = 0
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.rejections = 0
+
+    def _roll(self, now):
+        for bucket in self.buckets.values():
+            window_id = int(now // bucket["window"])
+            if window_id != bucket["window_id"]:
+                bucket["window_id"] = window_id
+                bucket["used"] = 0
+
+    def _cost(self, bucket, weight, orders):
+        cost = weight if bucket["kind"] == "weight" else orders
+        # A request bigger than the whole budget waits for a fresh window rather than forever
+        return min(cost, bucket["budget"])
+
+    def _delay(self, now, weight, orders):
+        delay = max(0.0, self.blocked_until - now)
+        for bucket in self.buckets.values():
+            cost = self._cost(bucket, weight, orders)
+            if cost and bucket["used"] + cost > bucket["budget"]:
+                delay = max(delay, (bucket["window_id"] + 1) * bucket["window"] - now)
+        return delay
+
+    def acquire(self, weight=1, orders=0, priority=PRIORITY_ORDER, timeout=None):
+        """
+        Blocks until the request fits every bucket and no higher-priority request is waiting,
+        then charges it. Returns the seconds spent waiting; raises RateLimitExceeded on timeout.
+        """
+        start = self.clock()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = self.clock()
+                    self._roll(now)
+                    if self._queue[0] == ticket:
+                        delay = self._delay(now, weight, orders)
+                        if delay <= 0:
+                            break
+                    else:
+                        delay = None
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise RateLimitExceeded(f"No rate limit budget within {timeout}s")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            for bucket in self.buckets.values():
+                bucket["used"] += self._cost(bucket, weight, orders)
+            waited = self.clock() - start
+            self.requests += 1
+            if waited > 0.001:
+                self.throttled += 1
+                self.wait_seconds += waited
+            self._cond.notify_all()
+            return waited
+
+    def update_from_headers(self, headers):
+        """
+        Adopts the exchange's own usage counters when they are higher than ours.
+        """
+        if not headers:
+            return
+        with self._cond:
+            self._roll(self.clock())
+            for bucket in self.buckets.values():
+                value = headers.get(bucket["header"])
+                if value is not None:
+                    bucket["used"] = max(bucket["used"], int(value))
+
+    def penalize(self, retry_after):
+        """
+        Pauses every request for retry_after seconds after a 429 (rate limited) or 418 (banned).
+        """
+        with self._cond:
+            self.rejections += 1
+            self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+            self._cond.notify_all()
+        logger.warning("Rate limited by exchange, pausing requests for %ss", retry_after)
+
+    def metrics(self):
+        with self._cond:
+            now = self.clock()
+            self._roll(now)
+            return {
+                "buckets": {
+                    name: {
+                        "used": b["used"],
+                        "limit": b["limit"],
+                        "budget": b["budget"],
+                        "remaining": max(0, b["budget"] - b["used"]),
+                        "resets_in": round((b["window_id"] + 1) * b["window"] - now, 3),
+                    } for name, b in self.buckets.items()
+                },
+                "queued": len(self._queue),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "rejections": self.rejections,
+                "blocked_for": round(max(0.0, self.blocked_until - now), 3),
+            }
+
+def build_order_params(symbol, side, order_type, quantity, price=None, stop_price=None):
+    """
+    Builds the futures_create_order parameters for an order, raising ValueError if a
+    price required by the order type is missing.
+    """
+    params = {
+        'symbol': symbol,
+        'side': side,
+        'type': order_type,
+        'quantity': quantity,
+    }
+
+    if order_type == 'LIMIT':
+        if price is None:
+            raise ValueError("Price is required for LIMIT orders.")
+        params['price'] = price
+        params['timeInForce'] = 'GTC'  # Good Till Cancelled
+
+    elif order_type == 'STOP_MARKET':
+        if stop_price is None:
+            raise ValueError("Stop Price is required for STOP_MARKET orders.")
+        params['stopPrice'] = str(stop_price)
+        # For Stop Market, we usually assume it's to close a position or enter.
+        # If entering, no special params needed besides stopPrice.
+
+    elif order_type == 'STOP': # STOP LIMIT
+        if stop_price is None or price is None:
+             raise ValueError("Price and Stop Price are required for STOP LIMIT orders.")
+        params['price'] = str(price)
+        params['stopPrice'] = str(stop_price)
+        params['timeInForce'] = 'GTC'
+
+    return params
+
+def outcome_unknown(error):
+    """
+    True if a failed order request may still have been executed by the exchange.
+    """
+    if isinstance(error, BinanceAPIException):
+        return error.status_code >= 500 or error.code in UNKNOWN_OUTCOME_CODES
+    return isinstance(error, (BinanceRequestException, RequestsConnectionError, Timeout))
+
+def _base36(n):
+    digits = ''
+    while True:
+        n, digit = divmod(n, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        if not n:
+            return digits
+
+# Client order ids never repeat: the session is when this module was loaded, the pid tells apart
+# processes forked from it, and the sequence is shared by every client in the process
+_ORDER_ID_SESSION = _base36(int(time.time() * 1000))
+_order_seq = itertools.count(1)
+
+def next_client_order_id():
+    """
+    Returns the client order id for the next new order.
+    """
+    return f"{CLIENT_ORDER_ID_PREFIX}{_ORDER_ID_SESSION}-{_base36(os.getpid())}-{next(_order_seq)}"
+
+def client_order_id_param(params):
+    # Conditional orders go to the algo endpoint, which names the client id clientAlgoId
+    return 'clientAlgoId' if params['type'] in CONDITIONAL_ORDER_TYPES else 'newClientOrderId'
+
 class BinanceFuturesClient:
-    def __init__(self, testnet=True, api_key=None, api_secret=None):
+    def __init__(self, testnet=True, api_key=None, api_secret=None, base_url=None):
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
         self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
         self.testnet = testnet
+        # Optional futures REST root (e.g. a local mock exchange), replacing the Binance host
+        self.base_url = base_url or os.getenv("BINANCE_FUTURES_URL")
+
+        self.healthy = None
+        self.last_health_check = None
+        self.last_latency_ms = None
+        self.last_time_sync = None
+        self._stop = threading.Event()
+        self._health_thread = None
+        # Pace requests on the exchange's clock, which sync_time keeps aligned via timestamp_offset
+        self.rate_limiter = RateLimiter(clock=self._exchange_time)
+        # Orders sent but not yet answered (including retries), keyed by client order id
+        self.in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.order_retries = 0
+        self.orders_reconciled = 0
         
         if not self.api_key or not self.api_secret:
             # Allow initialization without keys for UI setup, but log warning
@@ -20,75 +303,358 @@ class BinanceFuturesClient:
             self.client = None
             return
 
-        logger.info(f"Initializing Binance Client (Testnet={testnet})")
-        try:
-            self.client = Client(self.api_key, self.api_secret, testnet=testnet)
+        logger.info("Initializing Binance Client (Testnet=%s)", testnet)
+        # No network here: python-binance's constructor ping (which targets spot) is skipped and
+        # connectivity is checked by the background health check started with start().
+        self.client = Client(self.api_key, self.api_secret, testnet=testnet, ping=False)
+        if self.base_url:
+            futures_url = self.base_url.rstrip('/') + '/fapi'
+            self.client.FUTURES_URL = futures_url
+            self.client.FUTURES_TESTNET_URL = futures_url
 
-            # Ping to verify connection
-            self.client.ping()
-            logger.info("Successfully connected to Binance.")
+        # One pooled keep-alive session per client, sized for concurrent order threads
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+        self.client.session.mount('https://', adapter)
+        self.client.session.mount('http://', adapter)
+
+    def _exchange_time(self):
+        offset = getattr(self.client, 'timestamp_offset', 0) if getattr(self, 'client', None) else 0
+        return time.time() + (offset if isinstance(offset, (int, float)) else 0) / 1000
+
+    def _request(self, func, weight=QUERY_WEIGHT, orders=0, priority=PRIORITY_QUERY, timed=False, **params):
+        """
+        Sends one REST call through the rate limiter: waits for budget, then feeds the
+        X-MBX-* usage headers back and pauses everything on a 429/418 for Retry-After.
+        Order submissions and cancels pass timed=True to record the rate_limit and exchange
+        stages; pings, time syncs and lookups stay out of the order latency histograms.
+        """
+        with timer("rate_limit") if timed else nullcontext():
+            self.rate_limiter.acquire(weight=weight, orders=orders, priority=priority)
+        try:
+            with timer("exchange") if timed else nullcontext():
+                return func(**params)
         except BinanceAPIException as e:
-            logger.error(f"Binance API Exception during init: {e}")
-            raise
-        except BinanceRequestException as e:
-            logger.error(f"Binance Request Exception during init: {e}")
+            if e.status_code in (418, 429):
+                headers = getattr(e.response, 'headers', None) or {}
+                self.rate_limiter.penalize(float(headers.get('Retry-After') or 60))
             raise
+        finally:
+            headers = getattr(getattr(self.client, 'response', None), 'headers', None)
+            if isinstance(headers, Mapping):
+                self.rate_limiter.update_from_headers(headers)
+
+    def sync_time(self):
+        """
+        Measures the exchange clock offset and applies it to signed request timestamps.
+        Also opens (or refreshes) a pooled TLS connection as a side effect.
+        """
+        start = time.time()
+        server_time = self._request(self.client.futures_time)['serverTime']
+        end = time.time()
+        # Assume the server stamped the reply halfway through the round-trip
+        offset = int(server_time - (start + end) / 2 * 1000)
+        self.client.timestamp_offset = offset
+        self.last_time_sync = end
+        self.last_latency_ms = (end - start) * 1000
+        logger.info("Exchange time synced: offset=%dms rtt=%.1fms", offset, self.last_latency_ms)
+        return offset
+
+    def check_health(self):
+        """
+        Pings the futures API over the pooled connection, re-syncing the clock when due.
+        """
+        try:
+            if self.last_time_sync is None or time.time() - self.last_time_sync > TIME_SYNC_INTERVAL:
+                self.sync_time()
+            else:
+                start = time.time()
+                self._request(self.client.futures_ping)
+                self.last_latency_ms = (time.time() - start) * 1000
+            self.healthy = True
         except Exception as e:
-            logger.error(f"Unexpected error during init: {e}")
+            if self.healthy is not False:
+                logger.warning("Exchange health check failed: %s", e)
+            self.healthy = False
+        self.last_health_check = time.time()
+        return self.healthy
+
+    def exchange_info(self):
+        """
+        Fetches futures_exchange_info through the rate limiter, so its weight counts against the budget.
+        """
+        return self._request(self.client.futures_exchange_info, weight=EXCHANGE_INFO_WEIGHT)
+
+    def start(self):
+        """
+        Starts the background thread that warms the connection immediately and then
+        keeps it alive with periodic health checks.
+        """
+        if not self.client or (self._health_thread and self._health_thread.is_alive()):
+            return self
+
+        def run():
+            while not self._stop.is_set():
+                self.check_health()
+                self._stop.wait(HEALTH_CHECK_INTERVAL)
+
+        self._health_thread = threading.Thread(target=run, name="binance-health", daemon=True)
+        self._health_thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self.client:
+            self.client.session.close()
+
+    def health(self):
+        return {
+            "healthy": self.healthy,
+            "last_check": self.last_health_check,
+            "latency_ms": self.last_latency_ms,
+            "time_offset_ms": self.client.timestamp_offset if self.client else None,
+            "rate_limits": self.rate_limiter.metrics(),
+            "orders_in_flight": len(self.in_flight),
+            "order_retries": self.order_retries,
+            "orders_reconciled": self.orders_reconciled,
+        }
+
+    def find_order(self, symbol, client_order_id, conditional=False):
+        """
+        Looks an order up by client order id. Returns None if the exchange has no such order.
+        """
+        id_param = 'clientAlgoId' if conditional else 'origClientOrderId'
+        try:
+            return self._request(self.client.futures_get_order, weight=QUERY_WEIGHT, priority=PRIORITY_ORDER,
+                                 symbol=symbol, **{id_param: client_order_id})
+        except BinanceAPIException as e:
+            if e.code == ORDER_NOT_FOUND_CODE:
+                return None
             raise
 
-    def place_order(self, symbol, side, order_type, quantity, price=None, stop_price=None):
+    def _submit_order(self, params, reconcile=False):
+        """
+        Sends one new order, retrying while its outcome is unknown. Before each resend the order is
+        looked up by its client order id, so an attempt that landed despite the error is returned
+        instead of being placed again. With reconcile=True the first attempt is such a lookup too.
         """
-        Places an order on Binance Futures.
+        id_param = client_order_id_param(params)
+        client_order_id = params.setdefault(id_param, next_client_order_id())
+        entry = {"symbol": params['symbol'], "side": params['side'], "type": params['type'],
+                 "quantity": params['quantity'], "since": time.time(), "attempts": 0}
+        with self._in_flight_lock:
+            self.in_flight[client_order_id] = entry
+        try:
+            for attempt in range(ORDER_RETRIES + 1):
+                if attempt:
+                    time.sleep(random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt)))
+                try:
+                    if reconcile:
+                        existing = self.find_order(params['symbol'], client_order_id,
+                                                   conditional=id_param == 'clientAlgoId')
+                        if existing is not None:
+                            with self._in_flight_lock:
+                                self.orders_reconciled += 1
+                            logger.info("Order %s found on the exchange after an unknown outcome", client_order_id)
+                            return existing
+                    entry["attempts"] += 1
+                    return self._request(self.client.futures_create_order, weight=ORDER_WEIGHT, orders=1,
+                                         priority=PRIORITY_ORDER, timed=True, **params)
+                except Exception as e:
+                    if not outcome_unknown(e) or attempt == ORDER_RETRIES:
+                        raise
+                    reconcile = True
+                    with self._in_flight_lock:
+                        self.order_retries += 1
+                    logger.warning("Order %s outcome unknown (%s), retrying (%d/%d)", client_order_id, e,
+                                   attempt + 1, ORDER_RETRIES)
+        finally:
+            with self._in_flight_lock:
+                self.in_flight.pop(client_order_id, None)
+
+    def place_order(self, symbol, side, order_type, quantity, price=None, stop_price=None, client_order_id=None):
+        """
+        Places an order on Binance Futures. Timeouts and server errors are retried under the same
+        client order id (generated unless given), so the order executes at most once.
         """
         if not self.client:
              raise ValueError("Client not initialized. Please set API keys.")
 
-        logger.info(f"Placing order: Symbol={symbol}, Side={side}, Type={order_type}, Qty={quantity}, Price={price}, StopPrice={stop_price}")
-        
         try:
-            params = {
-                'symbol': symbol,
-                'side': side,
-                'type': order_type,
-                'quantity': quantity,
-            }
-
-            if order_type == 'LIMIT':
-                if price is None:
-                    raise ValueError("Price is required for LIMIT orders.")
-                params['price'] = price
-                params['timeInForce'] = 'GTC'  # Good Till Cancelled
-            
-            elif order_type == 'STOP_MARKET':
-                if stop_price is None:
-                    raise ValueError("Stop Price is required for STOP_MARKET orders.")
-                params['stopPrice'] = str(stop_price)
-                # For Stop Market, we usually assume it's to close a position or enter.
-                # If entering, no special params needed besides stopPrice.
-            
-            elif order_type == 'STOP': # STOP LIMIT
-                if stop_price is None or price is None:
-                     raise ValueError("Price and Stop Price are required for STOP LIMIT orders.")
-                params['price'] = str(price)
-                params['stopPrice'] = str(stop_price)
-                params['timeInForce'] = 'GTC'
-
-            # Log params for debugging
-            logger.info(f"Sending params to Binance: {params}")
+            params = build_order_params(symbol, side, order_type, quantity, price, stop_price)
+            params[client_order_id_param(params)] = client_order_id or next_client_order_id()
+            # Full params and response only at DEBUG; formatting is skipped when the level is off
+            logger.debug("Sending params to Binance: %s", params)
 
             # Execute order
-            response = self.client.futures_create_order(**params)
-            
-            logger.info(f"Order placed successfully: {response}")
+            response = self._submit_order(params)
+
+            logger.info("Order placed: %s %s %s qty=%s price=%s stop=%s -> id=%s status=%s", symbol, side, order_type,
+                        quantity, price, stop_price, response.get('orderId'), response.get('status'))
+            logger.debug("Order response: %s", response)
             return response
 
         except BinanceAPIException as e:
-            logger.error(f"Binance API Error: Code={e.code}, Message={e.message}")
+            logger.error("Binance API Error: Code=%s, Message=%s", e.code, e.message)
             raise
         except BinanceRequestException as e:
-            logger.error(f"Binance Request Error: {e}")
+            logger.error("Binance Request Error: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error placing order: {e}")
+            logger.error("Unexpected error placing order: %s", e)
             raise
+
+    def place_batch_orders(self, orders):
+        """
+        Places a list of orders, each a dict with symbol, side, type, quantity and optional
+        price/stop_price. Orders are sent through batchOrders in chunks of MAX_BATCH_ORDERS,
+        with chunks running concurrently. Returns one result per input order, in order:
+        {"order": ..., "response": ...} on success or {"order": ..., "error": ...} on failure.
+        """
+        if not self.client:
+             raise ValueError("Client not initialized. Please set API keys.")
+
+        results = [None] * len(orders)
+        batchable = []
+        single = []
+        for i, order in enumerate(orders):
+            try:
+                params = build_order_params(order['symbol'], order['side'], order['type'], order['quantity'],
+                                            order.get('price'), order.get('stop_price'))
+            except (KeyError, ValueError) as e:
+                results[i] = {"order": order, "error": str(e)}
+                continue
+            params[client_order_id_param(params)] = next_client_order_id()
+            if params['type'] in CONDITIONAL_ORDER_TYPES:
+                single.append((i, params))
+            else:
+                # batchOrders is sent as JSON, where Binance expects every value as a string
+                batchable.append((i, {k: str(v) for k, v in params.items()}))
+
+        chunks = [batchable[n:n + MAX_BATCH_ORDERS] for n in range(0, len(batchable), MAX_BATCH_ORDERS)]
+        chunks += [[item] for item in single]
+        logger.info("Placing batch of %d orders in %d requests", len(orders), len(chunks))
+
+        def send(chunk):
+            conditional = len(chunk) == 1 and chunk[0][1]['type'] in CONDITIONAL_ORDER_TYPES
+            unknown = False
+            try:
+                if conditional:
+                    responses = [self._submit_order(chunk[0][1])]
+                else:
+                    responses = self._request(self.client.futures_place_batch_order, weight=BATCH_ORDER_WEIGHT,
+                                              orders=len(chunk), priority=PRIORITY_ORDER, timed=True,
+                                              batchOrders=[params for _, params in chunk])
+            except Exception as e:
+                logger.error("Batch request failed: %s", e)
+                # _submit_order already retried a conditional order; a batch is resolved entry by entry
+                unknown = outcome_unknown(e) and not conditional
+                responses = [{"code": getattr(e, 'code', None), "msg": str(e)}] * len(chunk)
+
+            for (i, params), response in zip(chunk, responses):
+                failed = isinstance(response, dict) and 'orderId' not in response and 'algoId' not in response and 'msg' in response
+                if failed and (unknown or response.get('code') in UNKNOWN_OUTCOME_CODES):
+                    try:
+                        response, failed = self._submit_order(dict(params), reconcile=True), False
+                    except Exception as e:
+                        response = {"code": getattr(e, 'code', None), "msg": str(e)}
+                if failed:
+                    results[i] = {"order": orders[i], "error": response['msg'], "code": response.get('code')}
+                else:
+                    results[i] = {"order": orders[i], "response": response}
+
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(chunks))) as pool:
+                list(pool.map(send, chunks))
+
+        failed = sum(1 for r in results if 'error' in r)
+        logger.info("Batch complete: %d placed, %d failed", len(orders) - failed, failed)
+        return results
+
+    def cancel_order(self, symbol, order_id=None, client_order_id=None):
+        """
+        Cancels an open order. Cancels jump ahead of queued new orders on the rate limiter.
+        """
+        if not self.client:
+             raise ValueError("Client not initialized. Please set API keys.")
+        if order_id is None and client_order_id is None:
+            raise ValueError("order_id or client_order_id is required to cancel an order.")
+
+        params = {'symbol': symbol}
+        if order_id is not None:
+            params['orderId'] = order_id
+        else:
+            params['origClientOrderId'] = client_order_id
+        logger.info("Cancelling order: %s", params)
+        try:
+            return self._request(self.client.futures_cancel_order, weight=ORDER_WEIGHT,
+                                 priority=PRIORITY_CANCEL, timed=True, **params)
+        except BinanceAPIException as e:
+            logger.error("Binance API Error: Code=%s, Message=%s", e.code, e.message)
+            raise
+
+
+# Long-lived clients shared by everything in the process, keyed by (api_key, testnet, base_url)
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_client(api_key=None, api_secret=None, testnet=True, base_url=None):
+    """
+    Returns the shared, warmed BinanceFuturesClient for these credentials, creating and
+    starting it on first use. A changed secret for the same key replaces the old client.
+    """
+    api_key = api_key or os.getenv("BINANCE_API_KEY")
+    api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
+    base_url = base_url or os.getenv("BINANCE_FUTURES_URL")
+    key = (api_key, testnet, base_url)
+    if not api_key or not api_secret:
+        # Unconfigured clients can't trade, so there is nothing worth sharing or warming
+        return BinanceFuturesClient(testnet=testnet, api_key=api_key, api_secret=api_secret, base_url=base_url)
+
+    with _registry_lock:
+        client = _registry.get(key)
+        if client is not None and client.api_secret == api_secret:
+            return client
+        if client is not None:
+            client.close()
+        client = BinanceFuturesClient(testnet=testnet, api_key=api_key, api_secret=api_secret, base_url=base_url)
+        _registry[key] = client.start()
+        return client
+
+def close_clients():
+    """
+    Stops health checks and closes the sessions of every registered client.
+    """
+    with _registry_lock:
+        for client in _registry.values():
+            client.close()
+        _registry.clear()
+
+
+class AsyncBinanceFuturesClient:
+    """
+    Asyncio facade over BinanceFuturesClient.
+    Exchange calls run on a bounded thread pool, so a slow round-trip never blocks the event loop
+    and at most max_workers requests are in flight at once.
+    """
+    def __init__(self, sync_client, max_workers=ORDER_EXECUTOR_WORKERS):
+        self.sync_client = sync_client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="binance-client")
+
+    @property
+    def client(self):
+        return self.sync_client.client
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def place_order(self, symbol, side, order_type, quantity, price=None, stop_price=None, client_order_id=None):
+        return await self._run(self.sync_client.place_order, symbol, side, order_type, quantity,
+                               price=price, stop_price=stop_price, client_order_id=client_order_id)
+
+    async def cancel_order(self, symbol, order_id=None, client_order_id=None):
+        return await self._run(self.sync_client.cancel_order, symbol, order_id=order_id,
+                               client_order_id=client_order_id)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,208 @@
+"""
+Long-running order daemon for the CLI. `cli.py daemon` keeps a warm exchange client, exchange
+filters and SQLite connection resident and serves requests on a Unix socket; other `cli.py`
+invocations forward their orders to it instead of importing python-binance and connecting each time.
+
+Protocol: one JSON object per line in each direction, {"command": ..., ...} -> {"ok": ..., ...}.
+The client half only uses the standard library, so forwarding costs no heavy imports.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger("trading_bot.daemon")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+SOCKET_PATH = os.getenv("TRADING_BOT_SOCKET") or os.path.join(DATA_DIR if os.path.exists(DATA_DIR) else '.',
+                                                              'trading_bot.sock')
+# Orders can queue behind the rate limiter, so replies may take a while
+REQUEST_TIMEOUT = 60
+CONNECT_TIMEOUT = 0.5
+
+
+class DaemonUnavailable(OSError):
+    """
+    Nothing is listening on the socket. Safe to fall back to running in-process.
+    """
+
+
+class DaemonError(RuntimeError):
+    """
+    The daemon received the request but failed it. Do not retry in-process: the order may have been sent.
+    """
+
+
+def request(command, socket_path=None, timeout=REQUEST_TIMEOUT, **payload):
+    """
+    Sends one command to the daemon and returns its reply.
+    Raises DaemonUnavailable if no daemon is listening, DaemonError if it answered with an error.
+    """
+    path = socket_path or SOCKET_PATH
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError, socket.timeout) as e:
+            raise DaemonUnavailable(f"No daemon listening on {path}: {e}") from e
+        sock.settimeout(timeout)
+        with sock.makefile('rwb') as stream:
+            stream.write(json.dumps(dict(payload, command=command)).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise DaemonError("Daemon closed the connection without replying.")
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise DaemonError(reply.get("error", "Daemon request failed."))
+    return reply
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                reply = self.server.daemon.dispatch(message.pop("command", None), message)
+            except Exception as e:
+                logger.exception("Daemon request failed")
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply, default=str).encode() + b"\n")
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _bind(socket_path, daemon):
+    """
+    Binds a server for daemon.dispatch() on socket_path, replacing a stale socket left by a crashed process.
+    """
+    try:
+        request("ping", socket_path, timeout=CONNECT_TIMEOUT)
+        raise RuntimeError(f"A daemon is already listening on {socket_path}")
+    except DaemonUnavailable:
+        pass
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _Server(socket_path, _Handler)
+    server.daemon = daemon
+    os.chmod(socket_path, 0o600)
+    return server
+
+
+def serve_in_background(socket_path, daemon):
+    """
+    Serves daemon.dispatch(command, message) on socket_path from a background thread, with the same
+    line protocol as the order daemon. Returns the server; stop_server() shuts it down.
+    """
+    server = _bind(socket_path, daemon)
+    threading.Thread(target=server.serve_forever, name="socket-server", daemon=True).start()
+    logger.info("Serving %s on %s", type(daemon).__name__, socket_path)
+    return server
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+    if os.path.exists(server.server_address):
+        os.unlink(server.server_address)
+
+
+class OrderDaemon:
+    """
+    Serves order and batch requests from one warm BinanceFuturesClient.
+    """
+    def __init__(self, socket_path=None, client=None):
+        self.socket_path = socket_path or SOCKET_PATH
+        self.client = client
+        self.started = None
+        self.requests = 0
+        self._server = None
+
+    def warm_up(self):
+        from .client import get_client
+        from .database import init_db
+        from .exchange_info import get_exchange_filters
+
+        init_db()
+        if self.client is None:
+            self.client = get_client(testnet=True)
+        if self.client.client:
+            self.client.check_health()
+            get_exchange_filters(self.client)
+        return self
+
+    def dispatch(self, command, message):
+        self.requests += 1
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+                    "requests": self.requests, "healthy": self.client.healthy}
+        if command == "order":
+            return self._order(message)
+        if command == "batch":
+            return self._batch(message)
+        if command == "stop":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown command: {command}"}
+
+    def _order(self, message):
+        from .orders import OrderManager, execute_for_accounts
+
+        out = io.StringIO()
+        if message.get("accounts"):
+            responses = execute_for_accounts(message["accounts"], lambda manager: manager.execute_order(
+                message["symbol"], message["side"], message["type"], message["quantity"],
+                message.get("price"), message.get("stop_price")), out=out)
+            return {"ok": True, "output": out.getvalue(), "responses": responses}
+        response = OrderManager(self.client, out=out).execute_order(
+            message["symbol"], message["side"], message["type"], message["quantity"],
+            message.get("price"), message.get("stop_price"))
+        return {"ok": True, "output": out.getvalue(), "response": response}
+
+    def _batch(self, message):
+        from .database import log_orders
+        from .orders import OrderManager, batch_log_entries, execute_for_accounts
+
+        out = io.StringIO()
+        if message.get("accounts"):
+            results = execute_for_accounts(message["accounts"],
+                                           lambda manager: manager.execute_batch(message["orders"]), out=out)
+            for name, account_results in results.items():
+                if account_results:
+                    log_orders(batch_log_entries(account_results, name))
+            return {"ok": True, "output": out.getvalue(), "results": results}
+        results = OrderManager(self.client, out=out).execute_batch(message["orders"])
+        if results:
+            log_orders(batch_log_entries(results))
+        return {"ok": True, "output": out.getvalue(), "results": results}
+
+    def serve_forever(self):
+        """
+        Binds the socket (replacing a stale one left by a crashed daemon) and serves until stopped.
+        """
+        self._server = _bind(self.socket_path, self)
+        self.started = time.time()
+        logger.info("Order daemon listening on %s", self.socket_path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            logger.info("Order daemon stopped")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
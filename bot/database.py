@@ -1,72 +1,962 @@
 import sqlite3
 import json
+import logging
 import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
 from datetime import datetime
 
+logger = logging.getLogger("trading_bot.database")
+
 # Use a data directory for persistence if it exists (good for Docker)
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-if os.path.exists(DATA_DIR):
+if os.getenv("TRADING_BOT_DB"):
+    # Every server worker process imports this module afresh, so the path is set through the environment
+    DB_FILE = os.getenv("TRADING_BOT_DB")
+elif os.path.exists(DATA_DIR):
     DB_FILE = os.path.join(DATA_DIR, 'trading_bot.db')
 else:
     DB_FILE = 'trading_bot.db'
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    # Create orders table
-    c.execute('''CREATE TABLE IF NOT EXISTS orders
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  timestamp TEXT,
-                  symbol TEXT,
-                  side TEXT,
-                  type TEXT,
-                  quantity REAL,
-                  price REAL,
-                  status TEXT,
-                  order_id TEXT,
-                  details TEXT)''')
-    # Create settings table
-    c.execute('''CREATE TABLE IF NOT EXISTS settings
-                 (key TEXT PRIMARY KEY, value TEXT)''')
-    conn.commit()
-    conn.close()
+# Orders logged without an account belong to the one configured through settings
+DEFAULT_ACCOUNT = 'default'
 
-def log_order(order_data, response):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT INTO orders (timestamp, symbol, side, type, quantity, price, status, order_id, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-              (datetime.now().isoformat(), 
-               order_data['symbol'], 
-               order_data['side'], 
-               order_data['type'], 
-               order_data['quantity'], 
-               order_data.get('price'),
-               response.get('status', 'UNKNOWN'),
-               str(response.get('orderId', '')),
-               json.dumps(response)))
-    conn.commit()
-    conn.close()
-
-def get_history():
-    conn = sqlite3.connect(DB_FILE)
+# Default and maximum number of rows returned per history page
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+# Rows fetched per round trip when streaming an export
+EXPORT_CHUNK_SIZE = 5000
+
+# Connection tuning. WAL lets readers run alongside the writer (and across uvicorn workers);
+# synchronous=NORMAL is safe under WAL and skips the fsync on every commit.
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16384
+STATEMENT_CACHE_SIZE = 256
+
+# Statements are kept as constants so sqlite3's per-connection statement cache reuses them
+# client_order_id is unique, so logging the same exchange order twice (a retried request, a replayed
+# journal) keeps the first row
+INSERT_ORDER_SQL = ("INSERT OR IGNORE INTO orders (timestamp, symbol, side, type, quantity, price, status, order_id, client_order_id, "
+                    "executed_qty, avg_price, stop_price, update_time, raw, account) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+# Everything but the raw payload; history pages and events never need to decompress it
+ORDER_COLUMNS = ("id, timestamp, symbol, side, type, quantity, price, status, order_id, client_order_id, "
+                 "executed_qty, avg_price, stop_price, update_time, account")
+# Updates are applied in exchange time order: an event older than the stored row is ignored
+UPDATE_ORDER_SQL = ("UPDATE orders SET status = ?, executed_qty = ?, avg_price = ?, update_time = ? "
+                    "WHERE order_id = ? AND (update_time IS NULL OR update_time <= ?)")
+ORDER_EXISTS_SQL = "SELECT 1 FROM orders WHERE order_id = ? LIMIT 1"
+ORDER_BY_CLIENT_ID_SQL = "SELECT id FROM orders WHERE client_order_id = ?"
+HISTORY_COLUMNS = tuple(column.strip() for column in ORDER_COLUMNS.split(","))
+# Day is the date part of the ISO timestamp; VWAP weighs each order's average fill price by its filled quantity
+SUMMARY_SQL = ("SELECT substr(timestamp, 1, 10) AS day, symbol, side, COUNT(*) AS orders, "
+               "COUNT(CASE WHEN executed_qty > 0 THEN 1 END) AS filled_orders, "
+               "COALESCE(SUM(executed_qty), 0) AS volume, COALESCE(SUM(executed_qty * avg_price), 0) AS notional, "
+               "SUM(executed_qty * avg_price) / NULLIF(SUM(CASE WHEN avg_price > 0 THEN executed_qty END), 0) AS vwap "
+               "FROM orders{where} GROUP BY day, symbol, side ORDER BY day, symbol, side")
+SAVE_SETTING_SQL = "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)"
+GET_SETTINGS_SQL = "SELECT key, value FROM settings"
+GET_SETTINGS_VERSION_SQL = "SELECT version FROM settings_meta WHERE id = 1"
+GET_ACCOUNTS_VERSION_SQL = "SELECT version FROM accounts_meta WHERE id = 1"
+ORDER_EVENTS_AFTER_SQL = "SELECT id, order_row FROM order_events WHERE id > ? ORDER BY id LIMIT ?"
+SAVE_ACCOUNT_SQL = "INSERT OR REPLACE INTO accounts (name, api_key, api_secret, testnet, updated) VALUES (?, ?, ?, ?, ?)"
+# Fills are appended by triggers on orders, so fills logged by any process (server, CLI, daemon) are seen
+FILLS_AFTER_SQL = "SELECT id, account, symbol, side, qty, price FROM fills WHERE id > ? ORDER BY id LIMIT ?"
+SAVE_POSITION_SQL = ("INSERT OR REPLACE INTO positions (account, symbol, net_qty, avg_entry, realized_pnl, updated) "
+                     "VALUES (?, ?, ?, ?, ?, ?)")
+# The snapshot only moves forward, so a process with an older view of the fills never overwrites a newer one
+SAVE_POSITIONS_FILL_SQL = "UPDATE positions_meta SET last_fill_id = ? WHERE id = 1 AND last_fill_id < ?"
+FILLS_PAGE_SIZE = 10000
+
+_local = threading.local()
+_connections = set()
+_connections_lock = threading.Lock()
+# Bumped by close_connections() so threads drop handles that were closed underneath them
+_generation = 0
+
+# Write-behind order logging: records are acknowledged once they are in the append-only journal,
+# then inserted in batches when ORDER_BATCH_SIZE rows are pending or the oldest has waited
+# ORDER_FLUSH_INTERVAL seconds. The journal is replayed on startup, so a crash loses nothing acked.
+ORDER_BATCH_SIZE = int(os.getenv("ORDER_BATCH_SIZE", "200"))
+ORDER_FLUSH_INTERVAL = float(os.getenv("ORDER_FLUSH_INTERVAL", "0.05"))
+# fsync the journal before acknowledging (survives power loss, not just a process crash)
+ORDER_JOURNAL_FSYNC = os.getenv("ORDER_JOURNAL_FSYNC", "1") == "1"
+# The journal is truncated once everything in it is committed and it has grown past this size
+ORDER_JOURNAL_MAX_BYTES = 1024 * 1024
+SET_JOURNAL_SEQ_SQL = "INSERT OR REPLACE INTO order_journal (journal, seq) VALUES (?, ?)"
+
+_order_writer = None
+_order_writer_lock = threading.RLock()
+
+# Keep the full exchange response (zlib-compressed) in orders.raw; the typed columns cover the UI
+ORDER_STORE_RAW = os.getenv("ORDER_STORE_RAW", "1") == "1"
+# raw format 1: zlib with this preset dictionary of the keys and values every order response
+# repeats, which roughly halves the size of a ~400 byte payload. Never edit it; add a format.
+RAW_FORMAT_ZLIB = 1
+_RAW_ZDICT = (b'"orderId":"symbol":"BTCUSDT","status":"NEW","FILLED","PARTIALLY_FILLED","CANCELED","EXPIRED",'
+              b'"clientOrderId":"x-","price":"0","avgPrice":"0.00","origQty":"0.00","executedQty":"0","cumQty":"0",'
+              b'"cumQuote":"0.00000","timeInForce":"GTC","type":"MARKET","LIMIT","STOP_MARKET","reduceOnly":false,'
+              b'"closePosition":false,"side":"BUY","SELL","positionSide":"BOTH","stopPrice":"0","workingType":'
+              b'"CONTRACT_PRICE","priceProtect":false,"origType":"MARKET","priceMatch":"NONE",'
+              b'"selfTradePreventionMode":"EXPIRE_MAKER","goodTillDate":0,"updateTime":17')
+
+# In-memory copy of the settings table. Staleness is detected with PRAGMA data_version on a
+# dedicated connection (it changes whenever any other connection or process commits), then
+# confirmed against settings_meta.version so order inserts don't force a reload.
+_settings_lock = threading.Lock()
+_settings_cache = {"conn": None, "path": None, "generation": None,
+                   "data_version": None, "version": None, "accounts_version": None, "values": {}}
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM orders ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+def get_connection():
+    """
+    Returns the calling thread's connection to DB_FILE, opening and tuning it on first use.
+    Connections are reused for the life of the thread, so prepared statements stay cached.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation != _generation:
+        conn = None
+    if conn is None or _local.path != DB_FILE:
+        if conn is not None:
+            with _connections_lock:
+                _connections.discard(conn)
+            conn.close()
+        conn = _connect(DB_FILE)
+        _local.conn = conn
+        _local.path = DB_FILE
+        _local.generation = _generation
+        with _connections_lock:
+            _connections.add(conn)
+    return conn
+
+def close_connections():
+    """
+    Closes every pooled connection (e.g. on shutdown or after DB_FILE changes in tests).
+    """
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+    _local.conn = None
+
+def init_db(conn=None):
+    conn = conn or get_connection()
+    with conn:
+        # One write transaction, so worker processes starting together migrate and backfill once
+        conn.execute("BEGIN IMMEDIATE")
+        c = conn.cursor()
+        # Create orders table
+        c.execute('''CREATE TABLE IF NOT EXISTS orders
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      timestamp TEXT,
+                      symbol TEXT,
+                      side TEXT,
+                      type TEXT,
+                      quantity REAL,
+                      price REAL,
+                      status TEXT,
+                      order_id TEXT,
+                      client_order_id TEXT,
+                      executed_qty REAL,
+                      avg_price REAL,
+                      stop_price REAL,
+                      update_time INTEGER,
+                      raw BLOB,
+                      account TEXT DEFAULT 'default')''')
+        # Databases from before the typed columns: add them, then move details into them
+        columns = {row[1] for row in c.execute("PRAGMA table_info(orders)")}
+        for column, kind in (('client_order_id', 'TEXT'), ('executed_qty', 'REAL'), ('avg_price', 'REAL'),
+                             ('stop_price', 'REAL'), ('update_time', 'INTEGER'), ('raw', 'BLOB'),
+                             ('account', f"TEXT DEFAULT '{DEFAULT_ACCOUNT}'")):
+            if column not in columns:
+                c.execute(f"ALTER TABLE orders ADD COLUMN {column} {kind}")
+        if 'details' in columns:
+            _migrate_details(conn)
+        # Indexes backing the history filters; each ends in id so keyset pagination stays an index walk
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_symbol ON orders (symbol, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_side ON orders (side, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_timestamp ON orders (timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_order_id ON orders (order_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_account ON orders (account, id)")
+        _unique_client_order_ids(conn)
+        # Named exchange accounts (sub-accounts) orders can be routed to, besides the default one
+        c.execute('''CREATE TABLE IF NOT EXISTS accounts
+                     (name TEXT PRIMARY KEY, api_key TEXT NOT NULL, api_secret TEXT NOT NULL,
+                      testnet INTEGER NOT NULL DEFAULT 1, updated TEXT)''')
+        # Create settings table
+        c.execute('''CREATE TABLE IF NOT EXISTS settings
+                     (key TEXT PRIMARY KEY, value TEXT)''')
+        # Version counter bumped by triggers on every settings change, whoever makes it
+        c.execute('''CREATE TABLE IF NOT EXISTS settings_meta
+                     (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)''')
+        c.execute("INSERT OR IGNORE INTO settings_meta (id, version) VALUES (1, 0)")
+        # Last journal record committed to orders, per journal file
+        c.execute('''CREATE TABLE IF NOT EXISTS order_journal
+                     (journal TEXT PRIMARY KEY, seq INTEGER NOT NULL)''')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS settings_version_{event.lower()}
+                         AFTER {event} ON settings
+                         BEGIN UPDATE settings_meta SET version = version + 1 WHERE id = 1; END''')
+        # Same for accounts, so every worker process notices changed keys
+        c.execute('''CREATE TABLE IF NOT EXISTS accounts_meta
+                     (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)''')
+        c.execute("INSERT OR IGNORE INTO accounts_meta (id, version) VALUES (1, 0)")
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS accounts_version_{event.lower()}
+                         AFTER {event} ON accounts
+                         BEGIN UPDATE accounts_meta SET version = version + 1 WHERE id = 1; END''')
+        # Change log of order rows (inserted, or status/fills updated) that every worker tails for its dashboards
+        c.execute('''CREATE TABLE IF NOT EXISTS order_events
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, order_row INTEGER NOT NULL)''')
+        c.execute('''CREATE TRIGGER IF NOT EXISTS order_events_insert AFTER INSERT ON orders
+                     BEGIN INSERT INTO order_events (order_row) VALUES (NEW.id); END''')
+        c.execute('''CREATE TRIGGER IF NOT EXISTS order_events_update
+                     AFTER UPDATE OF status, executed_qty, avg_price ON orders
+                     BEGIN INSERT INTO order_events (order_row) VALUES (NEW.id); END''')
+        _create_fills(conn)
+        # Position book snapshot: positions as of positions_meta.last_fill_id
+        c.execute('''CREATE TABLE IF NOT EXISTS positions
+                     (account TEXT NOT NULL, symbol TEXT NOT NULL, net_qty REAL NOT NULL, avg_entry REAL NOT NULL,
+                      realized_pnl REAL NOT NULL, updated TEXT, PRIMARY KEY (account, symbol))''')
+        c.execute('''CREATE TABLE IF NOT EXISTS positions_meta
+                     (id INTEGER PRIMARY KEY CHECK (id = 1), last_fill_id INTEGER NOT NULL)''')
+        c.execute("INSERT OR IGNORE INTO positions_meta (id, last_fill_id) VALUES (1, 0)")
+
+def _create_fills(conn):
+    """
+    Creates the fills table and the triggers that append to it: one fill per newly filled quantity,
+    priced so the order's fills add up to executed_qty at avg_price. Existing filled orders are
+    backfilled the first time.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fills'").fetchone()
+    conn.execute('''CREATE TABLE IF NOT EXISTS fills
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, order_row INTEGER NOT NULL, account TEXT,
+                     symbol TEXT NOT NULL, side TEXT NOT NULL, qty REAL NOT NULL, price REAL NOT NULL)''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS fills_order_insert
+                    AFTER INSERT ON orders WHEN NEW.executed_qty > 0 AND NEW.avg_price > 0
+                    BEGIN
+                        INSERT INTO fills (order_row, account, symbol, side, qty, price)
+                        VALUES (NEW.id, NEW.account, NEW.symbol, NEW.side, NEW.executed_qty, NEW.avg_price);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS fills_order_update
+                    AFTER UPDATE OF executed_qty ON orders
+                    WHEN NEW.executed_qty > COALESCE(OLD.executed_qty, 0) AND NEW.avg_price > 0
+                    BEGIN
+                        INSERT INTO fills (order_row, account, symbol, side, qty, price)
+                        VALUES (NEW.id, NEW.account, NEW.symbol, NEW.side,
+                                NEW.executed_qty - COALESCE(OLD.executed_qty, 0),
+                                (NEW.executed_qty * NEW.avg_price - COALESCE(OLD.executed_qty * OLD.avg_price, 0))
+                                    / (NEW.executed_qty - COALESCE(OLD.executed_qty, 0)));
+                    END''')
+    if not exists:
+        conn.execute('''INSERT INTO fills (order_row, account, symbol, side, qty, price)
+                        SELECT id, account, symbol, side, executed_qty, avg_price FROM orders
+                        WHERE executed_qty > 0 AND avg_price > 0 ORDER BY id''')
+
+def _unique_client_order_ids(conn):
+    """
+    Makes idx_orders_client_order_id unique. Databases from before it may hold empty ids or the
+    same id twice; those are cleared (the first row keeps its id) so the index can be built.
+    """
+    indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(orders)")}
+    if indexes.get('idx_orders_client_order_id'):
+        return
+    conn.execute("DROP INDEX IF EXISTS idx_orders_client_order_id")
+    conn.execute("UPDATE orders SET client_order_id = NULL WHERE client_order_id = ''")
+    conn.execute('''UPDATE orders SET client_order_id = NULL
+                    WHERE client_order_id IS NOT NULL AND id NOT IN
+                        (SELECT MIN(id) FROM orders WHERE client_order_id IS NOT NULL GROUP BY client_order_id)''')
+    conn.execute("CREATE UNIQUE INDEX idx_orders_client_order_id ON orders (client_order_id)")
+
+def _migrate_details(conn):
+    """
+    One-off migration from the JSON details column: backfills the typed columns in SQL,
+    compresses each payload into raw in chunks, then drops details.
+    """
+    conn.execute('''UPDATE orders SET
+                        client_order_id = COALESCE(client_order_id, json_extract(details, '$.clientOrderId')),
+                        executed_qty = COALESCE(executed_qty, CAST(json_extract(details, '$.executedQty') AS REAL)),
+                        avg_price = COALESCE(avg_price, CAST(json_extract(details, '$.avgPrice') AS REAL)),
+                        stop_price = COALESCE(stop_price, NULLIF(CAST(json_extract(details, '$.stopPrice') AS REAL), 0)),
+                        update_time = COALESCE(update_time, json_extract(details, '$.updateTime'))
+                    WHERE json_valid(details)''')
+    if ORDER_STORE_RAW:
+        last_id = 0
+        while True:
+            rows = conn.execute("SELECT id, details FROM orders WHERE id > ? AND details IS NOT NULL "
+                                "ORDER BY id LIMIT 10000", (last_id,)).fetchall()
+            if not rows:
+                break
+            conn.executemany("UPDATE orders SET raw = ? WHERE id = ?",
+                             [(_compress(details.encode()), row_id) for row_id, details in rows])
+            last_id = rows[-1][0]
+    conn.execute("ALTER TABLE orders DROP COLUMN details")
+
+def _compress(payload):
+    compressor = zlib.compressobj(9, zdict=_RAW_ZDICT)
+    return bytes([RAW_FORMAT_ZLIB]) + compressor.compress(payload) + compressor.flush()
+
+def pack_response(response):
+    """
+    Serializes an exchange response for orders.raw.
+    """
+    return _compress(json.dumps(response, separators=(',', ':')).encode())
+
+def unpack_response(raw):
+    if raw is None:
+        return None
+    if raw[0] != RAW_FORMAT_ZLIB:
+        raise ValueError(f"Unknown raw payload format {raw[0]}")
+    decompressor = zlib.decompressobj(zdict=_RAW_ZDICT)
+    return json.loads(decompressor.decompress(raw[1:]) + decompressor.flush())
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _order_record(order_data, response):
+    """
+    What gets journaled for an order: everything needed to build its row later.
+    """
+    return {'timestamp': datetime.now().isoformat(), 'order': order_data, 'response': response}
+
+def _order_row(order_data, response, timestamp=None):
+    # Conditional orders come back from the algo order endpoint as algoId/algoStatus
+    stop_price = response.get('stopPrice', response.get('triggerPrice'))
+    return (timestamp or datetime.now().isoformat(),
+            order_data['symbol'],
+            order_data['side'],
+            order_data['type'],
+            order_data['quantity'],
+            order_data.get('price'),
+            response.get('status', response.get('algoStatus', 'UNKNOWN')),
+            str(response.get('orderId', response.get('algoId', ''))),
+            response.get('clientOrderId') or response.get('clientAlgoId') or None,
+            _float_or_none(response.get('executedQty')),
+            _float_or_none(response.get('avgPrice')),
+            _float_or_none(stop_price) or None,
+            response.get('updateTime'),
+            pack_response(response) if ORDER_STORE_RAW else None,
+            order_data.get('account') or DEFAULT_ACCOUNT)
+
+def log_order(order_data, response):
+    """
+    Logs one order and returns its row id.
+    """
+    conn = get_connection()
+    with conn:
+        return _insert_orders(conn, [_order_row(order_data, response)])[0]
+
+def log_orders(entries):
+    """
+    Logs many (order_data, response) pairs in a single transaction and returns their row ids.
+    """
+    rows = [_order_row(order_data, response) for order_data, response in entries]
+    if not rows:
+        return []
+    conn = get_connection()
+    with conn:
+        return _insert_orders(conn, rows)
+
+def write_orders(path, entries):
+    """
+    Logs (order_data, response, timestamp) entries in one transaction into the SQLite database at
+    path, creating the schema first. Keeps simulated orders (backtests) out of the live order log.
+    """
+    conn = _connect(path)
+    try:
+        init_db(conn)
+        with conn:
+            return _insert_orders(conn, [_order_row(order_data, response, timestamp)
+                                         for order_data, response, timestamp in entries])
+    finally:
+        conn.close()
+
+def _insert_orders(conn, rows):
+    """
+    Inserts order rows in the caller's transaction and returns one row id per row. A row whose
+    client_order_id is already logged is skipped and gets the existing row's id.
+    """
+    # rowcount only counts the orders inserted, not the fills their triggers add
+    inserted = conn.executemany(INSERT_ORDER_SQL, rows).rowcount
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    if inserted == len(rows):
+        # The write lock is held for the whole transaction, so the new ids are contiguous
+        return list(range(last_id - inserted + 1, last_id + 1))
+
+    # Some were duplicates (whose skipped inserts can still use up ids): the newest `inserted` rows
+    # are this batch's, in row order; the rest map to what is stored
+    new_rows = conn.execute("SELECT id, client_order_id FROM orders WHERE id <= ? ORDER BY id DESC LIMIT ?",
+                            (last_id, inserted)).fetchall()[::-1] if inserted else []
+    ids = []
+    next_new = 0
+    for row in rows:
+        client_order_id = row[8]
+        if next_new < len(new_rows) and new_rows[next_new][1] == client_order_id:
+            ids.append(new_rows[next_new][0])
+            next_new += 1
+        else:
+            ids.append(conn.execute(ORDER_BY_CLIENT_ID_SQL, (client_order_id,)).fetchone()[0])
+    return ids
+
+def order_journal_path(slot=0):
+    """
+    The order journal of a server worker slot (see bot.workers); slot 0 is the single-process journal.
+    """
+    path = os.path.splitext(DB_FILE)[0] + '.orders.journal'
+    return f"{path}.{slot}" if slot else path
+
+class OrderWriter:
+    """
+    Background writer behind log_order_async/log_orders_async. One thread appends submitted
+    order records to the journal (one write, one fsync per group), acknowledges them, and inserts them
+    into SQLite in batched executemany transactions that also advance the journal checkpoint.
+    on_commit(row_ids) is called from the writer thread after each batch commits.
+    """
+    def __init__(self, journal_path=None, batch_size=ORDER_BATCH_SIZE, flush_interval=ORDER_FLUSH_INTERVAL,
+                 fsync=ORDER_JOURNAL_FSYNC, on_commit=None):
+        self.journal_path = journal_path or order_journal_path()
+        self.journal_name = os.path.basename(self.journal_path)
+        self.db_file = DB_FILE
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.on_commit = on_commit
+        self._queue = queue.Queue()
+        self._pending = []
+        self._pending_since = None
+        self._seq = 0
+        self._journal = None
+        self._thread = None
+        self.journaled = 0
+        self.committed = 0
+        self.batches = 0
+        self.replayed = 0
+        self.last_batch_size = 0
+        self.last_commit_ms = None
+        self.errors = 0
+
+    def _checkpoint(self, conn):
+        row = conn.execute("SELECT seq FROM order_journal WHERE journal = ?", (self.journal_name,)).fetchone()
+        return row[0] if row else 0
+
+    def _insert(self, records):
+        """
+        Inserts (seq, row) records and advances the checkpoint in one transaction. Returns row ids.
+        """
+        conn = get_connection()
+        with conn:
+            row_ids = _insert_orders(conn, [row for _, row in records])
+            conn.execute(SET_JOURNAL_SEQ_SQL, (self.journal_name, records[-1][0]))
+        return row_ids
+
+    def _rotate(self, force=False):
+        """
+        Empties the journal once everything in it is durably in the database.
+        """
+        if self._pending or not (force or self._journal.tell() > ORDER_JOURNAL_MAX_BYTES):
+            return
+        busy = get_connection().execute("PRAGMA wal_checkpoint(FULL)").fetchone()[0]
+        if not busy:
+            self._journal.truncate(0)
+            self._journal.seek(0)
+
+    def replay(self):
+        """
+        Inserts journal records newer than the database checkpoint (left behind by a crash).
+        """
+        checkpoint = self._checkpoint(get_connection())
+        records = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line was never acknowledged
+                        continue
+                    if record['seq'] > checkpoint:
+                        records.append((record['seq'], _order_row(record['order'], record['response'],
+                                                                  record['timestamp'])))
+        if records:
+            self._insert(records)
+            logger.warning("Replayed %d journaled orders into %s", len(records), self.db_file)
+        self.replayed = len(records)
+        self._seq = max([checkpoint] + [seq for seq, _ in records])
+        return len(records)
+
+    def start(self):
+        self.replay()
+        self._journal = open(self.journal_path, 'a+')
+        self._rotate(force=True)
+        self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, records):
+        """
+        Queues order records (see _order_record); the returned Future resolves once they are journaled.
+        """
+        future = Future()
+        self._queue.put((records, future))
+        return future
+
+    def _append(self, items):
+        """
+        Journals the submitted records. Nothing becomes pending unless the journal write succeeded.
+        """
+        lines, rows = [], []
+        seq = self._seq
+        for records, _ in items:
+            for record in records:
+                seq += 1
+                lines.append(json.dumps(dict(record, seq=seq)) + '\n')
+                rows.append((seq, _order_row(record['order'], record['response'], record['timestamp'])))
+        start = self._journal.tell()
+        try:
+            self._journal.write(''.join(lines))
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+        except Exception:
+            # Drop a partial write, so the next record doesn't start mid-line
+            try:
+                self._journal.truncate(start)
+                self._journal.seek(start)
+            except OSError:
+                pass
+            raise
+        self._seq = seq
+        self._pending.extend(rows)
+        self.journaled += len(lines)
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+
+    def _flush(self):
+        batch = self._pending[:self.batch_size]
+        start = time.perf_counter()
+        row_ids = self._insert(batch)
+        self.last_commit_ms = (time.perf_counter() - start) * 1000
+        del self._pending[:len(batch)]
+        self._pending_since = time.monotonic() if self._pending else None
+        self.committed += len(batch)
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        if self.on_commit:
+            try:
+                self.on_commit(row_ids)
+            except Exception as e:
+                logger.error("Order commit callback failed: %s", e)
+
+    def _run(self):
+        stopping = False
+        while not (stopping and not self._pending):
+            timeout = None
+            if self._pending:
+                timeout = max(0, self._pending_since + self.flush_interval - time.monotonic())
+            items = []
+            try:
+                items.append(self._queue.get(timeout=timeout))
+                while True:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if None in items:
+                stopping = True
+                items = [item for item in items if item is not None]
+
+            if items:
+                try:
+                    self._append(items)
+                    for _, future in items:
+                        future.set_result(None)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error("Order journal write failed: %s", e)
+                    for _, future in items:
+                        future.set_exception(e)
+
+            if self._pending and (stopping or len(self._pending) >= self.batch_size
+                                  or time.monotonic() - self._pending_since >= self.flush_interval):
+                try:
+                    self._flush()
+                    self._rotate()
+                except Exception as e:
+                    # The rows stay pending (and journaled); retry after a pause
+                    self.errors += 1
+                    logger.error("Order batch insert failed, will retry: %s", e)
+                    if stopping:
+                        break
+                    time.sleep(1)
+
+    def close(self):
+        """
+        Drains everything queued into the database and stops the writer.
+        """
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._journal:
+            self._rotate(force=True)
+            self._journal.close()
+            self._journal = None
+
+    def metrics(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending_rows": len(self._pending),
+            "journaled": self.journaled,
+            "committed": self.committed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.committed / self.batches, 1) if self.batches else 0,
+            "last_commit_ms": self.last_commit_ms,
+            "replayed": self.replayed,
+            "errors": self.errors,
+        }
+
+def start_order_writer(on_commit=None, **options):
+    """
+    Starts the order writer used by log_order_async (replaying its journal first), replacing
+    any previous one. Returns the writer.
+    """
+    global _order_writer
+    with _order_writer_lock:
+        if _order_writer:
+            _order_writer.close()
+        _order_writer = OrderWriter(on_commit=on_commit, **options).start()
+        return _order_writer
+
+def get_order_writer():
+    """
+    Returns the running order writer for DB_FILE, starting one on first use.
+    """
+    with _order_writer_lock:
+        if _order_writer is None or _order_writer.db_file != DB_FILE:
+            return start_order_writer()
+        return _order_writer
+
+def close_order_writer():
+    """
+    Flushes queued orders to the database and stops the writer (call on shutdown).
+    """
+    global _order_writer
+    with _order_writer_lock:
+        if _order_writer:
+            _order_writer.close()
+        _order_writer = None
+
+async def log_order_async(order_data, response):
+    """
+    log_order() for coroutines: returns once the order is journaled; the insert follows in
+    the writer's next batch.
+    """
+    # asyncio is imported where it is used so the CLI doesn't pay for it at startup
+    import asyncio
+    await asyncio.wrap_future(get_order_writer().submit([_order_record(order_data, response)]))
+
+async def log_orders_async(entries):
+    import asyncio
+    future = queue_orders(entries)
+    if future:
+        await asyncio.wrap_future(future)
+
+def queue_orders(entries):
+    """
+    Hands (order_data, response) pairs to the order writer from any thread without waiting.
+    Returns the Future that resolves once they are journaled, or None if there was nothing to log.
+    """
+    records = [_order_record(order_data, response) for order_data, response in entries]
+    return get_order_writer().submit(records) if records else None
+
+def update_orders(updates):
+    """
+    Applies exchange order updates, each a dict with order_id, status, executed_qty, avg_price
+    and update_time (ms), in one transaction. Updates older than the stored row are skipped.
+    Returns the updates for orders that aren't logged (yet).
+    """
+    unmatched = []
+    conn = get_connection()
+    with conn:
+        for u in updates:
+            cursor = conn.execute(UPDATE_ORDER_SQL, (u['status'], u['executed_qty'], u['avg_price'],
+                                                     u['update_time'], str(u['order_id']), u['update_time']))
+            if cursor.rowcount == 0 and conn.execute(ORDER_EXISTS_SQL, (str(u['order_id']),)).fetchone() is None:
+                unmatched.append(u)
+    return unmatched
+
+def get_orders(ids=(), order_ids=()):
+    """
+    Returns the order rows with the given row ids and/or exchange order ids, newest first.
+    """
+    clauses = []
+    params = []
+    if ids:
+        clauses.append(f"id IN ({','.join('?' * len(ids))})")
+        params.extend(int(i) for i in ids)
+    if order_ids:
+        clauses.append(f"order_id IN ({','.join('?' * len(order_ids))})")
+        params.extend(str(i) for i in order_ids)
+    if not clauses:
+        return []
+    rows = get_connection().execute(f"SELECT {ORDER_COLUMNS} FROM orders WHERE {' OR '.join(clauses)} ORDER BY id DESC",
+                                    params)
+    return [dict(row) for row in rows]
+
+def get_order_response(row_id):
+    """
+    Returns the full exchange response stored for an order row, or None if it wasn't kept.
+    """
+    row = get_connection().execute("SELECT raw FROM orders WHERE id = ?", (int(row_id),)).fetchone()
+    return unpack_response(row[0]) if row else None
+
+def _history_filters(before_id=None, symbol=None, side=None, status=None, start=None, end=None, account=None):
+    """
+    Builds the WHERE clause (or "") and parameters shared by history pages, exports and summaries.
+    """
+    clauses = []
+    params = []
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(int(before_id))
+    if symbol:
+        clauses.append("symbol = ?")
+        params.append(symbol.upper())
+    if side:
+        clauses.append("side = ?")
+        params.append(side.upper())
+    if status:
+        clauses.append("status = ?")
+        params.append(status.upper())
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp <= ?")
+        params.append(end)
+    if account:
+        clauses.append("account = ?")
+        params.append(account)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def get_history(limit=HISTORY_PAGE_SIZE, before_id=None, symbol=None, side=None, status=None, start=None, end=None,
+                account=None):
+    """
+    Returns one page of order history, newest first.
+    Pass the id of the last row of the previous page as before_id to fetch the next one.
+    start/end are ISO timestamps bounding the order time (inclusive).
+    """
+    limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE + 1))
+    where, params = _history_filters(before_id, symbol, side, status, start, end, account)
+    query = f"SELECT {ORDER_COLUMNS} FROM orders{where} ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+
+    rows = get_connection().execute(query, params).fetchall()
+    return [dict(row) for row in rows]
+
+def get_history_page(limit=HISTORY_PAGE_SIZE, **filters):
+    """
+    Returns {"orders": [...], "next_cursor": id or None} for keyset pagination.
+    """
+    limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE))
+    rows = get_history(limit=limit + 1, **filters)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]['id']
+    return {"orders": rows, "next_cursor": next_cursor}
+
+def iter_history(chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """
+    Yields matching orders oldest first as lists of up to chunk_size tuples (in HISTORY_COLUMNS order).
+    Rows come from one cursor on a private connection, so memory stays constant and the export
+    is a consistent snapshot even while orders keep being logged. Close the generator to stop early.
+    """
+    where, params = _history_filters(**filters)
+    conn = _connect(DB_FILE)
+    conn.row_factory = None
+    try:
+        cursor = conn.execute(f"SELECT {ORDER_COLUMNS} FROM orders{where} ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def summarize_history(symbol=None, side=None, status=None, start=None, end=None, account=None):
+    """
+    Returns per symbol/side/day totals: orders, filled orders, filled volume, notional and VWAP.
+    Aggregated in SQLite over the indexed columns; nothing is decoded in Python.
+    """
+    where, params = _history_filters(symbol=symbol, side=side, status=status, start=start, end=end, account=account)
+    rows = get_connection().execute(SUMMARY_SQL.format(where=where), params).fetchall()
     return [dict(row) for row in rows]
 
+def _settings_version(conn):
+    row = conn.execute(GET_SETTINGS_VERSION_SQL).fetchone()
+    return row[0] if row else None
+
+def _refresh_settings():
+    """
+    Reloads the settings cache if another connection or process changed the table.
+    Must be called with _settings_lock held.
+    """
+    cache = _settings_cache
+    conn = cache["conn"]
+    if conn is None or cache["path"] != DB_FILE or cache["generation"] != _generation:
+        conn = _connect(DB_FILE)
+        with _connections_lock:
+            _connections.add(conn)
+        cache.update(conn=conn, path=DB_FILE, generation=_generation, data_version=None, version=None)
+
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if data_version == cache["data_version"]:
+        return
+    cache["data_version"] = data_version
+    row = conn.execute(GET_ACCOUNTS_VERSION_SQL).fetchone()
+    cache["accounts_version"] = row[0] if row else None
+
+    version = _settings_version(conn)
+    if version is not None and version == cache["version"]:
+        return
+    cache["values"] = {row[0]: row[1] for row in conn.execute(GET_SETTINGS_SQL)}
+    cache["version"] = version
+
 def save_setting(key, value):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with _settings_lock:
+        with conn:
+            conn.execute(SAVE_SETTING_SQL, (key, value))
+            version = _settings_version(conn)
+        # Write-through: only skip the next reload if nothing else changed in between
+        if _settings_cache["version"] is not None and version == _settings_cache["version"] + 1:
+            _settings_cache["version"] = version
+            _settings_cache["values"][key] = value
 
 def get_setting(key):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT value FROM settings WHERE key=?", (key,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] if row else None
+    """
+    Returns a setting from the in-memory cache; the table is only re-read after it changes.
+    """
+    with _settings_lock:
+        _refresh_settings()
+        return _settings_cache["values"].get(key)
+
+def get_settings():
+    """
+    Returns a snapshot of all settings.
+    """
+    with _settings_lock:
+        _refresh_settings()
+        return dict(_settings_cache["values"])
+
+def credentials_version():
+    """
+    Changes whenever settings or accounts change, in this process or any other; as cheap as get_setting().
+    """
+    with _settings_lock:
+        _refresh_settings()
+        return _settings_cache["version"], _settings_cache["accounts_version"]
+
+def invalidate_settings():
+    """
+    Forces the next settings read to reload from the database.
+    """
+    with _settings_lock:
+        _settings_cache["data_version"] = None
+        _settings_cache["version"] = None
+
+def save_account(name, api_key, api_secret, testnet=True):
+    conn = get_connection()
+    with conn:
+        conn.execute(SAVE_ACCOUNT_SQL, (name, api_key, api_secret, int(bool(testnet)), datetime.now().isoformat()))
+
+def get_account(name):
+    """
+    Returns the account's credentials as a dict, or None if there is no such account.
+    """
+    row = get_connection().execute("SELECT name, api_key, api_secret, testnet FROM accounts WHERE name = ?",
+                                   (name,)).fetchone()
+    return dict(row) if row else None
+
+def get_accounts():
+    """
+    Lists the named accounts without their secrets.
+    """
+    rows = get_connection().execute("SELECT name, api_key, testnet, updated FROM accounts ORDER BY name").fetchall()
+    return [dict(row) for row in rows]
+
+def delete_account(name):
+    conn = get_connection()
+    with conn:
+        return conn.execute("DELETE FROM accounts WHERE name = ?", (name,)).rowcount > 0
+
+def get_fills(after_id=0, limit=FILLS_PAGE_SIZE):
+    """
+    Returns up to limit fills with an id above after_id, oldest first.
+    """
+    return [tuple(row) for row in get_connection().execute(FILLS_AFTER_SQL, (int(after_id), limit))]
+
+def load_positions():
+    """
+    Returns (positions, last_fill_id): the position snapshot rows and the last fill they include.
+    """
+    conn = get_connection()
+    # One read transaction, so the rows and last_fill_id come from the same snapshot
+    conn.execute("BEGIN")
+    try:
+        last_fill_id = conn.execute("SELECT last_fill_id FROM positions_meta WHERE id = 1").fetchone()[0]
+        rows = conn.execute("SELECT account, symbol, net_qty, avg_entry, realized_pnl, updated FROM positions").fetchall()
+    finally:
+        conn.rollback()
+    return [dict(row) for row in rows], last_fill_id
+
+def save_positions(rows, last_fill_id):
+    """
+    Upserts changed position rows along with the last fill they include, unless the snapshot is
+    already at or past last_fill_id. Returns whether it was written.
+    """
+    conn = get_connection()
+    with conn:
+        if conn.execute(SAVE_POSITIONS_FILL_SQL, (last_fill_id, last_fill_id)).rowcount == 0:
+            return False
+        conn.executemany(SAVE_POSITION_SQL, [(r['account'], r['symbol'], r['net_qty'], r['avg_entry'],
+                                              r['realized_pnl'], r['updated']) for r in rows])
+    return True
+
+def last_order_event():
+    return get_connection().execute("SELECT COALESCE(MAX(id), 0) FROM order_events").fetchone()[0]
+
+def get_order_events(after_id, limit=FILLS_PAGE_SIZE):
+    """
+    Returns (event id, order row id) pairs after after_id, oldest first.
+    """
+    return [tuple(row) for row in get_connection().execute(ORDER_EVENTS_AFTER_SQL, (int(after_id), limit))]
+
+def prune_order_events(keep):
+    """
+    Deletes all but the newest keep order events.
+    """
+    conn = get_connection()
+    with conn:
+        return conn.execute("DELETE FROM order_events WHERE id <= (SELECT MAX(id) FROM order_events) - ?",
+                            (keep,)).rowcount
@@ -0,0 +1,146 @@
+"""
+In-process fan-out of dashboard events (new and updated order rows) to server-sent event streams,
+and the database change feed that tells every server worker which order rows changed, whichever
+process wrote them.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+
+from .database import FILLS_PAGE_SIZE, get_connection, get_order_events, last_order_event, prune_order_events
+
+logger = logging.getLogger("trading_bot.events")
+
+# Events buffered per subscriber; a client that falls this far behind is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = 256
+# Seconds between checks for changes committed by any connection; an idle check is one PRAGMA
+CHANGE_POLL_INTERVAL = 0.05
+# Order events kept when pruning (far more than a worker falls behind in one poll)
+ORDER_EVENTS_KEEP = 10000
+# Polls between prunes, by the one worker that prunes
+PRUNE_EVERY = 1200
+
+
+class EventBroker:
+    """
+    Publish/subscribe hub. publish() may be called from any thread (request handlers, the DB
+    writer, the user data stream); each subscriber is an asyncio.Queue read on its own loop.
+    """
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        """
+        Returns a queue receiving every event published from now on. Must be called on a running loop.
+        """
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def _deliver(self, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Replace the backlog with a single resync so memory stays bounded
+            self.dropped += queue.qsize()
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync", "id": event["id"]})
+
+    def publish(self, event_type, **payload):
+        event = dict(payload, type=event_type, id=next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+            self.published += 1
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(queue)
+        return event
+
+    def metrics(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "published": self.published, "dropped": self.dropped}
+
+
+class ChangeFeed:
+    """
+    Background thread that watches the database for commits from any process. When something
+    changed it calls on_orders(row_ids) with the order rows inserted or updated since the last
+    poll (from the order_events table), then on_change() so caches keyed on other tables can check
+    their versions. With prune, it also trims order_events now and then; one worker should.
+    """
+    def __init__(self, on_orders, on_change=None, interval=CHANGE_POLL_INTERVAL, prune=False):
+        self.on_orders = on_orders
+        self.on_change = on_change
+        self.interval = interval
+        self.prune = prune
+        self.last_event = 0
+        self.changes = 0
+        self.errors = 0
+        self._data_version = None
+        self._polls = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Rows committed before this worker started are on the page it renders, not news
+        self.last_event = last_order_event()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def poll(self):
+        """
+        Delivers the changes committed since the last poll. Returns the number of order rows delivered.
+        """
+        data_version = get_connection().execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return 0
+        self._data_version = data_version
+        row_ids = {}
+        while True:
+            events = get_order_events(self.last_event, FILLS_PAGE_SIZE)
+            for event_id, row_id in events:
+                row_ids[row_id] = None
+                self.last_event = event_id
+            if len(events) < FILLS_PAGE_SIZE:
+                break
+        self.changes += 1
+        if row_ids:
+            self.on_orders(list(row_ids))
+        if self.on_change:
+            self.on_change()
+        return len(row_ids)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                self._polls += 1
+                if self.prune and self._polls % PRUNE_EVERY == 0:
+                    prune_order_events(ORDER_EVENTS_KEEP)
+            except Exception as e:
+                self.errors += 1
+                logger.error("Change feed poll failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def metrics(self):
+        return {"last_event": self.last_event, "changes": self.changes, "errors": self.errors}
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from .database import DATA_DIR
+
+logger = logging.getLogger("trading_bot.exchange_info")
+
+# How long a futures_exchange_info snapshot is trusted before it is refreshed in the background
+EXCHANGE_INFO_TTL = int(os.getenv("EXCHANGE_INFO_TTL", "3600"))
+
+MARKET_TYPES = ('MARKET', 'STOP_MARKET', 'TAKE_PROFIT_MARKET')
+
+
+class OrderValidationError(ValueError):
+    pass
+
+
+def _decimals(step):
+    """
+    Number of decimal places in a Binance filter value such as "0.00100000".
+    """
+    step = str(step)
+    return len(step.rstrip('0').split('.')[1]) if '.' in step.rstrip('0') else 0
+
+
+class ExchangeFilters:
+    """
+    Per-symbol trading filters from one exchangeInfo snapshot, stored column-wise in NumPy
+    arrays so a whole batch of orders is checked and rounded with a handful of array operations.
+    """
+    COLUMNS = ('tick_size', 'min_price', 'max_price', 'step_size', 'min_qty', 'max_qty',
+               'market_step_size', 'market_min_qty', 'market_max_qty', 'min_notional')
+
+    def __init__(self, exchange_info):
+        self.fetched_at = exchange_info.get('fetchedAt', time.time())
+        symbols = exchange_info.get('symbols', [])
+        self.index = {s['symbol']: i for i, s in enumerate(symbols)}
+        self.trading = np.array([s.get('status', 'TRADING') == 'TRADING' for s in symbols], dtype=bool)
+
+        columns = {name: np.zeros(len(symbols)) for name in self.COLUMNS}
+        price_decimals = np.zeros(len(symbols), dtype=np.int64)
+        qty_decimals = np.zeros(len(symbols), dtype=np.int64)
+        market_qty_decimals = np.zeros(len(symbols), dtype=np.int64)
+        columns['max_price'][:] = np.inf
+        columns['max_qty'][:] = np.inf
+        columns['market_max_qty'][:] = np.inf
+
+        for i, s in enumerate(symbols):
+            filters = {f['filterType']: f for f in s.get('filters', [])}
+            price = filters.get('PRICE_FILTER', {})
+            lot = filters.get('LOT_SIZE', {})
+            market_lot = filters.get('MARKET_LOT_SIZE', lot)
+            notional = filters.get('MIN_NOTIONAL', {})
+
+            columns['tick_size'][i] = float(price.get('tickSize', 0))
+            columns['min_price'][i] = float(price.get('minPrice', 0))
+            columns['max_price'][i] = float(price.get('maxPrice', 0)) or np.inf
+            columns['step_size'][i] = float(lot.get('stepSize', 0))
+            columns['min_qty'][i] = float(lot.get('minQty', 0))
+            columns['max_qty'][i] = float(lot.get('maxQty', 0)) or np.inf
+            columns['market_step_size'][i] = float(market_lot.get('stepSize', 0)) or columns['step_size'][i]
+            columns['market_min_qty'][i] = float(market_lot.get('minQty', 0))
+            columns['market_max_qty'][i] = float(market_lot.get('maxQty', 0)) or np.inf
+            columns['min_notional'][i] = float(notional.get('notional', notional.get('minNotional', 0)))
+            price_decimals[i] = _decimals(price.get('tickSize', '0'))
+            qty_decimals[i] = _decimals(lot.get('stepSize', '0'))
+            market_qty_decimals[i] = _decimals(market_lot.get('stepSize', lot.get('stepSize', '0')))
+
+        for name, values in columns.items():
+            setattr(self, name, values)
+        self.price_decimals = price_decimals
+        self.qty_decimals = qty_decimals
+        self.market_qty_decimals = market_qty_decimals
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def validate_orders(self, orders, reference_prices=None):
+        """
+        Checks and normalizes a list of order dicts (symbol, side, type, quantity, optional
+        price/stop_price). Quantities are floored to the step size, prices rounded to the tick.
+        reference_prices ({symbol: price}) lets MARKET orders be checked against min notional.
+        Returns a list aligned with orders of (normalized_order, None) or (None, error).
+        """
+        n = len(orders)
+        if n == 0:
+            return []
+        reference_prices = reference_prices or {}
+        if not self.index:
+            return [(None, f"Unknown symbol {o['symbol']}.") for o in orders]
+
+        idx = np.array([self.index.get(o['symbol'], -1) for o in orders], dtype=np.int64)
+        known = idx >= 0
+        row = np.where(known, idx, 0)
+        is_market = np.array([o['type'] in MARKET_TYPES for o in orders], dtype=bool)
+        qty = np.array([float(o['quantity']) for o in orders])
+        price = np.array([np.nan if o.get('price') is None else float(o['price']) for o in orders])
+        stop = np.array([np.nan if o.get('stop_price') is None else float(o['stop_price']) for o in orders])
+        ref = np.array([reference_prices.get(o['symbol'], np.nan) for o in orders])
+
+        step = np.where(is_market, self.market_step_size[row], self.step_size[row])
+        min_qty = np.where(is_market, self.market_min_qty[row], self.min_qty[row])
+        max_qty = np.where(is_market, self.market_max_qty[row], self.max_qty[row])
+        qty_decimals = np.where(is_market, self.market_qty_decimals[row], self.qty_decimals[row])
+        tick = self.tick_size[row]
+
+        # The small epsilon keeps 0.3 / 0.1 = 2.9999999999999996 from flooring to 2 steps
+        with np.errstate(divide='ignore', invalid='ignore'):
+            norm_qty = np.where(step > 0, np.floor(qty / step + 1e-9) * step, qty)
+            norm_price = np.where(tick > 0, np.round(price / tick) * tick, price)
+            norm_stop = np.where(tick > 0, np.round(stop / tick) * tick, stop)
+
+        notional_price = np.where(np.isnan(norm_price), norm_stop, norm_price)
+        notional_price = np.where(np.isnan(notional_price), ref, notional_price)
+        notional = norm_qty * notional_price
+
+        min_price = self.min_price[row]
+        max_price = self.max_price[row]
+        min_notional = self.min_notional[row]
+        bad_price = ~np.isnan(norm_price) & ((norm_price < min_price) | (norm_price > max_price))
+        bad_stop = ~np.isnan(norm_stop) & ((norm_stop < min_price) | (norm_stop > max_price))
+        low_notional = ~np.isnan(notional) & (notional < min_notional - 1e-9)
+
+        results = []
+        for i, order in enumerate(orders):
+            symbol = order['symbol']
+            r = row[i]
+            if not known[i]:
+                results.append((None, f"Unknown symbol {symbol}."))
+            elif not self.trading[r]:
+                results.append((None, f"{symbol} is not trading."))
+            elif norm_qty[i] < min_qty[i] or norm_qty[i] <= 0:
+                results.append((None, f"Quantity {order['quantity']} is below the minimum {min_qty[i]:g} "
+                                      f"(step {step[i]:g}) for {symbol}."))
+            elif norm_qty[i] > max_qty[i]:
+                results.append((None, f"Quantity {order['quantity']} is above the maximum {max_qty[i]:g} for {symbol}."))
+            elif bad_price[i]:
+                results.append((None, f"Price {order['price']} is outside [{min_price[i]:g}, {max_price[i]:g}] for {symbol}."))
+            elif bad_stop[i]:
+                results.append((None, f"Stop price {order['stop_price']} is outside [{min_price[i]:g}, {max_price[i]:g}] "
+                                      f"for {symbol}."))
+            elif low_notional[i]:
+                results.append((None, f"Order notional {notional[i]:.2f} is below the minimum {min_notional[i]:g} "
+                                      f"for {symbol}."))
+            else:
+                normalized = dict(order)
+                normalized['quantity'] = round(float(norm_qty[i]), int(qty_decimals[i]))
+                if not np.isnan(norm_price[i]):
+                    normalized['price'] = round(float(norm_price[i]), int(self.price_decimals[r]))
+                if not np.isnan(norm_stop[i]):
+                    normalized['stop_price'] = round(float(norm_stop[i]), int(self.price_decimals[r]))
+                results.append((normalized, None))
+        return results
+
+    def validate_order(self, symbol, side, order_type, quantity, price=None, stop_price=None, reference_price=None):
+        """
+        Single-order form of validate_orders. Returns (quantity, price, stop_price) rounded to
+        the symbol's filters, or raises OrderValidationError.
+        """
+        order = {'symbol': symbol, 'side': side, 'type': order_type, 'quantity': quantity,
+                 'price': price, 'stop_price': stop_price}
+        refs = {symbol: reference_price} if reference_price is not None else None
+        normalized, error = self.validate_orders([order], refs)[0]
+        if error:
+            raise OrderValidationError(error)
+        return normalized['quantity'], normalized.get('price'), normalized.get('stop_price')
+
+
+class ExchangeInfoCache:
+    """
+    futures_exchange_info snapshot kept in memory and on disk. A stale snapshot keeps being
+    served while a background refresh runs; only a cold start waits on the exchange.
+    """
+    def __init__(self, client, path=None, ttl=EXCHANGE_INFO_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.path = path or self._default_path(client)
+        self._filters = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @staticmethod
+    def _default_path(client):
+        name = 'testnet' if getattr(client, 'testnet', True) else 'live'
+        base_url = getattr(client, 'base_url', None)
+        if isinstance(base_url, str) and base_url:
+            name += '_' + hashlib.sha1(base_url.encode()).hexdigest()[:8]
+        directory = DATA_DIR if os.path.exists(DATA_DIR) else '.'
+        return os.path.join(directory, f'exchange_info_{name}.json')
+
+    def _load_disk(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _fetch(self):
+        info = self.client.exchange_info()
+        info['fetchedAt'] = time.time()
+        filters = ExchangeFilters(info)
+        payload = json.dumps(info)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("Could not write exchange info cache %s: %s", self.path, e)
+        logger.info("Fetched exchange info for %d symbols", len(filters.index))
+        return filters
+
+    def _refresh_in_background(self):
+        """
+        Starts a refresh unless one is already running; concurrent callers start at most one.
+        """
+        def run():
+            try:
+                filters = self._fetch()
+                with self._lock:
+                    self._filters = filters
+            except Exception as e:
+                logger.warning("Exchange info refresh failed, keeping cached copy: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=run, name="exchange-info-refresh", daemon=True).start()
+
+    def get(self):
+        """
+        Returns ExchangeFilters, or None when no snapshot is available (no client/network).
+        """
+        with self._lock:
+            if self._filters is None:
+                info = self._load_disk()
+                if info is not None:
+                    self._filters = ExchangeFilters(info)
+            filters = self._filters
+
+        if filters is None:
+            if not self.client or not self.client.client:
+                return None
+            try:
+                filters = self._fetch()
+            except Exception as e:
+                logger.warning("Exchange info unavailable, skipping local validation: %s", e)
+                return None
+            with self._lock:
+                self._filters = filters
+        elif time.time() - filters.fetched_at > self.ttl and self.client and self.client.client:
+            self._refresh_in_background()
+        return filters
+
+
+# One cache per exchange endpoint (testnet/live/custom base URL)
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_exchange_filters(client):
+    """
+    Returns the ExchangeFilters for client's exchange, loading the cached snapshot on first use.
+    """
+    key = (getattr(client, 'testnet', True), getattr(client, 'base_url', None))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ExchangeInfoCache(client)
+        elif not (cache.client and cache.client.client) and client.client:
+            cache.client = client
+    return cache.get()
@@ -0,0 +1,123 @@
+"""
+Streaming encoders for order history exports. Each takes the row chunks from
+database.iter_history() and yields bytes, so an export of any size is written in constant memory.
+"""
+import csv
+import io
+import json
+
+from .database import HISTORY_COLUMNS, iter_history
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HISTORY_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _jsonl(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(HISTORY_COLUMNS, row))) + "\n" for row in rows).encode()
+
+
+class _StreamSink(io.RawIOBase):
+    """
+    Write-only file that hands out what was written since the last drain while tell() keeps the
+    absolute offset, which the Parquet footer needs.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _pyarrow():
+    """
+    Imports pyarrow on first Parquet use, so importing this module (every cli.py call) stays cheap.
+    Returns (pyarrow, pyarrow.parquet), or (None, None) if it isn't installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None, None
+    return pa, pq
+
+
+def _parquet_schema(pa):
+    strings = {"timestamp", "symbol", "side", "type", "status", "order_id", "client_order_id", "account"}
+    integers = {"id", "update_time"}
+    return pa.schema([(column, pa.string() if column in strings else pa.int64() if column in integers else pa.float64())
+                      for column in HISTORY_COLUMNS])
+
+
+def _parquet(chunks):
+    # One row group per chunk, flushed to the client as soon as it is encoded
+    pa, pq = _pyarrow()
+    schema = _parquet_schema(pa)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(values, type=field.type)
+                                                     for values, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+_ENCODERS = {"csv": _csv, "jsonl": _jsonl, "parquet": _parquet}
+
+
+def check_format(file_format):
+    """
+    Normalizes an export format name, raising ExportError if it is unknown or unavailable here.
+    """
+    file_format = (file_format or "").lower()
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format '{file_format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+    if file_format == "parquet" and _pyarrow()[1] is None:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow).")
+    return file_format
+
+
+def export_history(file_format, **filters):
+    """
+    Yields the encoded export of every order matching the history filters, oldest first.
+    """
+    return _ENCODERS[check_format(file_format)](iter_history(**filters))
@@ -1,37 +1,123 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-def setup_logging(log_file='trading_bot.log'):
+# "text" (the default) or "json" for one JSON object per line in the log file
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_lock = threading.Lock()
+_state = {"listener": None, "handler": None, "key": None}
+
+
+class JsonFormatter(logging.Formatter):
     """
-    Sets up logging configuration.
-    Logs to both console and a file.
+    Formats records as JSON lines: time, level, logger and message, plus any extra={...} fields.
     """
-    # Use data directory if available
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-    if os.path.exists(data_dir):
-        log_file = os.path.join(data_dir, log_file)
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        # Only merge args into the message here (they may be dicts the caller goes on to mutate);
+        # timestamps, layout and file I/O happen on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-    # Create a custom logger
-    logger = logging.getLogger("trading_bot")
-    logger.setLevel(logging.INFO)
 
-    # Create handlers
+def _build_handlers(log_file, log_format):
     c_handler = logging.StreamHandler()
     f_handler = RotatingFileHandler(log_file, maxBytes=10*1024*1024, backupCount=5)
 
     c_handler.setLevel(logging.INFO)
     f_handler.setLevel(logging.DEBUG)
 
-    # Create formatters and add it to handlers
-    c_format = logging.Formatter('%(levelname)s - %(message)s')
-    f_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    c_handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+    if log_format == "json":
+        f_handler.setFormatter(JsonFormatter())
+    else:
+        f_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return [c_handler, f_handler]
+
+
+def setup_logging(log_file='trading_bot.log', log_format=None, level=logging.INFO):
+    """
+    Sets up logging for the "trading_bot" logger: console and a rotating file, optionally as JSON lines.
+    Callers only enqueue records; a listener thread formats and writes them, so disk I/O and rotation
+    stay off the order path. Safe to call repeatedly: the same arguments reuse the running setup,
+    different ones replace it.
+    """
+    # Use data directory if available
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+    if os.path.exists(data_dir) and not os.path.dirname(log_file):
+        log_file = os.path.join(data_dir, log_file)
+    log_format = log_format or LOG_FORMAT
+
+    logger = logging.getLogger("trading_bot")
+    logger.setLevel(level)
 
-    c_handler.setFormatter(c_format)
-    f_handler.setFormatter(f_format)
+    key = (os.path.abspath(log_file), log_format)
+    with _lock:
+        if _state["key"] == key and _state["handler"] in logger.handlers:
+            return logger
+        _stop()
 
-    # Add handlers to the logger
-    logger.addHandler(c_handler)
-    logger.addHandler(f_handler)
+        log_queue = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        listener = QueueListener(log_queue, *_build_handlers(log_file, log_format), respect_handler_level=True)
+        listener.start()
+        logger.addHandler(handler)
+        _state.update(listener=listener, handler=handler, key=key)
 
     return logger
+
+
+def _stop():
+    listener, handler = _state["listener"], _state["handler"]
+    if handler:
+        logging.getLogger("trading_bot").removeHandler(handler)
+    if listener:
+        # Drains what is queued, then closes the file
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+    _state.update(listener=None, handler=None, key=None)
+
+
+def shutdown_logging():
+    """
+    Flushes queued records and stops the listener thread.
+    """
+    with _lock:
+        _stop()
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,384 @@
+"""
+Price-time priority matching engine behind the mock exchange. Usable in-process without HTTP.
+
+Each symbol has a limit order book (best price first, FIFO within a price). A configurable reference
+price stands in for the rest of the market: whatever the book can't fill of a marketable order is
+filled there, so MARKET orders always execute unless external liquidity is switched off. STOP and
+STOP_MARKET orders wait until the last trade price reaches their stop price, then execute as
+LIMIT or MARKET orders. Quantities and prices are Decimals internally and strings in responses,
+the way Binance returns them.
+"""
+import bisect
+import itertools
+import threading
+import time
+from collections import deque
+from decimal import Decimal, InvalidOperation
+
+# Reference prices used for symbols the caller doesn't configure
+DEFAULT_PRICES = {'BTCUSDT': '60000', 'ETHUSDT': '3000'}
+
+ORDER_TYPES = ('MARKET', 'LIMIT', 'STOP', 'STOP_MARKET')
+TIME_IN_FORCE = ('GTC', 'IOC', 'FOK', 'GTX')
+AVG_PRICE_STEP = Decimal('0.00000001')
+
+
+class OrderRejected(Exception):
+    """
+    The exchange refused the order; code and msg are Binance's error fields.
+    """
+    def __init__(self, code, msg):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+def _decimal(value, name, required=True):
+    if value in (None, ''):
+        if required:
+            raise OrderRejected(-1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise OrderRejected(-1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+    if number <= 0:
+        raise OrderRejected(-1102, f"Mandatory parameter '{name}' was not sent, was empty/null, or malformed.")
+    return number
+
+
+def _fmt(value):
+    if value is None:
+        return '0'
+    text = format(value, 'f')
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+class OrderBook:
+    """
+    Resting orders for one symbol. Each side keeps a sorted list of price keys (best first) and
+    a FIFO queue per price, so matching walks price levels in order and orders in arrival order.
+    """
+    def __init__(self):
+        self._keys = {'BUY': [], 'SELL': []}
+        self._levels = {'BUY': {}, 'SELL': {}}
+
+    @staticmethod
+    def _key(side, price):
+        # Bids sort highest first, asks lowest first
+        return -price if side == 'BUY' else price
+
+    def add(self, order):
+        side, price = order['side'], order['_price']
+        key = self._key(side, price)
+        level = self._levels[side].get(key)
+        if level is None:
+            level = self._levels[side][key] = deque()
+            bisect.insort(self._keys[side], key)
+        level.append(order)
+
+    def remove(self, order):
+        side = order['side']
+        key = self._key(side, order['_price'])
+        level = self._levels[side].get(key)
+        if level is None or order not in level:
+            return False
+        level.remove(order)
+        if not level:
+            self._drop_level(side, key)
+        return True
+
+    def _drop_level(self, side, key):
+        del self._levels[side][key]
+        self._keys[side].pop(bisect.bisect_left(self._keys[side], key))
+
+    def best(self, side):
+        keys = self._keys[side]
+        return abs(keys[0]) if keys else None
+
+    def crossing(self, taker_side, limit=None):
+        """
+        Yields resting orders a taker on taker_side can trade with, best price first.
+        """
+        side = 'SELL' if taker_side == 'BUY' else 'BUY'
+        for key in list(self._keys[side]):
+            price = abs(key)
+            if limit is not None and (price > limit if taker_side == 'BUY' else price < limit):
+                return
+            for order in list(self._levels[side].get(key, ())):
+                yield order
+
+    def depth(self, limit=10):
+        result = {}
+        for side, name in (('BUY', 'bids'), ('SELL', 'asks')):
+            rows = []
+            for key in self._keys[side][:limit]:
+                remaining = sum(o['_remaining'] for o in self._levels[side][key])
+                rows.append([_fmt(abs(key)), _fmt(remaining)])
+            result[name] = rows
+        return result
+
+
+class MatchingEngine:
+    """
+    Order books for several symbols. on_update(order, execution_type, last_qty, last_price) is
+    called for every state change (NEW, TRADE, CANCELED, EXPIRED), for makers as well as takers.
+    """
+    def __init__(self, symbols=None, prices=None, liquidity=True, on_update=None):
+        self.symbols = set(symbols) if symbols is not None else None
+        self.prices = {s: Decimal(str(p)) for s, p in dict(DEFAULT_PRICES, **(prices or {})).items()}
+        self.last_prices = dict(self.prices)
+        self.liquidity = liquidity
+        self.on_update = on_update
+        self.orders = {}
+        self.by_client_id = {}
+        self.trades = 0
+        self._books = {}
+        self._stops = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def book(self, symbol):
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = OrderBook()
+        return book
+
+    # Order entry -----------------------------------------------------------------------------
+
+    def submit(self, params):
+        """
+        Accepts one order in Binance REST parameters and returns its response dict.
+        Raises OrderRejected for anything the exchange would refuse.
+        """
+        order = self._new_order(params)
+        with self._lock:
+            if order['clientOrderId'] in self.by_client_id:
+                raise OrderRejected(-4116, "ClientOrderId is duplicated.")
+            if order['type'] in ('STOP', 'STOP_MARKET'):
+                last = self.last_prices.get(order['symbol'])
+                if last is not None and self._triggered(order, last):
+                    raise OrderRejected(-2021, "Order would immediately trigger.")
+                self._register(order)
+                self._stops.setdefault(order['symbol'], []).append(order)
+                self._notify(order, 'NEW')
+            else:
+                self._check_fillable(order)
+                self._register(order)
+                self._execute(order)
+            self._check_stops(order['symbol'])
+            return self.public(order)
+
+    def _new_order(self, params):
+        symbol = params.get('symbol')
+        if not symbol or (self.symbols is not None and symbol not in self.symbols):
+            raise OrderRejected(-1121, "Invalid symbol.")
+        order_type = (params.get('type') or '').upper()
+        if order_type not in ORDER_TYPES:
+            raise OrderRejected(-1116, "Invalid orderType.")
+        side = (params.get('side') or '').upper()
+        if side not in ('BUY', 'SELL'):
+            raise OrderRejected(-1117, "Invalid side.")
+        time_in_force = (params.get('timeInForce') or 'GTC').upper()
+        if time_in_force not in TIME_IN_FORCE:
+            raise OrderRejected(-1115, "Invalid timeInForce.")
+
+        quantity = _decimal(params.get('quantity'), 'quantity')
+        price = _decimal(params.get('price'), 'price', required=order_type in ('LIMIT', 'STOP'))
+        stop = _decimal(params.get('stopPrice') or params.get('triggerPrice'), 'stopPrice',
+                        required=order_type in ('STOP', 'STOP_MARKET'))
+        now = int(time.time() * 1000)
+        return {
+            'orderId': next(self._ids),
+            'symbol': symbol,
+            'status': 'NEW',
+            'clientOrderId': params.get('newClientOrderId') or params.get('clientAlgoId') or '',
+            'type': order_type,
+            'origType': order_type,
+            'side': side,
+            'timeInForce': time_in_force,
+            'reduceOnly': False,
+            'positionSide': 'BOTH',
+            'workingType': 'CONTRACT_PRICE',
+            'time': now,
+            'updateTime': now,
+            '_quantity': quantity,
+            '_remaining': quantity,
+            '_executed': Decimal(0),
+            '_quote': Decimal(0),
+            '_price': price,
+            '_stop': stop,
+        }
+
+    def _register(self, order):
+        self.orders[order['orderId']] = order
+        if order['clientOrderId']:
+            self.by_client_id[order['clientOrderId']] = order
+
+    @staticmethod
+    def _triggered(order, last):
+        return last >= order['_stop'] if order['side'] == 'BUY' else last <= order['_stop']
+
+    def _check_stops(self, symbol):
+        """
+        Fires stop orders whose stop price the last trade reached. Executions can move the price
+        again, so this repeats until nothing else triggers.
+        """
+        while True:
+            last = self.last_prices.get(symbol)
+            pending = self._stops.get(symbol)
+            if last is None or not pending:
+                return
+            fired = [order for order in pending if self._triggered(order, last)]
+            if not fired:
+                return
+            for order in fired:
+                pending.remove(order)
+                order['type'] = 'LIMIT' if order['type'] == 'STOP' else 'MARKET'
+                self._execute(order)
+
+    def _external_price(self, order):
+        """
+        The reference price if the order may take external liquidity there, else None.
+        """
+        reference = self.prices.get(order['symbol']) if self.liquidity else None
+        limit = order['_price'] if order['type'] == 'LIMIT' else None
+        if reference is None or limit is None:
+            return reference
+        return reference if (reference <= limit if order['side'] == 'BUY' else reference >= limit) else None
+
+    def _check_fillable(self, order):
+        """
+        Rejects post-only orders that would take liquidity and fill-or-kill orders that can't fill completely.
+        """
+        if order['type'] != 'LIMIT' or order['timeInForce'] not in ('GTX', 'FOK'):
+            return
+        external = self._external_price(order) is not None
+        makers = self.book(order['symbol']).crossing(order['side'], order['_price'])
+        if order['timeInForce'] == 'GTX' and (external or next(makers, None) is not None):
+            raise OrderRejected(-5022, "Due to the order could not be executed as maker, the Post Only order "
+                                       "will be rejected.")
+        if order['timeInForce'] == 'FOK' and not external and sum(m['_remaining'] for m in makers) < order['_remaining']:
+            raise OrderRejected(-5021, "Due to the order could not be filled immediately, the FOK order "
+                                       "has been rejected.")
+
+    def _execute(self, order):
+        book = self.book(order['symbol'])
+        limit = order['_price'] if order['type'] == 'LIMIT' else None
+
+        for maker in book.crossing(order['side'], limit):
+            if order['_remaining'] <= 0:
+                break
+            quantity = min(order['_remaining'], maker['_remaining'])
+            self._fill(maker, quantity, maker['_price'])
+            if maker['_remaining'] <= 0:
+                book.remove(maker)
+            self._fill(order, quantity, maker['_price'])
+            self.trades += 1
+
+        external = self._external_price(order)
+        if order['_remaining'] > 0 and external is not None:
+            self._fill(order, order['_remaining'], external)
+            self.trades += 1
+
+        if order['_remaining'] <= 0:
+            return
+        if order['type'] == 'MARKET' or order['timeInForce'] in ('IOC', 'FOK'):
+            # Unfilled remainder of an order that may not rest
+            self._finish(order, 'EXPIRED')
+        elif order['status'] == 'NEW':
+            book.add(order)
+            self._notify(order, 'NEW')
+        else:
+            book.add(order)
+
+    def _fill(self, order, quantity, price):
+        order['_remaining'] -= quantity
+        order['_executed'] += quantity
+        order['_quote'] += quantity * price
+        order['status'] = 'FILLED' if order['_remaining'] <= 0 else 'PARTIALLY_FILLED'
+        order['updateTime'] = int(time.time() * 1000)
+        self.last_prices[order['symbol']] = price
+        self._notify(order, 'TRADE', quantity, price)
+
+    def _finish(self, order, status):
+        order['status'] = status
+        order['updateTime'] = int(time.time() * 1000)
+        self._notify(order, status)
+
+    def _notify(self, order, execution_type, last_qty=None, last_price=None):
+        if self.on_update:
+            self.on_update(self.public(order), execution_type, _fmt(last_qty), _fmt(last_price))
+
+    # Cancels, market moves and queries ------------------------------------------------------
+
+    def cancel(self, order_id=None, client_order_id=None):
+        """
+        Cancels an open order by id or client id. Raises OrderRejected(-2011) if it isn't open.
+        """
+        with self._lock:
+            order = self.orders.get(int(order_id)) if order_id else None
+            if order is None and client_order_id:
+                order = self.by_client_id.get(client_order_id)
+            if order is None or order['status'] not in ('NEW', 'PARTIALLY_FILLED'):
+                raise OrderRejected(-2011, "Unknown order sent.")
+            if not self.book(order['symbol']).remove(order):
+                stops = self._stops.get(order['symbol'], [])
+                if order in stops:
+                    stops.remove(order)
+            self._finish(order, 'CANCELED')
+            return self.public(order)
+
+    def set_price(self, symbol, price):
+        """
+        Moves the reference market price. Resting limit orders the market trades through are filled
+        at their own price, and stops are checked against the new last price.
+        """
+        price = Decimal(str(price))
+        with self._lock:
+            self.prices[symbol] = price
+            self.last_prices[symbol] = price
+            if self.liquidity:
+                book = self.book(symbol)
+                for side, crosses in (('BUY', lambda p: p >= price), ('SELL', lambda p: p <= price)):
+                    while book.best(side) is not None and crosses(book.best(side)):
+                        maker = next(book.crossing('SELL' if side == 'BUY' else 'BUY'))
+                        book.remove(maker)
+                        self._fill(maker, maker['_remaining'], maker['_price'])
+                        self.trades += 1
+                self.last_prices[symbol] = price
+            self._check_stops(symbol)
+
+    def get(self, order_id=None, client_order_id=None):
+        with self._lock:
+            order = self.orders.get(int(order_id)) if order_id else None
+            if order is None and client_order_id:
+                order = self.by_client_id.get(client_order_id)
+            return self.public(order) if order else None
+
+    def open_orders(self, symbol=None):
+        with self._lock:
+            return [self.public(o) for o in self.orders.values()
+                    if o['status'] in ('NEW', 'PARTIALLY_FILLED') and (symbol is None or o['symbol'] == symbol)]
+
+    def depth(self, symbol, limit=10):
+        with self._lock:
+            return self.book(symbol).depth(limit)
+
+    @staticmethod
+    def public(order):
+        """
+        The order as the REST API returns it, without the engine's internal fields.
+        """
+        executed = order['_executed']
+        result = {k: v for k, v in order.items() if not k.startswith('_')}
+        result.update({
+            'type': order['origType'],
+            'price': _fmt(order['_price']),
+            'stopPrice': _fmt(order['_stop']),
+            'origQty': _fmt(order['_quantity']),
+            'executedQty': _fmt(executed),
+            'cumQuote': _fmt(order['_quote']),
+            'avgPrice': _fmt((order['_quote'] / executed).quantize(AVG_PRICE_STEP)) if executed else '0',
+        })
+        return result
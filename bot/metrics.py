@@ -0,0 +1,178 @@
+"""
+Low-overhead latency histograms for the order path, rendered in the Prometheus text format.
+"""
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds; an order's stages range from microseconds (validation) to seconds (exchange)
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect and four updates under a lock, so it is cheap
+    enough to call on every order.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, q):
+        """
+        Estimates the q-quantile by interpolating inside the bucket that holds it.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            largest = self.max
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else largest
+                return min(largest, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return largest
+
+    def snapshot(self):
+        with self._lock:
+            return {"count": self.count, "sum": self.sum, "max": self.max, "counts": list(self.counts)}
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class HistogramFamily:
+    """
+    Histograms sharing a metric name, one per combination of label values.
+    """
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def children(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def reset(self):
+        with self._lock:
+            self._children.clear()
+
+
+STAGE_SECONDS = HistogramFamily("trading_bot_stage_seconds",
+                                "Time spent in each stage of placing an order.", ("stage",))
+REQUEST_SECONDS = HistogramFamily("trading_bot_http_request_seconds",
+                                  "HTTP request latency by route.", ("method", "route", "status"))
+
+
+def timer(stage):
+    """
+    Context manager recording the time spent in an order-path stage:
+    validate, client, rate_limit, exchange, db_log, render or trigger (evaluating a price tick).
+    """
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(gauges=None, families=(STAGE_SECONDS, REQUEST_SECONDS)):
+    """
+    Returns the Prometheus text exposition of the histograms plus gauges,
+    a dict of name -> (help, value).
+    """
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} histogram")
+        for values, histogram in family.children():
+            pairs = list(zip(family.labelnames, values))
+            snap = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), snap["counts"]):
+                cumulative += count
+                lines.append(f"{family.name}_bucket{_labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{family.name}_sum{_labels(pairs)} {_format_value(snap['sum'])}")
+            lines.append(f"{family.name}_count{_labels(pairs)} {snap['count']}")
+    for name, (help_text, value) in (gauges or {}).items():
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def summary(family=STAGE_SECONDS):
+    """
+    Returns rows of (labels, count, mean_ms, p50_ms, p99_ms, max_ms) for a human-readable report.
+    """
+    rows = []
+    for values, histogram in family.children():
+        snap = histogram.snapshot()
+        if not snap["count"]:
+            continue
+        rows.append(("/".join(values), snap["count"], snap["sum"] / snap["count"] * 1000,
+                     histogram.quantile(0.5) * 1000, histogram.quantile(0.99) * 1000, snap["max"] * 1000))
+    return rows
+
+
+def format_summary(family=STAGE_SECONDS):
+    rows = summary(family)
+    if not rows:
+        return "No timings recorded."
+    lines = [f"{'stage':<12}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for name, count, mean, p50, p99, largest in rows:
+        lines.append(f"{name:<12}{count:>7}{mean:10.3f}{p50:10.3f}{p99:10.3f}{largest:10.3f}")
+    return "\n".join(lines)
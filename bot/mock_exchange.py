@@ -0,0 +1,411 @@
+"""
+Local stand-in for the Binance USD-M Futures REST API, used for load tests and offline runs.
+Point BinanceFuturesClient at it with base_url=exchange.url (or BINANCE_FUTURES_URL).
+Orders go through bot.matching.MatchingEngine, so they rest, fill and trigger like on the exchange.
+"""
+import asyncio
+import collections
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import websockets
+from websockets.asyncio.server import serve
+
+from .matching import MatchingEngine, OrderRejected
+
+logger = logging.getLogger("trading_bot.mock_exchange")
+
+def symbol_info(symbol, tick_size, step_size, min_qty, max_qty, min_notional, min_price='0.10', max_price='1000000'):
+    """
+    exchangeInfo entry in the shape Binance returns it.
+    """
+    return {
+        'symbol': symbol,
+        'status': 'TRADING',
+        'contractType': 'PERPETUAL',
+        'filters': [
+            {'filterType': 'PRICE_FILTER', 'minPrice': min_price, 'maxPrice': max_price, 'tickSize': tick_size},
+            {'filterType': 'LOT_SIZE', 'stepSize': step_size, 'minQty': min_qty, 'maxQty': max_qty},
+            {'filterType': 'MARKET_LOT_SIZE', 'stepSize': step_size, 'minQty': min_qty, 'maxQty': max_qty},
+            {'filterType': 'MIN_NOTIONAL', 'notional': min_notional},
+        ],
+    }
+
+DEFAULT_SYMBOLS = [
+    symbol_info('BTCUSDT', '0.10', '0.001', '0.001', '1000', '100'),
+    symbol_info('ETHUSDT', '0.01', '0.001', '0.001', '10000', '20'),
+]
+
+# Request weight per endpoint where it differs from 1
+ENDPOINT_WEIGHTS = {
+    '/fapi/v1/batchOrders': 5,
+}
+ORDER_ENDPOINTS = ('/fapi/v1/order', '/fapi/v1/algoOrder', '/fapi/v1/batchOrders')
+SERVER_ERROR = (503, -1001, 'Internal error; unable to process your request. Please try again.')
+ALGO_ENDPOINT = '/fapi/v1/algoOrder'
+# algoStatus for the engine's order statuses; a stop that traded has triggered
+ALGO_STATUSES = {'NEW': 'NEW', 'CANCELED': 'CANCELED', 'EXPIRED': 'EXPIRED', 'PARTIALLY_FILLED': 'TRIGGERED',
+                 'FILLED': 'FINISHED'}
+
+def algo_order(order):
+    """
+    An engine order in the shape the algoOrder endpoint returns it: conditional orders are known
+    there by algoId and clientAlgoId and report algoStatus instead of status.
+    """
+    return {
+        'algoId': order['orderId'],
+        'clientAlgoId': order['clientOrderId'],
+        'algoType': 'CONDITIONAL',
+        'orderType': order['type'],
+        'symbol': order['symbol'],
+        'side': order['side'],
+        'positionSide': order['positionSide'],
+        'timeInForce': order['timeInForce'],
+        'quantity': order['origQty'],
+        'algoStatus': ALGO_STATUSES.get(order['status'], order['status']),
+        'triggerPrice': order['stopPrice'],
+        'price': order['price'],
+        'workingType': order['workingType'],
+        'reduceOnly': order['reduceOnly'],
+        'closePosition': False,
+        'priceProtect': False,
+        'createTime': order['time'],
+        'updateTime': order['updateTime'],
+    }
+
+
+class MockExchange:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, symbols=None, rate_limits=None, retry_after=1,
+                 user_stream=False, prices=None, liquidity=True, latency_jitter=0.0, error_rate=0.0, seed=None):
+        """
+        latency: seconds each request waits before responding, to mimic the exchange round-trip.
+        latency_jitter: extra random delay, uniform between 0 and this many seconds.
+        symbols: exchangeInfo symbol entries (defaults to BTCUSDT and ETHUSDT).
+        rate_limits: (name, kind, limit, window seconds, header) entries, as in
+            bot.client.FUTURES_RATE_LIMITS, enforced like Binance does: fixed clock-aligned windows,
+            usage reported in the headers and HTTP 429 with Retry-After once a limit is exceeded.
+        user_stream: also serve websockets at .ws_url: the user data stream, with an ORDER_TRADE_UPDATE
+            event whenever an order is created or changes, and combined market streams (/stream) with a
+            markPriceUpdate whenever set_price() moves a symbol.
+        prices: reference price per symbol, where marketable orders the book can't fill are filled.
+        liquidity: False to fill only against resting orders; MARKET orders then expire unfilled.
+        error_rate: fraction of order requests answered with a 503 without being processed.
+        seed: seeds the jitter and error injection, for repeatable runs.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.symbols = symbols if symbols is not None else DEFAULT_SYMBOLS
+        self.rate_limits = rate_limits or []
+        self.retry_after = retry_after
+        self._usage = {}
+        self.rejected = 0
+        self.errors = 0
+        self._injected = collections.deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.engine = MatchingEngine(symbols={s['symbol'] for s in self.symbols}, prices=prices,
+                                     liquidity=liquidity, on_update=self._order_event)
+        self.orders = self.engine.orders
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+        self.user_stream = user_stream
+        self.listen_keys = set()
+        self._ws_host = host
+        self._ws_port = None
+        self._ws_loop = None
+        self._ws_server = None
+        self._ws_clients = set()
+        self._market_clients = set()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ws_url(self):
+        return f"ws://{self._ws_host}:{self._ws_port}" if self._ws_port else None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-exchange", daemon=True)
+        self._thread.start()
+        if self.user_stream:
+            self._start_user_stream()
+        logger.info("Mock exchange listening on %s", self.url)
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._ws_loop:
+            asyncio.run_coroutine_threadsafe(self._close_user_stream(), self._ws_loop).result(5)
+            self._ws_loop.call_soon_threadsafe(self._ws_loop.stop)
+
+    def _start_user_stream(self):
+        started = threading.Event()
+
+        async def handler(connection):
+            if connection.request.path.startswith('/stream'):
+                await self._serve_market_stream(connection)
+                return
+            self._ws_clients.add(connection)
+            try:
+                await connection.wait_closed()
+            finally:
+                self._ws_clients.discard(connection)
+
+        async def open_server():
+            self._ws_server = await serve(handler, self._ws_host, 0)
+            self._ws_port = self._ws_server.sockets[0].getsockname()[1]
+
+        def run():
+            self._ws_loop = asyncio.new_event_loop()
+            self._ws_loop.run_until_complete(open_server())
+            started.set()
+            self._ws_loop.run_forever()
+
+        threading.Thread(target=run, name="mock-exchange-ws", daemon=True).start()
+        started.wait(5)
+
+    async def _close_user_stream(self):
+        self._ws_server.close()
+        await self._ws_server.wait_closed()
+
+    async def _serve_market_stream(self, connection):
+        # Every client gets every symbol's updates; SUBSCRIBE requests are just acknowledged
+        self._market_clients.add(connection)
+        try:
+            async for message in connection:
+                request = json.loads(message)
+                await connection.send(json.dumps({'result': None, 'id': request.get('id')}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._market_clients.discard(connection)
+
+    def push_event(self, event, clients=None):
+        """
+        Sends a user data stream event to every connected websocket client.
+        """
+        if self._ws_loop:
+            message = json.dumps(event)
+            clients = self._ws_clients if clients is None else clients
+            self._ws_loop.call_soon_threadsafe(lambda: websockets.broadcast(set(clients), message))
+
+    def _order_event(self, order, execution_type, last_qty='0', last_price='0'):
+        now = int(time.time() * 1000)
+        self.push_event({
+            'e': 'ORDER_TRADE_UPDATE', 'E': now, 'T': now,
+            'o': {
+                's': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'],
+                'f': order['timeInForce'], 'q': order['origQty'], 'p': order['price'], 'ap': order['avgPrice'],
+                'sp': order['stopPrice'], 'x': execution_type, 'X': order['status'], 'i': order['orderId'],
+                'l': last_qty, 'z': order['executedQty'], 'L': last_price, 'T': order['updateTime'],
+            },
+        })
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def create_order(self, params):
+        """
+        Submits one order to the matching engine. Returns (status, payload) like route().
+        """
+        try:
+            return 200, self.engine.submit(params)
+        except OrderRejected as e:
+            return 400, {'code': e.code, 'msg': e.msg}
+
+    def set_price(self, symbol, price):
+        """
+        Moves the market: fills resting orders it trades through, fires stops it reaches and
+        publishes the new mark price on the market streams.
+        """
+        self.engine.set_price(symbol, price)
+        now = int(time.time() * 1000)
+        self.push_event({'stream': f"{symbol.lower()}@markPrice@1s",
+                         'data': {'e': 'markPriceUpdate', 'E': now, 's': symbol, 'p': str(price)}},
+                        self._market_clients)
+
+    def inject_errors(self, count=1, status=SERVER_ERROR[0], code=SERVER_ERROR[1], msg=SERVER_ERROR[2],
+                      executed=False):
+        """
+        Fails the next count order requests with the given error. With executed=True the order is
+        still processed before the error is returned, like a response lost after the exchange acted.
+        """
+        with self._lock:
+            self._injected.extend([(status, code, msg, executed)] * count)
+
+    def _injected_error(self, method, path):
+        if method != 'POST' or path not in ORDER_ENDPOINTS:
+            return None
+        with self._lock:
+            if self._injected:
+                return self._injected.popleft()
+        if self.error_rate and self._random.random() < self.error_rate:
+            return SERVER_ERROR + (False,)
+        return None
+
+    def charge(self, method, path, params):
+        """
+        Counts a request against the rate limits. Returns (headers, rejected).
+        """
+        weight = ENDPOINT_WEIGHTS.get(path, 1)
+        orders = 0
+        if method == 'POST' and path in ORDER_ENDPOINTS:
+            orders = len(json.loads(params.get('batchOrders', '[]'))) if path.endswith('batchOrders') else 1
+
+        now = time.time()
+        headers = {}
+        rejected = False
+        with self._lock:
+            for name, kind, limit, window, header in self.rate_limits:
+                window_id = int(now // window)
+                used = self._usage.get(name)
+                used = used[1] if used and used[0] == window_id else 0
+                used += weight if kind == 'weight' else orders
+                self._usage[name] = (window_id, used)
+                headers[header] = str(used)
+                rejected = rejected or used > limit
+            if rejected:
+                self.rejected += 1
+        return headers, rejected
+
+    def cancel_order(self, params):
+        try:
+            return 200, self.engine.cancel(params.get('orderId'), params.get('origClientOrderId'))
+        except OrderRejected as e:
+            return 400, {'code': e.code, 'msg': e.msg}
+
+    def _algo(self, method, params):
+        """
+        Conditional orders on the algoOrder endpoint, answered in its algoId/algoStatus shape.
+        """
+        if method == 'POST':
+            status, payload = self.create_order(params)
+            return status, algo_order(payload) if status == 200 else payload
+        algo_id, client_algo_id = params.get('algoId'), params.get('clientAlgoId')
+        if method == 'GET':
+            order = self.engine.get(algo_id, client_algo_id)
+            return (200, algo_order(order)) if order else (400, {'code': -2013, 'msg': 'Order does not exist.'})
+        if method == 'DELETE':
+            try:
+                order = self.engine.cancel(algo_id, client_algo_id)
+            except OrderRejected as e:
+                return 400, {'code': e.code, 'msg': e.msg}
+            return 200, {'algoId': order['orderId'], 'clientAlgoId': order['clientOrderId'], 'code': '200',
+                         'msg': 'success'}
+        return 404, {'code': -1000, 'msg': f"Unknown endpoint {method} {ALGO_ENDPOINT}"}
+
+    def _batch(self, params):
+        results = []
+        for order in json.loads(params.get('batchOrders', '[]')):
+            status, payload = self.create_order(order)
+            results.append(payload)
+        return 200, results
+
+    def route(self, method, path, params):
+        """
+        Returns (status, payload) for a REST call.
+        """
+        if path == '/fapi/v1/ping':
+            return 200, {}
+        if path == '/fapi/v1/time':
+            return 200, {'serverTime': int(time.time() * 1000)}
+        if path == '/fapi/v1/exchangeInfo':
+            return 200, {'timezone': 'UTC', 'serverTime': int(time.time() * 1000), 'symbols': self.symbols}
+        if path == ALGO_ENDPOINT:
+            return self._algo(method, params)
+        if method == 'POST' and path == '/fapi/v1/order':
+            return self.create_order(params)
+        if method == 'POST' and path == '/fapi/v1/batchOrders':
+            return self._batch(params)
+        if method == 'DELETE' and path == '/fapi/v1/order':
+            return self.cancel_order(params)
+        if method == 'GET' and path == '/fapi/v1/order':
+            order = self.engine.get(params.get('orderId'), params.get('origClientOrderId'))
+            return (200, order) if order else (400, {'code': -2013, 'msg': 'Order does not exist.'})
+        if method == 'GET' and path == '/fapi/v1/openOrders':
+            return 200, self.engine.open_orders(params.get('symbol'))
+        if method == 'GET' and path == '/fapi/v1/depth':
+            return 200, dict(self.engine.depth(params.get('symbol'), int(params.get('limit', 10))),
+                             lastUpdateId=self.engine.trades, E=int(time.time() * 1000))
+        if path == '/fapi/v1/listenKey':
+            if method == 'POST':
+                listen_key = uuid.uuid4().hex
+                self.listen_keys.add(listen_key)
+                return 200, {'listenKey': listen_key}
+            if params.get('listenKey') not in self.listen_keys:
+                return 400, {'code': -1125, 'msg': 'This listenKey does not exist.'}
+            if method == 'DELETE':
+                self.listen_keys.discard(params['listenKey'])
+            return 200, {}
+        return 404, {'code': -1000, 'msg': f"Unknown endpoint {method} {path}"}
+
+    def _handler_class(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self, method):
+                parsed = urlparse(self.path)
+                params = dict(parse_qsl(parsed.query))
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    params.update(parse_qsl(self.rfile.read(length).decode()))
+
+                delay = exchange.latency + exchange.latency_jitter * exchange._random.random()
+                if delay:
+                    time.sleep(delay)
+                headers, rejected = exchange.charge(method, parsed.path, params)
+                if rejected:
+                    status, payload = 429, {'code': -1003, 'msg': 'Too many requests; please use the websocket for live updates.'}
+                    headers['Retry-After'] = str(exchange.retry_after)
+                elif (error := exchange._injected_error(method, parsed.path)) is not None:
+                    status, code, msg, executed = error
+                    if executed:
+                        exchange.route(method, parsed.path, params)
+                    with exchange._lock:
+                        exchange.errors += 1
+                    payload = {'code': code, 'msg': msg}
+                else:
+                    status, payload = exchange.route(method, parsed.path, params)
+
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -1,38 +1,189 @@
+import csv
+import io
 import json
-from .client import BinanceFuturesClient
+from .metrics import timer
 import logging
 
 logger = logging.getLogger("trading_bot.orders")
 
+def load_batch_file(path, file_format=None):
+    """
+    Reads orders from a CSV (header row) or JSONL (one object per line) file.
+    Columns: symbol, side, type (or order_type), quantity, price, stop_price.
+    The format is taken from the extension unless file_format is given.
+    Returns a list of dicts with symbol, side, type, quantity and optional price/stop_price.
+    """
+    file_format = (file_format or path.rsplit('.', 1)[-1]).lower()
+    with open(path, newline='') as f:
+        if file_format == 'csv':
+            rows = list(csv.DictReader(f))
+        elif file_format in ('jsonl', 'ndjson', 'json'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f"Unsupported batch file format: {file_format}")
+
+    orders = []
+    for line, row in enumerate(rows, start=1):
+        row = {k.strip().lower(): v for k, v in row.items() if k}
+        if 'order_type' in row and 'type' not in row:
+            row['type'] = row.pop('order_type')
+        try:
+            order = {
+                'symbol': str(row['symbol']).strip().upper(),
+                'side': str(row['side']).strip().upper(),
+                'type': str(row['type']).strip().upper(),
+                'quantity': float(row['quantity']),
+            }
+            for key in ('price', 'stop_price'):
+                if row.get(key) not in (None, ''):
+                    order[key] = float(row[key])
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Invalid order on line {line}: {e}")
+        orders.append(order)
+    return orders
+
+def place_validated_batch(client, orders):
+    """
+    Validates and rounds orders against the cached exchange filters, sends only the valid ones
+    through client.place_batch_orders, and returns one result per input order.
+    """
+    from .exchange_info import get_exchange_filters
+    filters = get_exchange_filters(client)
+    if not filters:
+        return client.place_batch_orders(orders)
+
+    results = [None] * len(orders)
+    valid = []
+    for i, (normalized, error) in enumerate(filters.validate_orders(orders)):
+        if error:
+            results[i] = {"order": orders[i], "error": error}
+        else:
+            valid.append((i, normalized))
+
+    if valid:
+        for (i, _), result in zip(valid, client.place_batch_orders([order for _, order in valid])):
+            results[i] = result
+    return results
+
+def batch_log_entries(results, account=None):
+    """
+    Turns place_batch_orders results into (order_data, response) pairs for database.log_orders.
+    Rejected orders are kept with status REJECTED so the whole batch is reconcilable from history.
+    """
+    entries = []
+    for result in results:
+        order = result['order']
+        order_data = {k: order.get(k) for k in ('symbol', 'side', 'type', 'quantity', 'price')}
+        order_data['account'] = account
+        if 'error' in result:
+            response = {'status': 'REJECTED', 'code': result.get('code'), 'msg': result['error']}
+        else:
+            response = dict(result['response'])
+        if order.get('stop_price'):
+            response['stopPrice'] = order['stop_price']
+        entries.append((order_data, response))
+    return entries
+
 class OrderManager:
-    def __init__(self):
-        self.client = BinanceFuturesClient(testnet=True)
+    def __init__(self, client=None, out=None):
+        # Imported here: python-binance takes about a second to import, and file parsing,
+        # logging and the daemon's thin client never need it
+        from .client import get_client
+        # Shared, pre-warmed client from the registry unless the caller supplies one
+        with timer("client"):
+            self.client = client or get_client(testnet=True)
+        # Where the progress and summary lines go (stdout by default; the daemon sends them back)
+        self.out = out
 
     def execute_order(self, symbol, side, order_type, quantity, price=None, stop_price=None):
         try:
+            # Check tick/step size and min notional locally before spending a round-trip
+            from .exchange_info import get_exchange_filters
+            with timer("validate"):
+                filters = get_exchange_filters(self.client)
+                if filters:
+                    quantity, price, stop_price = filters.validate_order(symbol, side, order_type, quantity, price, stop_price)
+
             # Pass stop_price to client if it's there
-            print(f"Executing order: {symbol} {side} {order_type} Qty={quantity} Price={price} Stop={stop_price}")
+            print(f"Executing order: {symbol} {side} {order_type} Qty={quantity} Price={price} Stop={stop_price}", file=self.out)
             response = self.client.place_order(symbol, side, order_type, quantity, price=price, stop_price=stop_price)
             if response:
                 self._print_order_summary(response)
             return response
         except Exception as e:
-            logger.error(f"Order execution failed: {e}")
-            print(f"❌ Order failed: {e}")
+            logger.error("Order execution failed: %s", e)
+            print(f"❌ Order failed: {e}", file=self.out)
             return None
 
+    def execute_batch(self, orders):
+        """
+        Places a list of orders through the batch API and prints one line per order.
+        Returns the per-order results from BinanceFuturesClient.place_batch_orders.
+        """
+        print(f"Executing batch of {len(orders)} orders", file=self.out)
+        try:
+            results = place_validated_batch(self.client, orders)
+        except Exception as e:
+            logger.error("Batch execution failed: %s", e)
+            print(f"❌ Batch failed: {e}", file=self.out)
+            return []
+
+        for n, result in enumerate(results, start=1):
+            order = result['order']
+            label = f"#{n:<4} {order['symbol']} {order['side']} {order['type']} Qty={order['quantity']}"
+            if 'error' in result:
+                print(f"❌ {label} -> {result['error']}", file=self.out)
+            else:
+                response = result['response']
+                print(f"✅ {label} -> {response.get('status', response.get('algoStatus'))} "
+                      f"ID: {response.get('orderId', response.get('algoId'))}", file=self.out)
+        placed = sum(1 for r in results if 'response' in r)
+        print(f"\n{placed}/{len(results)} orders placed.", file=self.out)
+        return results
+
     def _print_order_summary(self, response):
         """
         Prints a user-friendly summary of the order response.
         """
-        print("\n✅ Order Placed Successfully!")
-        print("-" * 30)
-        print(f"Order ID:      {response.get('orderId')}")
-        print(f"Symbol:        {response.get('symbol')}")
-        print(f"Side:          {response.get('side')}")
-        print(f"Type:          {response.get('type')}")
-        print(f"Status:        {response.get('status')}")
-        print(f"Orig Qty:      {response.get('origQty')}")
-        print(f"Executed Qty:  {response.get('executedQty')}")
-        print(f"Avg Price:     {response.get('avgPrice')}")
-        print("-" * 30)
+        print("\n✅ Order Placed Successfully!", file=self.out)
+        print("-" * 30, file=self.out)
+        print(f"Order ID:      {response.get('orderId', response.get('algoId'))}", file=self.out)
+        print(f"Symbol:        {response.get('symbol')}", file=self.out)
+        print(f"Side:          {response.get('side')}", file=self.out)
+        print(f"Type:          {response.get('type', response.get('orderType'))}", file=self.out)
+        print(f"Status:        {response.get('status', response.get('algoStatus'))}", file=self.out)
+        print(f"Orig Qty:      {response.get('origQty', response.get('quantity'))}", file=self.out)
+        print(f"Executed Qty:  {response.get('executedQty')}", file=self.out)
+        print(f"Avg Price:     {response.get('avgPrice')}", file=self.out)
+        print("-" * 30, file=self.out)
+
+def execute_for_accounts(accounts, run, out=None):
+    """
+    Calls run(manager) with an OrderManager for each named account, all accounts in parallel, then
+    prints each account's output as one block. Returns the results by account name.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from .accounts import account_client
+
+    def execute(name):
+        buffer = io.StringIO()
+        try:
+            return buffer, run(OrderManager(account_client(name), out=buffer))
+        except Exception as e:
+            logger.error("Account %s failed: %s", name, e)
+            print(f"❌ {e}", file=buffer)
+            return buffer, None
+
+    with ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+        outcomes = list(pool.map(execute, accounts))
+
+    results = {}
+    for name, (buffer, result) in zip(accounts, outcomes):
+        if len(accounts) > 1:
+            print(f"[{name}]", file=out)
+        print(buffer.getvalue(), end='', file=out)
+        results[name] = result
+    if len(accounts) > 1:
+        placed = sum(1 for result in results.values() if result)
+        print(f"\nPlaced on {placed}/{len(accounts)} accounts.", file=out)
+    return results
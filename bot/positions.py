@@ -0,0 +1,108 @@
+"""
+Position book: net quantity, average entry and realized PnL per account and symbol, kept current
+from the fills table instead of recomputed from the order history.
+
+Each fill is applied once, in fill id order, with average-cost accounting: fills that add to a
+position re-average the entry, fills that reduce it realize (price - entry) on the closed quantity,
+and a fill that crosses zero opens the remainder at its own price. Fees are not included.
+
+The book is persisted as the positions snapshot table together with the last fill it includes, so a
+restart loads the snapshot and applies only the fills logged since.
+"""
+import logging
+import threading
+from datetime import datetime
+
+from .database import FILLS_PAGE_SIZE, get_fills, load_positions, save_positions
+
+logger = logging.getLogger("trading_bot.positions")
+
+# Net quantities closer to zero than this are a closed position (float residue of partial fills)
+QTY_EPSILON = 1e-9
+
+
+def apply_fill(position, side, qty, price):
+    """
+    Applies one fill to a position dict (net_qty, avg_entry, realized_pnl) in place.
+    """
+    net_qty, avg_entry = position['net_qty'], position['avg_entry']
+    signed = qty if side == 'BUY' else -qty
+    new_qty = net_qty + signed
+    if net_qty == 0 or (net_qty > 0) == (signed > 0):
+        position['avg_entry'] = (abs(net_qty) * avg_entry + qty * price) / abs(new_qty)
+    else:
+        closed = min(qty, abs(net_qty))
+        position['realized_pnl'] += closed * (price - avg_entry) * (1 if net_qty > 0 else -1)
+        if abs(new_qty) < QTY_EPSILON:
+            new_qty = 0.0
+            position['avg_entry'] = 0.0
+        elif (new_qty > 0) != (net_qty > 0):
+            position['avg_entry'] = price
+    position['net_qty'] = new_qty
+    return position
+
+
+class PositionBook:
+    """
+    In-memory positions by (account, symbol). refresh() applies new fills and saves the rows they
+    changed; reads never touch the orders table, so they cost O(symbols).
+    """
+    def __init__(self):
+        self.last_fill_id = 0
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Loads the snapshot, then applies the fills logged after it.
+        """
+        rows, last_fill_id = load_positions()
+        with self._lock:
+            self._positions = {(row['account'], row['symbol']): row for row in rows}
+            self.last_fill_id = last_fill_id
+        changed = self.refresh()
+        logger.info("Loaded %d positions from snapshot at fill %d, applied %d changed since",
+                    len(rows), last_fill_id, len(changed))
+        return self
+
+    def refresh(self):
+        """
+        Applies the fills logged since the last refresh and persists the positions they changed.
+        Returns the changed positions.
+        """
+        with self._lock:
+            changed = {}
+            while True:
+                fills = get_fills(self.last_fill_id, FILLS_PAGE_SIZE)
+                for fill_id, account, symbol, side, qty, price in fills:
+                    key = (account, symbol)
+                    position = self._positions.get(key)
+                    if position is None:
+                        position = self._positions[key] = {'account': account, 'symbol': symbol, 'net_qty': 0.0,
+                                                           'avg_entry': 0.0, 'realized_pnl': 0.0, 'updated': None}
+                    apply_fill(position, side, qty, price)
+                    changed[key] = position
+                    self.last_fill_id = fill_id
+                if len(fills) < FILLS_PAGE_SIZE:
+                    break
+            if not changed:
+                return []
+            updated = datetime.now().isoformat()
+            for position in changed.values():
+                position['updated'] = updated
+            save_positions(changed.values(), self.last_fill_id)
+            return [dict(position) for position in changed.values()]
+
+    def positions(self, account=None, prices=None):
+        """
+        Returns the positions (optionally of one account), by account and symbol. With prices
+        ({symbol: mark price}), open positions also get their unrealized PnL.
+        """
+        with self._lock:
+            rows = [dict(position) for (name, _), position in sorted(self._positions.items())
+                    if account is None or name == account]
+        for row in rows:
+            price = (prices or {}).get(row['symbol'])
+            row['mark_price'] = price
+            row['unrealized_pnl'] = row['net_qty'] * (price - row['avg_entry']) if price and row['net_qty'] else None
+        return rows
@@ -0,0 +1,127 @@
+"""
+Opt-in per-request profiler that can be switched on in a running server to capture slow requests.
+"""
+import cProfile
+import collections
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+
+from .database import DATA_DIR
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:
+    _Pyinstrument = None
+
+logger = logging.getLogger("trading_bot.profiling")
+
+# Profiles kept on disk; older captures are deleted
+MAX_PROFILES = 20
+# Long-lived streams would hold the profiler for their whole lifetime
+PROFILE_EXCLUDE = ("/events", "/static/")
+
+
+class RequestProfiler:
+    """
+    Wraps requests in cProfile (or pyinstrument, which also follows awaits, when installed) while
+    enabled, and keeps a profile of each request slower than threshold_ms. Only one request is
+    profiled at a time; requests arriving meanwhile run unprofiled, although their work on the
+    event loop is included in the capture. Work handed to the threadpool shows up as waiting on it.
+    """
+    def __init__(self, directory=None, enabled=False, threshold_ms=0.0, path_prefix="/", keep=MAX_PROFILES):
+        self.directory = directory or os.path.join(DATA_DIR if os.path.exists(DATA_DIR) else '.', 'profiles')
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.path_prefix = path_prefix
+        self.keep = keep
+        self.captures = collections.deque()
+        self.profiled = 0
+        self._busy = threading.Lock()
+
+    def configure(self, enabled=None, threshold_ms=None, path_prefix=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if threshold_ms is not None:
+            self.threshold_ms = max(0.0, threshold_ms)
+        if path_prefix is not None:
+            self.path_prefix = path_prefix
+        logger.info("Request profiling %s (threshold=%sms, prefix=%s)", 'enabled' if self.enabled else 'disabled',
+                    self.threshold_ms, self.path_prefix)
+        return self.status()
+
+    def profile(self, path):
+        """
+        Returns a context manager profiling the block if profiling is on and nothing else is being profiled.
+        """
+        if (not self.enabled or not path.startswith(self.path_prefix) or path.startswith(PROFILE_EXCLUDE)
+                or not self._busy.acquire(blocking=False)):
+            return nullcontext()
+        return _Capture(self, path)
+
+    def _save(self, profiler, path, duration_ms):
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{self.profiled}-{int(duration_ms)}ms-{slug}"
+        if _Pyinstrument and isinstance(profiler, _Pyinstrument):
+            filename = os.path.join(self.directory, name + ".html")
+            with open(filename, "w") as f:
+                f.write(profiler.output_html())
+        else:
+            filename = os.path.join(self.directory, name + ".prof")
+            profiler.dump_stats(filename)
+        self.captures.append({"path": path, "duration_ms": round(duration_ms, 3), "file": filename})
+        while len(self.captures) > self.keep:
+            old = self.captures.popleft()
+            try:
+                os.remove(old["file"])
+            except OSError:
+                pass
+        logger.info("Saved profile of %s (%.1fms) to %s", path, duration_ms, filename)
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "path_prefix": self.path_prefix,
+            "profiler": "pyinstrument" if _Pyinstrument else "cProfile",
+            "profiled": self.profiled,
+            "captures": list(self.captures),
+        }
+
+
+class _Capture:
+    def __init__(self, owner, path):
+        self.owner = owner
+        self.path = path
+        self.profiler = _Pyinstrument(async_mode="enabled") if _Pyinstrument else cProfile.Profile()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        try:
+            if _Pyinstrument:
+                self.profiler.start()
+            else:
+                self.profiler.enable()
+        except Exception:
+            self.owner._busy.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if _Pyinstrument:
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+            duration_ms = (time.perf_counter() - self.start) * 1000
+            self.owner.profiled += 1
+            if duration_ms >= self.owner.threshold_ms:
+                self.owner._save(self.profiler, self.path, duration_ms)
+        except Exception as e:
+            logger.warning("Could not save request profile: %s", e)
+        finally:
+            self.owner._busy.release()
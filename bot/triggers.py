@@ -0,0 +1,560 @@
+"""
+Client-side conditional orders: hidden stops, take-profits, trailing stops and OCO pairs that stay in
+this process and only reach the exchange as MARKET orders once the price stream crosses them.
+
+Per symbol and side, fixed trigger levels sit in two heaps, one for triggers that fire as the price
+rises and one for those that fire as it falls, so a tick pops just the crossed entries: O(k log n)
+for k fired out of n resting. Trailing stops are grouped by callback rate; inside a group, stops that
+share a peak share a bucket in a sorted array, so a new high merges buckets instead of touching every stop.
+Sell-side triggers are evaluated against the bid and buy-side ones against the ask (both are the mark
+price on the markPrice stream).
+"""
+import asyncio
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+
+from .metrics import timer
+from .user_stream import USER_STREAM_URLS, MAX_RECONNECT_DELAY
+
+logger = logging.getLogger("trading_bot.triggers")
+
+# "markPrice" (1s mark price updates) or "bookTicker" (every best bid/ask change)
+TRIGGER_PRICE_STREAM = os.getenv("TRIGGER_PRICE_STREAM", "markPrice")
+# Fired orders placed concurrently; more wait in the executor's queue
+TRIGGER_WORKERS = int(os.getenv("TRIGGER_WORKERS", "8"))
+# Cancelled entries are left in the heaps and skipped; rebuild once they outnumber live ones
+COMPACT_MIN_STALE = 1024
+# Fired and cancelled triggers kept for queries before the oldest are forgotten
+FINISHED_TRIGGERS_KEPT = 10000
+
+
+class TriggerError(ValueError):
+    pass
+
+
+def _rises(trigger):
+    """
+    Whether a fixed-level trigger fires as the price rises: stops fire in the direction of their side
+    (a buy stop as the price rises), take-profits against it.
+    """
+    return (trigger['side'] == 'BUY') == (trigger['kind'] == 'STOP')
+
+
+class _TrailingGroup:
+    """
+    Trailing stops on one side of a symbol with the same callback rate. Sell stops track the highest
+    price since they were placed and fire once the price falls callback_rate below it; buy stops track
+    the lowest and fire once it rises callback_rate above it.
+    """
+    def __init__(self, side, rate):
+        self.side = side
+        self.rate = rate / 100
+        self._extremes = []
+        self._buckets = {}
+
+    def add(self, trigger, price):
+        bucket = self._buckets.get(price)
+        if bucket is None:
+            bucket = self._buckets[price] = {'extreme': price, 'triggers': []}
+            bisect.insort(self._extremes, price)
+        bucket['triggers'].append(trigger)
+        trigger['_bucket'] = bucket
+
+    def remove(self, trigger):
+        bucket = trigger.pop('_bucket')
+        bucket['triggers'].remove(trigger)
+        if not bucket['triggers']:
+            self._drop(bucket['extreme'])
+
+    def _drop(self, extreme):
+        del self._buckets[extreme]
+        del self._extremes[bisect.bisect_left(self._extremes, extreme)]
+
+    def active(self):
+        return bool(self._extremes)
+
+    def stop_price(self, trigger):
+        extreme = trigger['_bucket']['extreme']
+        return extreme * (1 - self.rate) if self.side == 'SELL' else extreme * (1 + self.rate)
+
+    def tick(self, price):
+        """
+        Returns the triggers price fires, then moves the remaining peaks (troughs) to price.
+        """
+        extremes = self._extremes
+        # Most ticks neither reach a stop nor set a new extreme
+        if self.side == 'SELL':
+            if extremes[0] >= price > extremes[-1] * (1 - self.rate):
+                return ()
+        elif extremes[-1] <= price < extremes[0] * (1 + self.rate):
+            return ()
+
+        if self.side == 'SELL':
+            start, end = bisect.bisect_left(extremes, price / (1 - self.rate)), len(extremes)
+        else:
+            start, end = 0, bisect.bisect_right(extremes, price / (1 + self.rate))
+        fired = []
+        for extreme in extremes[start:end]:
+            fired.extend(self._buckets.pop(extreme)['triggers'])
+        del extremes[start:end]
+
+        if self.side == 'SELL':
+            start, end = 0, bisect.bisect_left(extremes, price)
+        else:
+            start, end = bisect.bisect_right(extremes, price), len(extremes)
+        if end - start:
+            self._merge(extremes[start:end], price)
+        return fired
+
+    def _merge(self, extremes, price):
+        # Everything behind the new extreme now shares it. The largest bucket absorbs the others,
+        # so a stop changes buckets O(log n) times over its life.
+        buckets = [self._buckets.pop(extreme) for extreme in extremes]
+        existing = self._buckets.get(price)
+        if existing:
+            buckets.append(existing)
+        else:
+            bisect.insort(self._extremes, price)
+        target = max(buckets, key=lambda bucket: len(bucket['triggers']))
+        for bucket in buckets:
+            if bucket is not target:
+                for trigger in bucket['triggers']:
+                    trigger['_bucket'] = target
+                target['triggers'].extend(bucket['triggers'])
+        target['extreme'] = price
+        self._buckets[price] = target
+        first = bisect.bisect_left(self._extremes, extremes[0])
+        del self._extremes[first:first + len(extremes)]
+
+
+class _SymbolBook:
+    def __init__(self):
+        # Per side: min-heap of levels firing when price >= level, max-heap (negated) firing when price <= level
+        self.rising = {'BUY': [], 'SELL': []}
+        self.falling = {'BUY': [], 'SELL': []}
+        # Per side: callback rate -> _TrailingGroup
+        self.trailing = {'BUY': {}, 'SELL': {}}
+        self.stale = 0
+
+    def push(self, trigger):
+        if _rises(trigger):
+            heapq.heappush(self.rising[trigger['side']], (trigger['trigger_price'], trigger['id']))
+        else:
+            heapq.heappush(self.falling[trigger['side']], (-trigger['trigger_price'], trigger['id']))
+
+    def size(self):
+        return sum(len(heap) for heaps in (self.rising, self.falling) for heap in heaps.values())
+
+
+class TriggerEngine:
+    """
+    Resting client-side triggers across symbols. on_price() evaluates a tick and hands the fired
+    triggers to a thread pool that places their MARKET orders through client (a BinanceFuturesClient).
+    on_fire(trigger, response, error) is called after each placement attempt.
+    """
+    def __init__(self, client=None, on_fire=None, workers=TRIGGER_WORKERS):
+        self.client = client
+        self.on_fire = on_fire
+        self.triggers = {}
+        self.last_prices = {}
+        self.fired = 0
+        self.failed = 0
+        self._books = {}
+        self._finished = deque()
+        self._ids = itertools.count(1)
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def symbols(self):
+        with self._lock:
+            return set(self._books)
+
+    def _book(self, symbol):
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _SymbolBook()
+        return book
+
+    # Adding and cancelling ------------------------------------------------------------------
+
+    def _new(self, kind, symbol, side, quantity, trigger_price=None, callback_rate=None, oco_id=None):
+        side = side.upper()
+        if side not in ('BUY', 'SELL'):
+            raise TriggerError(f"Invalid side: {side}")
+        if quantity is None or quantity <= 0:
+            raise TriggerError("Quantity must be positive.")
+        return {
+            'id': next(self._ids),
+            'kind': kind,
+            'symbol': symbol.upper(),
+            'side': side,
+            'quantity': quantity,
+            'trigger_price': trigger_price,
+            'callback_rate': callback_rate,
+            'oco_id': oco_id,
+            'status': 'PENDING',
+            'created': int(time.time() * 1000),
+            'fired_at': None,
+            'fired_price': None,
+            'order_id': None,
+            'error': None,
+        }
+
+    def _check_level(self, trigger):
+        level = trigger['trigger_price']
+        if level is None or level <= 0:
+            raise TriggerError("Trigger price must be positive.")
+        last = self.last_prices.get(trigger['symbol'])
+        if last is None:
+            return
+        price = last[0] if trigger['side'] == 'SELL' else last[1]
+        if (price >= level) if _rises(trigger) else (price <= level):
+            raise TriggerError(f"{trigger['kind']} at {level} would trigger immediately (last price {price}).")
+
+    def _insert(self, trigger):
+        self.triggers[trigger['id']] = trigger
+        self._book(trigger['symbol']).push(trigger)
+
+    def add_stop(self, symbol, side, quantity, stop_price):
+        """
+        Hidden stop: a MARKET order once the price reaches stop_price (a sell stop as it falls, a buy
+        stop as it rises). Rejected if the last price is already past it.
+        """
+        return self._add_fixed(self._new('STOP', symbol, side, quantity, stop_price))
+
+    def add_take_profit(self, symbol, side, quantity, price):
+        """
+        A MARKET order once the price reaches price from the other direction (a sell as it rises).
+        """
+        return self._add_fixed(self._new('TAKE_PROFIT', symbol, side, quantity, price))
+
+    def _add_fixed(self, trigger):
+        with self._lock:
+            self._check_level(trigger)
+            self._insert(trigger)
+            return self.public(trigger)
+
+    def add_oco(self, symbol, side, quantity, take_profit, stop_price):
+        """
+        A take-profit and a stop for the same quantity; whichever fires first cancels the other.
+        """
+        side = side.upper()
+        if side == 'SELL' and not take_profit > stop_price or side == 'BUY' and not take_profit < stop_price:
+            raise TriggerError("The take-profit must be above the stop for a SELL OCO and below it for a BUY.")
+        with self._lock:
+            profit = self._new('TAKE_PROFIT', symbol, side, quantity, take_profit)
+            stop = self._new('STOP', symbol, side, quantity, stop_price, oco_id=profit['id'])
+            profit['oco_id'] = profit['id']
+            profit['_partner'], stop['_partner'] = stop, profit
+            self._check_level(profit)
+            self._check_level(stop)
+            self._insert(profit)
+            self._insert(stop)
+            return [self.public(profit), self.public(stop)]
+
+    def add_trailing_stop(self, symbol, side, quantity, callback_rate, price=None):
+        """
+        Trailing stop: a sell tracks the highest price seen from now (or from price) and fires once
+        the price drops callback_rate percent below it; a buy mirrors that from the lowest price.
+        """
+        if not 0 < callback_rate < 100:
+            raise TriggerError("Callback rate must be between 0 and 100 percent.")
+        trigger = self._new('TRAILING_STOP', symbol, side, quantity, callback_rate=callback_rate)
+        with self._lock:
+            last = self.last_prices.get(trigger['symbol'])
+            if price is None and last is None:
+                raise TriggerError(f"No price for {trigger['symbol']} yet; pass a reference price.")
+            if price is None:
+                price = last[0] if trigger['side'] == 'SELL' else last[1]
+            self.triggers[trigger['id']] = trigger
+            trailing = self._book(trigger['symbol']).trailing[trigger['side']]
+            group = trailing.get(callback_rate)
+            if group is None:
+                group = trailing[callback_rate] = _TrailingGroup(trigger['side'], callback_rate)
+            group.add(trigger, price)
+            return self.public(trigger)
+
+    def cancel(self, trigger_id):
+        """
+        Cancels a pending trigger (and its OCO partner). Returns it, or None if it isn't pending.
+        """
+        with self._lock:
+            trigger = self.triggers.get(trigger_id)
+            if trigger is None or trigger['status'] != 'PENDING':
+                return None
+            self._retire(trigger)
+            self._retire_partner(trigger)
+            return self.public(trigger)
+
+    def _retire(self, trigger):
+        """
+        Takes a pending trigger out of its book as CANCELED.
+        """
+        trigger['status'] = 'CANCELED'
+        self._finish(trigger)
+        book = self._books[trigger['symbol']]
+        if trigger['kind'] == 'TRAILING_STOP':
+            trailing = book.trailing[trigger['side']]
+            trailing[trigger['callback_rate']].remove(trigger)
+            if not trailing[trigger['callback_rate']].active():
+                del trailing[trigger['callback_rate']]
+            return
+        # Its heap entry stays behind and is skipped when reached
+        book.stale += 1
+        if book.stale > COMPACT_MIN_STALE and book.stale * 2 > book.size():
+            self._compact(book)
+
+    def _retire_partner(self, trigger):
+        partner = trigger.pop('_partner', None)
+        if partner is not None and partner['status'] == 'PENDING':
+            partner.pop('_partner', None)
+            self._retire(partner)
+
+    def _finish(self, trigger):
+        self._finished.append(trigger['id'])
+        while len(self._finished) > FINISHED_TRIGGERS_KEPT:
+            self.triggers.pop(self._finished.popleft(), None)
+
+    # Evaluation ---------------------------------------------------------------------------
+
+    def on_price(self, symbol, bid, ask=None):
+        """
+        Evaluates one tick for symbol and dispatches the triggers it fires. Returns them.
+        """
+        ask = bid if ask is None else ask
+        with timer("trigger"):
+            with self._lock:
+                self.last_prices[symbol] = (bid, ask)
+                book = self._books.get(symbol)
+                if book is None:
+                    return []
+                fired = []
+                for side, price in (('SELL', bid), ('BUY', ask)):
+                    rising, falling = book.rising[side], book.falling[side]
+                    while rising and rising[0][0] <= price:
+                        fired.append(self._pop(book, heapq.heappop(rising)[1], price))
+                    while falling and -falling[0][0] >= price:
+                        fired.append(self._pop(book, heapq.heappop(falling)[1], price))
+                    emptied = []
+                    for rate, group in book.trailing[side].items():
+                        for trigger in group.tick(price):
+                            trigger.pop('_bucket', None)
+                            fired.append(self._fire(trigger, price))
+                        if not group.active():
+                            emptied.append(rate)
+                    for rate in emptied:
+                        del book.trailing[side][rate]
+                fired = [trigger for trigger in fired if trigger is not None]
+        if fired:
+            self._dispatch(fired)
+        return [self.public(trigger) for trigger in fired]
+
+    def _pop(self, book, trigger_id, price):
+        trigger = self.triggers.get(trigger_id)
+        if trigger is None or trigger['status'] != 'PENDING':
+            book.stale = max(0, book.stale - 1)
+            return None
+        return self._fire(trigger, price)
+
+    def _fire(self, trigger, price):
+        trigger.update(status='TRIGGERED', fired_at=int(time.time() * 1000), fired_price=price)
+        self._retire_partner(trigger)
+        return trigger
+
+    def _compact(self, book):
+        for heaps in (book.rising, book.falling):
+            for side, heap in heaps.items():
+                live = [entry for entry in heap if self.triggers.get(entry[1], {}).get('status') == 'PENDING']
+                heapq.heapify(live)
+                heaps[side] = live
+        book.stale = 0
+
+    def _dispatch(self, fired):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="trigger")
+            executor = self._executor
+        for trigger in fired:
+            executor.submit(self._place, trigger)
+
+    def _place(self, trigger):
+        response = error = None
+        try:
+            response = self.client.place_order(trigger['symbol'], trigger['side'], 'MARKET', trigger['quantity'])
+            trigger.update(status='PLACED', order_id=response.get('orderId'))
+            logger.info("Trigger %s (%s %s %s) fired at %s -> order %s", trigger['id'], trigger['kind'],
+                        trigger['symbol'], trigger['side'], trigger['fired_price'], trigger['order_id'])
+        except Exception as e:
+            error = str(e)
+            trigger.update(status='FAILED', error=error)
+            logger.error("Trigger %s fired at %s but its order failed: %s", trigger['id'], trigger['fired_price'], e)
+        with self._lock:
+            if error is None:
+                self.fired += 1
+            else:
+                self.failed += 1
+            self._finish(trigger)
+        if self.on_fire:
+            try:
+                self.on_fire(self.public(trigger), response, error)
+            except Exception as e:
+                logger.error("Trigger callback failed: %s", e)
+
+    # Queries ------------------------------------------------------------------------------
+
+    def get(self, trigger_id):
+        with self._lock:
+            trigger = self.triggers.get(trigger_id)
+            return self.public(trigger) if trigger else None
+
+    def pending(self, symbol=None):
+        with self._lock:
+            return [self.public(t) for t in self.triggers.values()
+                    if t['status'] == 'PENDING' and (symbol is None or t['symbol'] == symbol)]
+
+    def public(self, trigger):
+        result = {k: v for k, v in trigger.items() if not k.startswith('_')}
+        if '_bucket' in trigger:
+            group = self._books[trigger['symbol']].trailing[trigger['side']][trigger['callback_rate']]
+            result['trigger_price'] = group.stop_price(trigger)
+        return result
+
+    def metrics(self):
+        with self._lock:
+            pending = sum(1 for t in self.triggers.values() if t['status'] == 'PENDING')
+            return {"pending": pending, "symbols": len(self._books), "fired": self.fired, "failed": self.failed}
+
+    def close(self):
+        """
+        Waits for fired triggers whose orders are still being placed. Pending triggers stay armed.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+class PriceStream:
+    """
+    Feeds a TriggerEngine from Binance's markPrice or bookTicker websocket streams for every symbol
+    that has triggers, subscribing to new symbols as they appear. Runs its own asyncio loop on a
+    daemon thread and reconnects with backoff, like UserDataStream.
+    """
+    def __init__(self, engine, client=None, ws_url=None, stream=TRIGGER_PRICE_STREAM):
+        self.engine = engine
+        # Same host as the user data stream; a custom REST root (e.g. the mock exchange) has no default
+        default_url = None if getattr(client, 'base_url', None) else USER_STREAM_URLS[getattr(client, 'testnet', True)]
+        self.ws_url = ws_url or os.getenv("BINANCE_FUTURES_WS_URL") or default_url
+        self.stream = stream
+        self.connected = False
+        self.ticks = 0
+        self.last_tick_time = None
+        self._subscribed = set()
+        self._request_ids = itertools.count(1)
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def _stream_name(self, symbol):
+        suffix = '@bookTicker' if self.stream == 'bookTicker' else '@markPrice@1s'
+        return symbol.lower() + suffix
+
+    def handle_message(self, raw):
+        message = json.loads(raw)
+        data = message.get('data', message)
+        event = data.get('e')
+        if event == 'markPriceUpdate':
+            price = float(data['p'])
+            self.engine.on_price(data['s'], price, price)
+        elif event == 'bookTicker':
+            self.engine.on_price(data['s'], float(data['b']), float(data['a']))
+        else:
+            return
+        self.ticks += 1
+        self.last_tick_time = data.get('E')
+
+    async def _subscribe(self, ws):
+        wanted = self.engine.symbols() - self._subscribed
+        if wanted:
+            await ws.send(json.dumps({'method': 'SUBSCRIBE', 'params': [self._stream_name(s) for s in sorted(wanted)],
+                                      'id': next(self._request_ids)}))
+            self._subscribed |= wanted
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                # Nothing to watch until the first trigger is added
+                while not self.engine.symbols():
+                    await asyncio.sleep(1)
+                async with websockets.connect(f"{self.ws_url.rstrip('/')}/stream") as ws:
+                    self.connected = True
+                    self._subscribed = set()
+                    delay = 1
+                    logger.info("Trigger price stream connected")
+                    while True:
+                        await self._subscribe(ws)
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), 1)
+                        except asyncio.TimeoutError:
+                            continue
+                        self.handle_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Trigger price stream disconnected: %s", e)
+            finally:
+                self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def start(self):
+        """
+        Starts streaming in the background. Does nothing without a stream URL.
+        """
+        if not self.ws_url:
+            logger.info("Trigger price stream not started (no stream URL)")
+            return self
+        if self._thread and self._thread.is_alive():
+            return self
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._task = self._loop.create_task(self._run())
+            ready.set()
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="trigger-prices", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(5)
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "subscribed": sorted(self._subscribed),
+            "ticks": self.ticks,
+            "last_tick_time": self.last_tick_time,
+        }
@@ -0,0 +1,225 @@
+"""
+Binance futures user data stream: keeps logged orders' status and fills current from
+ORDER_TRADE_UPDATE events instead of re-querying the exchange per order.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+import websockets
+
+from . import database
+from .client import PRIORITY_QUERY
+
+logger = logging.getLogger("trading_bot.user_stream")
+
+USER_STREAM_URLS = {
+    True: 'wss://stream.binancefuture.com',
+    False: 'wss://fstream.binance.com',
+}
+# Binance expires a listenKey 60 minutes after the last keepalive
+LISTEN_KEY_KEEPALIVE = 30 * 60
+MAX_RECONNECT_DELAY = 60
+# Updates for orders not logged yet (the event beat the REST response) are retried this long
+PENDING_UPDATE_TTL = 60
+PENDING_RETRY_INTERVAL = 1
+
+
+def parse_order_update(event):
+    """
+    Returns the order update carried by an ORDER_TRADE_UPDATE event, or None for other events.
+    """
+    if event.get('e') != 'ORDER_TRADE_UPDATE':
+        return None
+    o = event['o']
+    return {
+        'order_id': o['i'],
+        'client_order_id': o.get('c'),
+        'symbol': o.get('s'),
+        'side': o.get('S'),
+        'type': o.get('o'),
+        'execution_type': o.get('x'),
+        'status': o['X'],
+        'executed_qty': float(o.get('z', 0)),
+        'avg_price': float(o.get('ap', 0)),
+        'last_qty': float(o.get('l', 0)),
+        'last_price': float(o.get('L', 0)),
+        'update_time': o.get('T', event.get('T', event.get('E'))),
+    }
+
+
+def replay(path, stream=None):
+    """
+    Applies the events recorded in a JSONL file (one raw stream message per line) to the
+    orders table, as if they had arrived live. Returns the number of rows updated.
+    """
+    stream = stream or UserDataStream(None)
+    with open(path) as f:
+        updates = [u for u in (parse_order_update(json.loads(line)) for line in f if line.strip()) if u]
+    return stream.apply(updates)
+
+
+class ListenKeyExpired(Exception):
+    pass
+
+
+class UserDataStream:
+    """
+    Background consumer of the user data stream for one BinanceFuturesClient. Runs its own
+    asyncio loop on a daemon thread, keeps the listenKey alive and reconnects with backoff.
+    on_update(updates) is called with each batch of applied order updates.
+    """
+    def __init__(self, client, ws_url=None, on_update=None, record_path=None):
+        self.client = client
+        base_url = getattr(client, 'base_url', None)
+        # A custom REST root (e.g. the mock exchange) has no default stream host
+        default_url = None if base_url else USER_STREAM_URLS[getattr(client, 'testnet', True)]
+        self.ws_url = ws_url or os.getenv("BINANCE_FUTURES_WS_URL") or default_url
+        self.on_update = on_update
+        self.record_path = record_path or os.getenv("USER_STREAM_RECORD")
+        self.listen_key = None
+        self.connected = False
+        self.events = 0
+        self.last_event_time = None
+        self._pending = {}
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    def apply(self, updates):
+        """
+        Writes order updates to the database, holding back the ones whose order isn't logged yet.
+        Returns the number of updates applied.
+        """
+        now = time.time()
+        pending, self._pending = self._pending, {}
+        updates = [update for update, _ in pending.values()] + list(updates)
+        if not updates:
+            return 0
+
+        unmatched = database.update_orders(updates)
+        for update in unmatched:
+            key = (update['order_id'], update['update_time'])
+            first_seen = pending[key][1] if key in pending else now
+            if now - first_seen < PENDING_UPDATE_TTL:
+                self._pending[key] = (update, first_seen)
+
+        unmatched_ids = {id(u) for u in unmatched}
+        applied = [u for u in updates if id(u) not in unmatched_ids]
+        if applied and self.on_update:
+            self.on_update(applied)
+        return len(applied)
+
+    def handle_message(self, raw):
+        """
+        Processes one raw stream message. Raises ListenKeyExpired when the stream must be reopened.
+        """
+        if self.record_path:
+            with open(self.record_path, 'a') as f:
+                f.write(raw.rstrip('\n') + '\n')
+        event = json.loads(raw)
+        self.events += 1
+        self.last_event_time = event.get('E')
+        if event.get('e') == 'listenKeyExpired':
+            raise ListenKeyExpired(event.get('listenKey'))
+        update = parse_order_update(event)
+        if update:
+            self.apply([update])
+
+    def _open_listen_key(self):
+        return self.client._request(self.client.client.futures_stream_get_listen_key, priority=PRIORITY_QUERY)
+
+    def _keepalive_listen_key(self):
+        self.client._request(self.client.client.futures_stream_keepalive, priority=PRIORITY_QUERY,
+                             listenKey=self.listen_key)
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(LISTEN_KEY_KEEPALIVE)
+            try:
+                await asyncio.to_thread(self._keepalive_listen_key)
+            except Exception as e:
+                logger.warning("listenKey keepalive failed: %s", e)
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                self.listen_key = await asyncio.to_thread(self._open_listen_key)
+                async with websockets.connect(f"{self.ws_url.rstrip('/')}/ws/{self.listen_key}") as ws:
+                    self.connected = True
+                    delay = 1
+                    logger.info("User data stream connected")
+                    keepalive = asyncio.create_task(self._keepalive())
+                    try:
+                        while True:
+                            try:
+                                raw = await asyncio.wait_for(ws.recv(), PENDING_RETRY_INTERVAL)
+                            except asyncio.TimeoutError:
+                                if self._pending:
+                                    await asyncio.to_thread(self.apply, [])
+                                continue
+                            await asyncio.to_thread(self.handle_message, raw)
+                    finally:
+                        keepalive.cancel()
+            except asyncio.CancelledError:
+                raise
+            except ListenKeyExpired:
+                logger.info("listenKey expired, reopening user data stream")
+                continue
+            except Exception as e:
+                logger.warning("User data stream disconnected: %s", e)
+            finally:
+                self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def start(self):
+        """
+        Starts consuming in the background. Does nothing without API keys or a stream URL.
+        """
+        if not self.client or not self.client.client or not self.ws_url:
+            logger.info("User data stream not started (no API keys or stream URL)")
+            return self
+        if self._thread and self._thread.is_alive():
+            return self
+
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._task = self._loop.create_task(self._run())
+            ready.set()
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="user-data-stream", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(5)
+        if self.listen_key and self.client and self.client.client:
+            try:
+                self.client.client.futures_stream_close(listenKey=self.listen_key)
+            except Exception as e:
+                logger.debug("Could not close listenKey: %s", e)
+            self.listen_key = None
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "events": self.events,
+            "last_event_time": self.last_event_time,
+            "pending_updates": len(self._pending),
+        }
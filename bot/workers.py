@@ -0,0 +1,73 @@
+"""
+Worker slots for running the server as several processes (uvicorn --workers N) on one database.
+
+Each worker claims the lowest free slot by taking an exclusive lock on a file next to the database;
+the lock goes away with the process, so the replacement uvicorn starts for a crashed worker takes over
+its slot. The slot numbers the worker's order journal, so each journal has a single writer and a
+restarted worker replays what its predecessor left behind. Slot 0 is the leader: the only worker that
+runs the exchange user data stream, the price stream and the trigger engine, which must not be
+duplicated. The others forward trigger requests to it over a Unix socket.
+"""
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger("trading_bot.workers")
+
+# More than anyone would run on one SQLite file; bounds the search for a free slot
+MAX_SLOTS = 64
+
+
+class WorkerSlot:
+    """
+    A claimed slot; holds its lock file open until release().
+    """
+    def __init__(self, number, lock_file=None):
+        self.number = number
+        self._lock_file = lock_file
+
+    @property
+    def leader(self):
+        return self.number == 0
+
+    def release(self):
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def status(self):
+        return {"slot": self.number, "pid": os.getpid(), "leader": self.leader}
+
+
+def slot_path(db_file, number):
+    return os.path.splitext(db_file)[0] + f'.worker{number}.lock'
+
+
+def leader_socket(db_file):
+    """
+    Where the leader serves requests for the singletons it runs.
+    """
+    return os.path.splitext(db_file)[0] + '.leader.sock'
+
+
+def claim_slot(db_file, max_slots=MAX_SLOTS):
+    """
+    Locks and returns the lowest free slot for db_file. Without fcntl (Windows) every process
+    is slot 0, i.e. only a single worker is supported there.
+    """
+    if fcntl is None:
+        return WorkerSlot(0)
+    for number in range(max_slots):
+        lock_file = open(slot_path(db_file, number), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        logger.info("Worker %d claimed slot %d%s", os.getpid(), number, " (leader)" if number == 0 else "")
+        return WorkerSlot(number, lock_file)
+    raise RuntimeError(f"All {max_slots} worker slots for {db_file} are taken")
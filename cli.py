@@ -6,24 +6,80 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from bot.logging_config import setup_logging
-from bot.orders import OrderManager
+from bot import daemon
+from bot.accounts import parse_accounts
+from bot.database import init_db, log_orders
+from bot.export import EXPORT_FORMATS
+from bot.metrics import format_summary, timer
+from bot.orders import OrderManager, load_batch_file, batch_log_entries, execute_for_accounts
 from bot.validators import validate_positive_float, validate_symbol, validate_side, validate_order_type
 
 # Initialize logging
 logger = setup_logging()
 
-@click.command()
+class DefaultGroup(click.Group):
+    """
+    Group that falls back to a default command, so `cli.py --symbol ...` keeps placing a single order.
+    """
+    def __init__(self, *args, default_command=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        # Group flags (like --timings) may precede the command name
+        flags = {opt for param in self.params if param.is_flag for opt in param.opts}
+        leading = 0
+        while leading < len(args) and args[leading] in flags:
+            leading += 1
+        rest = args[leading:]
+        if not rest or rest[0] not in self.commands and rest[0] not in ('--help', '-h'):
+            args = list(args[:leading]) + [self.default_command] + list(rest)
+        return super().parse_args(ctx, args)
+
+@click.group(cls=DefaultGroup, default_command='order')
+@click.option('--timings', is_flag=True, help='Print per-stage latency (validate, exchange, db_log, ...) when done.')
+@click.option('--no-daemon', is_flag=True, help='Run in this process even if `cli.py daemon` is running.')
+@click.pass_context
+def cli(ctx, timings, no_daemon):
+    """
+    Simple CLI for placing orders on Binance Futures Testnet.
+    """
+    ctx.obj = {"daemon": not no_daemon and os.getenv("TRADING_BOT_DAEMON", "1") != "0"}
+    if timings:
+        ctx.call_on_close(lambda: click.echo("\n" + format_summary(), err=True))
+
+def forward(command, **payload):
+    """
+    Sends the command to a running daemon and prints its output. Returns the reply, or None when
+    no daemon is listening and the caller should run the command itself.
+    """
+    if not click.get_current_context().obj["daemon"] or not os.path.exists(daemon.SOCKET_PATH):
+        return None
+    try:
+        with timer("daemon"):
+            reply = daemon.request(command, **payload)
+    except daemon.DaemonUnavailable as e:
+        logger.debug("Running in-process: %s", e)
+        return None
+    except daemon.DaemonError as e:
+        # The daemon may already have sent the order, so never retry it here
+        raise click.ClickException(f"Daemon failed the request: {e}")
+    click.echo(reply.get("output", ""), nl=False)
+    return reply
+
+@cli.command()
 @click.option('--symbol', prompt='Symbol (e.g., BTCUSDT)', callback=validate_symbol, help='Trading pair symbol.')
 @click.option('--side', prompt='Side (BUY/SELL)', callback=validate_side, type=click.Choice(['BUY', 'SELL'], case_sensitive=False), help='Order side.')
 @click.option('--type', 'order_type', prompt='Type (MARKET/LIMIT/STOP_MARKET)', callback=validate_order_type, type=click.Choice(['MARKET', 'LIMIT', 'STOP_MARKET'], case_sensitive=False), help='Order type.')
 @click.option('--quantity', prompt='Quantity', callback=validate_positive_float, type=float, help='Order quantity.')
 @click.option('--price', callback=validate_positive_float, type=float, required=False, help='Order price (required for LIMIT orders).')
 @click.option('--stop-price', 'stop_price', callback=validate_positive_float, type=float, required=False, help='Stop price (required for STOP_MARKET orders).')
-def main(symbol, side, order_type, quantity, price, stop_price):
+@click.option('--account', 'accounts', multiple=True, help='Account to trade on; repeat or comma-separate to send the order to several in parallel.')
+def order(symbol, side, order_type, quantity, price, stop_price, accounts):
     """
-    Simple CLI for placing orders on Binance Futures Testnet.
+    Place a single order (the default command).
     """
-    logger.info(f"CLI Command received: {symbol} {side} {order_type} {quantity} {price} {stop_price}")
+    logger.info("CLI Command received: %s %s %s %s %s %s", symbol, side, order_type, quantity, price, stop_price)
 
     if order_type == 'LIMIT' and price is None:
         price = click.prompt("Price", type=float, value_proc=lambda x: validate_positive_float(None, None, float(x)))
@@ -31,8 +87,154 @@ def main(symbol, side, order_type, quantity, price, stop_price):
     if order_type == 'STOP_MARKET' and stop_price is None:
         stop_price = click.prompt("Stop Price", type=float, value_proc=lambda x: validate_positive_float(None, None, float(x)))
 
+    names = parse_accounts(accounts) if accounts else None
+    if forward("order", symbol=symbol, side=side, type=order_type, quantity=quantity, price=price,
+               stop_price=stop_price, accounts=names):
+        return
+    if names:
+        init_db()
+        execute_for_accounts(names, lambda manager: manager.execute_order(symbol, side, order_type, quantity,
+                                                                          price, stop_price))
+        return
     manager = OrderManager()
     manager.execute_order(symbol, side, order_type, quantity, price, stop_price)
 
+@cli.command()
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl'], case_sensitive=False), help='File format (default: from extension).')
+@click.option('--account', 'accounts', multiple=True, help='Account to trade on; repeat or comma-separate to send the batch to several in parallel.')
+def batch(file, file_format, accounts):
+    """
+    Place every order in a CSV or JSONL FILE through the batch API.
+
+    Columns: symbol, side, type, quantity, price, stop_price.
+    """
+    try:
+        orders = load_batch_file(file, file_format)
+        for order in orders:
+            validate_symbol(None, None, order['symbol'])
+            validate_side(None, None, order['side'])
+            validate_order_type(None, None, order['type'])
+    except (ValueError, click.BadParameter) as e:
+        raise click.ClickException(str(e))
+
+    logger.info("CLI batch received: %d orders from %s", len(orders), file)
+    names = parse_accounts(accounts) if accounts else None
+    if forward("batch", orders=orders, accounts=names):
+        return
+    if names:
+        init_db()
+        for name, results in execute_for_accounts(names, lambda manager: manager.execute_batch(orders)).items():
+            if results:
+                with timer("db_log"):
+                    log_orders(batch_log_entries(results, name))
+        return
+    manager = OrderManager()
+    results = manager.execute_batch(orders)
+    if results:
+        init_db()
+        with timer("db_log"):
+            log_orders(batch_log_entries(results))
+
+@cli.command('daemon')
+@click.option('--socket', 'socket_path', default=daemon.SOCKET_PATH, show_default=True, help='Unix socket to listen on.')
+@click.option('--status', is_flag=True, help='Report whether a daemon is running, then exit.')
+@click.option('--stop', is_flag=True, help='Stop the running daemon.')
+def run_daemon(socket_path, status, stop):
+    """
+    Keep a warm exchange client resident and serve orders from other cli.py calls over a Unix socket.
+    """
+    if status or stop:
+        try:
+            reply = daemon.request("stop" if stop else "ping", socket_path, timeout=daemon.CONNECT_TIMEOUT * 4)
+        except daemon.DaemonUnavailable:
+            raise click.ClickException(f"No daemon running on {socket_path}")
+        click.echo("Daemon stopped." if stop else
+                   f"Daemon pid {reply['pid']} up {reply['uptime']}s, {reply['requests']} requests, "
+                   f"exchange {'healthy' if reply['healthy'] else 'unreachable'}.")
+        return
+
+    server = daemon.OrderDaemon(socket_path)
+    click.echo("Warming up exchange client...")
+    server.warm_up()
+    click.echo(f"Listening on {socket_path} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+@cli.group()
+def history():
+    """
+    Query the local order log.
+    """
+
+@history.command('export')
+@click.option('--format', 'file_format', type=click.Choice(list(EXPORT_FORMATS), case_sensitive=False), default='csv', show_default=True, help='Output format.')
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False, allow_dash=True), help='Output file (default: stdout).')
+@click.option('--symbol', help='Only this symbol.')
+@click.option('--side', type=click.Choice(['BUY', 'SELL'], case_sensitive=False), help='Only this side.')
+@click.option('--status', help='Only this order status.')
+@click.option('--start', help='Earliest order time (ISO timestamp, inclusive).')
+@click.option('--end', help='Latest order time (ISO timestamp, inclusive).')
+@click.option('--account', help='Only orders of this account.')
+def history_export(file_format, output, symbol, side, status, start, end, account):
+    """
+    Stream every matching order, oldest first, as CSV, JSONL or Parquet.
+    """
+    from bot.export import ExportError, export_history
+
+    init_db()
+    try:
+        chunks = export_history(file_format, symbol=symbol, side=side, status=status, start=start, end=end,
+                                account=account)
+    except ExportError as e:
+        raise click.ClickException(str(e))
+    with click.open_file(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+def int_list(ctx, param, value):
+    try:
+        return [int(v) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise click.BadParameter("expected comma-separated whole numbers")
+
+@cli.command()
+@click.argument('data', type=click.Path(exists=True, dir_okay=False))
+@click.option('--symbol', required=True, callback=validate_symbol, help='Symbol the bars are for.')
+@click.option('--fast', default='10', callback=int_list, show_default=True, help='Fast moving average length(s); comma-separate to sweep.')
+@click.option('--slow', default='50', callback=int_list, show_default=True, help='Slow moving average length(s); comma-separate to sweep.')
+@click.option('--quantity', default=1.0, type=float, show_default=True, help='Position size.')
+@click.option('--stop-pct', type=float, help='Protective STOP_MARKET this many percent from each entry.')
+@click.option('--slippage-bps', default=0.0, type=float, show_default=True, help='Slippage on MARKET and stop fills, in basis points.')
+@click.option('--fee-bps', default=0.0, type=float, show_default=True, help='Fee on every fill, in basis points.')
+@click.option('--processes', type=int, help='Sweep worker processes (default: one per CPU).')
+@click.option('--db', 'db_path', default=os.path.join('data', 'backtest.db'), show_default=True, help='SQLite file the simulated orders are written to ("" to skip).')
+def backtest(data, symbol, fast, slow, quantity, stop_pct, slippage_bps, fee_bps, processes, db_path):
+    """
+    Replay klines or trades (CSV, Parquet or .npy) through a moving average cross strategy.
+    """
+    from bot.backtest import BacktestError, MovingAverageCross, param_grid, sweep
+
+    runs = [params for params in param_grid({'fast': fast, 'slow': slow, 'quantity': [quantity], 'stop_pct': [stop_pct]})
+            if params['fast'] < params['slow']]
+    if not runs:
+        raise click.BadParameter("every --fast length is at least every --slow length", param_hint='--fast')
+    try:
+        results = sweep(data, symbol, MovingAverageCross, runs, processes=processes, db_path=db_path or None,
+                        slippage_bps=slippage_bps, fee_bps=fee_bps)
+    except BacktestError as e:
+        raise click.ClickException(str(e))
+    for result in sorted(results, key=lambda r: r['pnl'], reverse=True):
+        params = result['params']
+        click.echo(f"fast={params['fast']:<4} slow={params['slow']:<5} orders={result['orders']:<7} fills={result['fills']:<7} "
+                   f"pnl={result['pnl']:<14.4f} fees={result['fees']:<12.4f} {result['bars_per_second'] * 60 / 1e6:.0f}M bars/min  "
+                   f"[{result['run_id']}]")
+    if db_path:
+        click.echo(f"\nOrders written to {db_path} (account = run id).")
+
 if __name__ == '__main__':
-    main()
+    cli()
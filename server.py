@@ -1,16 +1,116 @@
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
+from contextlib import asynccontextmanager, ExitStack
 import os
 import json
+import asyncio
+import time
 
-from bot.client import BinanceFuturesClient
-from bot.database import init_db, log_order, get_history, save_setting, get_setting
+from bot.logging_config import setup_logging, shutdown_logging
+from bot.client import close_clients
+from bot.accounts import AccountPool, AccountError, check_account_name, parse_accounts
+from bot.orders import batch_log_entries, place_validated_batch
+from bot.exchange_info import get_exchange_filters, OrderValidationError
+from bot.user_stream import UserDataStream
+from bot.triggers import TriggerEngine, PriceStream, TriggerError
+from bot.events import EventBroker, ChangeFeed
+from bot.workers import WorkerSlot, claim_slot, leader_socket
+from bot.daemon import DaemonError, DaemonUnavailable, request as leader_request, serve_in_background, stop_server
+from bot.positions import PositionBook
+from bot.export import EXPORT_FORMATS, ExportError, check_format, export_history
+from bot.metrics import REQUEST_SECONDS, timer, render as render_metrics
+from bot.profiling import RequestProfiler
+from bot import database
+from bot.database import (init_db, log_order_async, log_orders_async, get_history_page, summarize_history, get_orders, get_order_response, save_setting,
+                          get_settings, close_connections, start_order_writer, get_order_writer, close_order_writer,
+                          queue_orders, save_account, get_accounts, delete_account, order_journal_path,
+                          DEFAULT_ACCOUNT, HISTORY_PAGE_SIZE)
 
-app = FastAPI(title="Binance Trading Bot UI")
+# Seconds between keep-alive comments on idle event streams (proxies drop silent connections)
+SSE_HEARTBEAT = 15
+
+# Uvicorn worker processes (python server.py); each claims a slot, slot 0 also runs the exchange streams
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global worker, change_feed, leader_server
+    # Log records are queued and written by a listener thread, never on the request path
+    setup_logging()
+    worker = claim_slot(database.DB_FILE)
+    # Position snapshot plus the fills logged since it
+    positions.load()
+    # Replays any journaled orders a crash left uncommitted before serving requests. Each worker
+    # slot has its own journal, so every journal has exactly one writer.
+    start_order_writer(journal_path=order_journal_path(worker.number))
+    # Order rows and key changes committed by any worker (or the CLI) reach this worker's dashboards and clients
+    change_feed = ChangeFeed(on_orders=publish_orders, on_change=accounts.refresh, prune=worker.leader).start()
+    # Creating the client starts its background warm-up, so the first order skips the TLS handshake
+    get_client()
+    if worker.leader:
+        leader_server = serve_in_background(leader_socket(database.DB_FILE), LeaderService())
+        restart_user_stream(get_client().sync_client)
+        restart_triggers(get_client().sync_client)
+    yield
+    if leader_server:
+        stop_server(leader_server)
+        leader_server = None
+    restart_user_stream(None)
+    restart_triggers(None)
+    change_feed.stop()
+    # Orders of triggers that already fired are placed and queued for logging before the writer stops
+    trigger_engine.close()
+    accounts.close()
+    close_clients()
+    # Drain queued order logs before the connections go away
+    close_order_writer()
+    # Release pooled SQLite connections held by worker threads
+    close_connections()
+    worker.release()
+    shutdown_logging()
+
+app = FastAPI(title="Binance Trading Bot UI", lifespan=lifespan)
+
+# Switched at runtime through POST /debug/profile; PROFILE_REQUESTS=1 starts with it on
+profiler = RequestProfiler(enabled=os.getenv("PROFILE_REQUESTS") == "1",
+                           threshold_ms=float(os.getenv("PROFILE_THRESHOLD_MS", "0")))
+
+class InstrumentationMiddleware:
+    """
+    Records request latency per route into REQUEST_SECONDS and runs the request under the
+    profiler when it is switched on. Plain ASGI, so it adds no task or body buffering per request.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        response = {"status": 500, "end": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                # Event streams stay open for minutes; their latency is the time to the first byte
+                if any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ())):
+                    response["end"] = time.perf_counter()
+            await send(message)
+
+        try:
+            with profiler.profile(scope["path"]):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            elapsed = (response["end"] or time.perf_counter()) - start
+            REQUEST_SECONDS.labels(scope["method"], route, str(response["status"])).observe(elapsed)
+
+app.add_middleware(InstrumentationMiddleware)
 
 # Initialize Database
 init_db()
@@ -24,63 +124,409 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Templates
 templates = Jinja2Templates(directory="templates")
 
-# Register custom Jinja filters
-def from_json(value):
+# This process's worker slot; replaced by the claimed one at startup
+worker = WorkerSlot(0)
+change_feed = None
+leader_server = None
+
+def credentials_replaced(name):
+    """
+    An account's keys changed (through this worker or another): the leader moves the streams
+    that follow the default account over to its new client.
+    """
+    if name == DEFAULT_ACCOUNT and worker.leader:
+        restart_user_stream(get_client().sync_client)
+        restart_triggers(get_client().sync_client)
+
+# One warm client per account (the default one uses the keys from settings, then the environment).
+# Requests lease their client, so changing an account's keys never closes it under an in-flight order.
+# Keys saved by another worker are noticed by the change feed and the next request.
+accounts = AccountPool(on_replace=credentials_replaced)
+
+def get_client(account=None):
+    """
+    Returns the AsyncBinanceFuturesClient for an account (default: the configured keys).
+    Without keys this is an unconfigured client; operations will fail gracefully.
+    """
+    return accounts.get(account)
+
+# New and changed order rows are pushed to open dashboards over /events
+broker = EventBroker()
+
+# Net quantity, average entry and realized PnL per account and symbol, advanced by each logged fill
+positions = PositionBook()
+
+def publish_positions():
+    """
+    Applies fills logged since the last refresh and pushes the positions they changed to the dashboards.
+    """
+    changed = positions.refresh()
+    if changed:
+        broker.publish("positions", positions=changed)
+
+def publish_orders(row_ids):
+    """
+    Pushes order rows the change feed saw inserted or updated (by any worker's order writer or the
+    leader's user data stream) to this worker's dashboards.
+    """
+    rows = get_orders(row_ids)
+    if rows:
+        broker.publish("orders", orders=rows)
+        publish_positions()
+
+def stream_prices():
+    """
+    Latest mid price per symbol seen by the trigger engine's price stream.
+    """
+    return {symbol: (bid + ask) / 2 if ask else bid for symbol, (bid, ask) in list(trigger_engine.last_prices.items())}
+
+def mark_prices():
+    """
+    stream_prices() of the leader, which runs the price stream; empty while it is unreachable.
+    """
     try:
-        if isinstance(value, dict):
-            return value
-        return json.loads(value)
-    except (TypeError, json.JSONDecodeError):
+        return on_leader("mark_prices")
+    except HTTPException:
         return {}
 
-templates.env.filters["from_json"] = from_json
+# Keeps logged orders' status and fills current from the exchange's user data stream
+user_stream = None
 
-# Global Client Instance (refreshed on key update)
-client_instance = None
+def restart_user_stream(sync_client):
+    """
+    Stops the running user data stream and, if sync_client has keys, starts one for it.
+    """
+    global user_stream
+    if user_stream:
+        user_stream.stop()
+    user_stream = None
+    if sync_client and sync_client.client:
+        # The rows it updates reach every worker's dashboards through the change feed
+        user_stream = UserDataStream(sync_client).start()
 
-def get_client():
-    global client_instance
-    if client_instance:
-        return client_instance
-    
-    # Try to load from DB first, then ENV
-    api_key = get_setting('BINANCE_API_KEY') or os.getenv("BINANCE_API_KEY")
-    api_secret = get_setting('BINANCE_API_SECRET') or os.getenv("BINANCE_API_SECRET")
-    
-    if api_key and api_secret:
-        client_instance = BinanceFuturesClient(testnet=True, api_key=api_key, api_secret=api_secret)
-    else:
-        # Initialize empty to avoid crashing, but operations will fail gracefully
-        client_instance = BinanceFuturesClient(testnet=True, api_key="", api_secret="")
-    
-    return client_instance
+def log_triggered_order(trigger, response, error):
+    """
+    Logs the MARKET order a trigger placed (the change feed pushes the new row to the dashboards)
+    and publishes the trigger's new state.
+    """
+    if response:
+        queue_orders([({"symbol": trigger["symbol"], "side": trigger["side"], "type": "MARKET",
+                        "quantity": trigger["quantity"], "price": None}, response)])
+    broker.publish("trigger", trigger=trigger)
 
-@app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    history = get_history()
-    api_key = get_setting('BINANCE_API_KEY') or ""
-    # Mask secret for display
-    has_secret = bool(get_setting('BINANCE_API_SECRET'))
-    
-    return templates.TemplateResponse("index.html", {
-        "request": request, 
-        "history": history,
-        "api_key": api_key,
-        "has_secret": has_secret
+# Client-side stops, take-profits, trailing stops and OCO pairs, fired from the price stream
+trigger_engine = TriggerEngine(on_fire=log_triggered_order)
+price_stream = None
+
+def restart_triggers(sync_client):
+    """
+    Points the trigger engine at sync_client and restarts its price stream. Pending triggers are kept.
+    """
+    global price_stream
+    if price_stream:
+        price_stream.stop()
+    trigger_engine.client = sync_client
+    price_stream = PriceStream(trigger_engine, sync_client).start() if sync_client and sync_client.client else None
+
+def render_dashboard(request: Request, **context):
+    """
+    Renders index.html with the first page of history; older pages are fetched lazily from /history.
+    """
+    page = get_history_page()
+    settings = get_settings()
+    context.update({
+        "history": page["orders"],
+        "positions": positions.positions(prices=mark_prices()),
+        "next_cursor": page["next_cursor"],
+        "api_key": settings.get('BINANCE_API_KEY') or "",
+        # Mask secret for display
+        "has_secret": bool(settings.get('BINANCE_API_SECRET'))
     })
+    with timer("render"):
+        return templates.TemplateResponse(request, "index.html", context)
+
+def wants_json(request: Request):
+    return 'application/json' in request.headers.get('accept', '')
+
+async def form_result(request: Request, status_code=200, **context):
+    """
+    Answers a form post: a small JSON body for the dashboard's fetch() calls, or the full page
+    for plain HTML form submissions. The new history row itself arrives over /events.
+    """
+    if wants_json(request):
+        context.pop('last_order', None)
+        return JSONResponse(context, status_code=status_code)
+    return await run_in_threadpool(render_dashboard, request, **context)
+
+# Handlers that only touch SQLite/templates are plain functions so FastAPI runs them in its threadpool
+
+@app.get("/", response_class=HTMLResponse)
+def home(request: Request):
+    return render_dashboard(request)
+
+@app.get("/history")
+def history(
+    before_id: Optional[int] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    account: Optional[str] = None
+):
+    """
+    Returns one page of order history as JSON. Follow next_cursor (as before_id) for older orders.
+    """
+    return get_history_page(limit=limit, before_id=before_id, symbol=symbol, side=side,
+                            status=status, start=start, end=end, account=account)
+
+@app.get("/positions")
+def list_positions(account: Optional[str] = None):
+    """
+    Net quantity, average entry and realized PnL per account and symbol; unrealized PnL where the
+    price stream has a mark price for the symbol.
+    """
+    # Picks up fills logged by other processes (CLI, daemon) since the last refresh
+    publish_positions()
+    return {"positions": positions.positions(account, mark_prices()), "last_fill_id": positions.last_fill_id}
+
+@app.get("/history/export")
+def history_export(
+    file_format: str = Query("csv", alias="format"),
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    account: Optional[str] = None
+):
+    """
+    Streams every matching order, oldest first, as CSV, JSONL or Parquet.
+    """
+    try:
+        file_format = check_format(file_format)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body = export_history(file_format, symbol=symbol, side=side, status=status, start=start, end=end, account=account)
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[file_format],
+                             headers={"Content-Disposition": f'attachment; filename="orders.{file_format}"'})
+
+@app.get("/history/summary")
+def history_summary(
+    symbol: Optional[str] = None,
+    side: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    account: Optional[str] = None
+):
+    """
+    Order count, filled volume, notional and VWAP per day, symbol and side.
+    """
+    return {"summary": summarize_history(symbol=symbol, side=side, status=status, start=start, end=end,
+                                         account=account)}
+
+@app.get("/events")
+async def events():
+    """
+    Server-sent event stream of order rows as they are logged or updated by the exchange.
+    A "resync" event means this client fell behind and should reload the first history page.
+    """
+    queue = broker.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/status")
+def status():
+    """
+    Exchange connection health, user data stream, event fan-out and order log queue metrics.
+    """
+    return {
+        "exchange": get_client().sync_client.health(),
+        "accounts": accounts.metrics(),
+        "user_stream": user_stream.status() if user_stream else None,
+        "triggers": dict(trigger_engine.metrics(), stream=price_stream.status() if price_stream else None),
+        "events": broker.metrics(),
+        "order_log": get_order_writer().metrics(),
+        "worker": dict(worker.status(), change_feed=change_feed.metrics() if change_feed else None),
+    }
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus text exposition: per-stage order latency and per-route request latency histograms,
+    plus order log, event fan-out and rate limiter gauges.
+    """
+    writer = get_order_writer().metrics()
+    events = broker.metrics()
+    triggers = trigger_engine.metrics()
+    gauges = {
+        "trading_bot_order_log_queue_depth": ("Orders journaled but not yet inserted.", writer["queue_depth"] + writer["pending_rows"]),
+        "trading_bot_order_log_committed": ("Orders inserted by the order writer since start.", writer["committed"]),
+        "trading_bot_event_subscribers": ("Open dashboard event streams.", events["subscribers"]),
+        "trading_bot_events_dropped": ("Events dropped for slow subscribers.", events["dropped"]),
+        "trading_bot_triggers_pending": ("Client-side triggers waiting for their price.", triggers["pending"]),
+        "trading_bot_triggers_fired": ("Triggers whose order was placed since start.", triggers["fired"]),
+        "trading_bot_triggers_failed": ("Triggers whose order failed since start.", triggers["failed"]),
+    }
+    clients = accounts.clients()
+    if DEFAULT_ACCOUNT in clients:
+        limits = clients[DEFAULT_ACCOUNT].sync_client.rate_limiter.metrics()
+        gauges["trading_bot_rate_limit_queued"] = ("Requests waiting for rate limit budget.", limits["queued"])
+        gauges["trading_bot_rate_limit_throttled"] = ("Requests that had to wait for budget since start.", limits["throttled"])
+        for name, bucket in limits["buckets"].items():
+            gauges[f"trading_bot_rate_limit_remaining_{name.lower()}"] = (f"Remaining {name} budget in the current window.", bucket["remaining"])
+    exchanges = [client.sync_client for client in clients.values()]
+    gauges["trading_bot_accounts_open"] = ("Accounts with an open exchange client.", len(exchanges))
+    gauges["trading_bot_orders_in_flight"] = ("Orders sent to the exchange and not yet answered.", sum(len(e.in_flight) for e in exchanges))
+    gauges["trading_bot_order_retries"] = ("Order requests retried after an unknown outcome since start.", sum(e.order_retries for e in exchanges))
+    gauges["trading_bot_orders_reconciled"] = ("Retried orders found already placed on the exchange since start.", sum(e.orders_reconciled for e in exchanges))
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+class ProfileSettings(BaseModel):
+    enabled: Optional[bool] = None
+    threshold_ms: Optional[float] = None
+    path_prefix: Optional[str] = None
+
+@app.get("/debug/profile")
+def profile_status():
+    """
+    Whether request profiling is on, and the profiles captured so far.
+    """
+    return profiler.status()
+
+@app.post("/debug/profile")
+def configure_profile(settings: ProfileSettings):
+    """
+    Switches request profiling on or off at runtime; requests slower than threshold_ms are saved.
+    """
+    return profiler.configure(enabled=settings.enabled, threshold_ms=settings.threshold_ms,
+                              path_prefix=settings.path_prefix)
+
+@app.get("/rate-limits")
+def rate_limits():
+    """
+    Current request-weight and order-count budgets as tracked by the client's rate limiter.
+    """
+    return get_client().sync_client.rate_limiter.metrics()
+
+@app.get("/orders/{row_id}")
+def order_detail(row_id: int):
+    """
+    One logged order with the full exchange response stored alongside it.
+    """
+    rows = get_orders([row_id])
+    if not rows:
+        raise HTTPException(status_code=404, detail="Order not found.")
+    return dict(rows[0], response=get_order_response(row_id))
+
+class AccountRequest(BaseModel):
+    name: str
+    api_key: str
+    api_secret: str
+    testnet: bool = True
+
+@app.get("/accounts")
+def list_accounts():
+    """
+    Named accounts orders can be routed to (secrets omitted), and the state of their open clients.
+    """
+    return {"default": DEFAULT_ACCOUNT, "accounts": get_accounts(), "clients": accounts.metrics()}
+
+@app.post("/accounts")
+def add_account(account: AccountRequest):
+    """
+    Adds a named account or replaces its keys; orders already in flight finish on the old client.
+    """
+    try:
+        name = check_account_name(account.name)
+    except AccountError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if name == DEFAULT_ACCOUNT:
+        raise HTTPException(status_code=400, detail="The default account's keys are set through /settings.")
+    save_account(name, account.api_key, account.api_secret, account.testnet)
+    accounts.invalidate(name)
+    return {"success": f"Account {name} saved."}
+
+@app.delete("/accounts/{name}")
+def remove_account(name: str):
+    if not delete_account(name):
+        raise HTTPException(status_code=404, detail="No account with that name.")
+    accounts.invalidate(name)
+    return {"success": f"Account {name} deleted."}
 
 @app.post("/settings")
-async def update_settings(request: Request, api_key: str = Form(...), api_secret: str = Form(...)):
+def update_settings(request: Request, api_key: str = Form(...), api_secret: str = Form(...)):
     save_setting('BINANCE_API_KEY', api_key)
     save_setting('BINANCE_API_SECRET', api_secret)
     
-    # Force client refresh
-    global client_instance
-    client_instance = None
-    get_client() # Re-init
-    
+    # The next request opens a client for the new keys; in-flight orders finish on the old one.
+    # On the leader this also restarts the streams; other workers pick the change up from the database.
+    accounts.refresh()
+
+    if wants_json(request):
+        return {"success": "Credentials saved."}
     return RedirectResponse(url="/", status_code=303)
 
+class OrderRejected(Exception):
+    """
+    An order refused before it reached the exchange; carries the HTTP status and the message to show.
+    """
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+async def submit_order(account, symbol, side, order_type, quantity, price, stop_price):
+    """
+    Validates, places and journals one order for an account and returns the exchange response.
+    Raises OrderRejected or AccountError for local rejections; exchange errors propagate.
+    """
+    # Everything below awaits: exchange calls, DB writes and rendering all run off the event loop
+    with ExitStack() as lease:
+        # Leasing may read settings and build a client, so it runs in the threadpool too
+        with timer("client"):
+            client = await run_in_threadpool(lease.enter_context, accounts.use(account))
+        if not client.client:
+            suffix = "" if account == DEFAULT_ACCOUNT else f" for account {account}"
+            raise OrderRejected(400, f"API Keys not configured{suffix}! Please set them in Settings.")
+
+        # Tick/step size, min notional and unknown symbols are rejected locally, without a round-trip
+        with timer("validate"):
+            filters = await run_in_threadpool(get_exchange_filters, client.sync_client)
+            if filters:
+                try:
+                    quantity, price, stop_price = filters.validate_order(symbol.upper(), side, order_type, quantity,
+                                                                         price, stop_price)
+                except OrderValidationError as e:
+                    raise OrderRejected(400, f"Order rejected: {e}")
+
+        response = await client.place_order(symbol, side, order_type, quantity, price, stop_price)
+
+    order_data = {"symbol": symbol, "side": side, "type": order_type, "quantity": quantity, "price": price,
+                  "account": account}
+    # Add stop price to response object for logging if it's not there
+    if stop_price:
+        response['stopPrice'] = stop_price
+    # Returns once the order is journaled; the row is inserted by the next writer batch
+    with timer("db_log"):
+        await log_order_async(order_data, response)
+    return response
+
 @app.post("/order")
 async def place_order(
     request: Request,
@@ -89,58 +535,211 @@ async def place_order(
     order_type: str = Form(...),
     quantity: float = Form(...),
     price: Optional[float] = Form(None),
-    stop_price: Optional[float] = Form(None)
+    stop_price: Optional[float] = Form(None),
+    account: Optional[str] = Form(None)
 ):
+    """
+    Places an order on one account, or the same order on several ("sub1,sub2") in parallel.
+    """
     # Validate Inputs
     # ---------------------------------------------------------
     if order_type == 'STOP_MARKET' and (stop_price is None or stop_price <= 0):
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "error": "Error: specific Stop Price is required for STOP_MARKET orders.",
-            "history": get_history(),
-            "api_key": get_setting('BINANCE_API_KEY') or "",
-            "has_secret": bool(get_setting('BINANCE_API_SECRET'))
-        })
+        return await form_result(request, 400, error="Error: specific Stop Price is required for STOP_MARKET orders.")
     # ---------------------------------------------------------
 
+    names = parse_accounts(account)
+    if len(names) == 1:
+        try:
+            response = await submit_order(names[0], symbol, side, order_type, quantity, price, stop_price)
+        except OrderRejected as e:
+            return await form_result(request, e.status_code, error=str(e))
+        except AccountError as e:
+            return await form_result(request, 400, error=str(e))
+        except Exception as e:
+            return await form_result(request, 502, error=f"Failed to place order: {str(e)}")
+        return await form_result(
+            request,
+            success=f"Order {response.get('status', response.get('algoStatus'))}! "
+                    f"ID: {response.get('orderId', response.get('algoId'))}",
+            last_order=response
+        )
+
+    # Fan-out: every account places the order concurrently on its own client and rate limit budget
+    outcomes = await asyncio.gather(*(submit_order(name, symbol, side, order_type, quantity, price, stop_price)
+                                      for name in names), return_exceptions=True)
+    results = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, Exception):
+            results.append({"account": name, "error": str(outcome)})
+        else:
+            results.append({"account": name, "response": outcome})
+    placed = sum(1 for r in results if "response" in r)
+    failed = [f"{r['account']}: {r['error']}" for r in results if "error" in r]
+    context = {"placed": placed, "failed": len(failed), "results": results}
+    if placed:
+        context["success"] = f"Order placed on {placed}/{len(names)} accounts."
+    if failed:
+        context["error"] = "Failed to place order on " + "; ".join(failed)
+    return await form_result(request, 200 if placed else 502, **context)
+
+class OrderRequest(BaseModel):
+    symbol: str
+    side: str
+    order_type: str
+    quantity: float
+    price: Optional[float] = None
+    stop_price: Optional[float] = None
+
+class BatchOrderRequest(BaseModel):
+    orders: List[OrderRequest]
+    account: Optional[str] = None
+
+@app.post("/orders/batch")
+async def place_batch_orders(batch: BatchOrderRequest):
+    """
+    Places a list of orders through Binance's batch endpoint (chunks of 5, sent concurrently)
+    and returns one result per order. All results are logged in a single transaction.
+    """
+    if not batch.orders:
+        raise HTTPException(status_code=400, detail="No orders supplied.")
+
+    account = batch.account or DEFAULT_ACCOUNT
+    orders = [{
+        "symbol": o.symbol.upper(), "side": o.side.upper(), "type": o.order_type.upper(),
+        "quantity": o.quantity, "price": o.price, "stop_price": o.stop_price
+    } for o in batch.orders]
+    try:
+        with ExitStack() as lease:
+            with timer("client"):
+                client = await run_in_threadpool(lease.enter_context, accounts.use(account))
+            if not client.client:
+                raise HTTPException(status_code=400, detail="API Keys not configured! Please set them in Settings.")
+            # Invalid orders are rejected locally; only the rest reach the exchange
+            results = await run_in_threadpool(place_validated_batch, client.sync_client, orders)
+    except AccountError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with timer("db_log"):
+        await log_orders_async(batch_log_entries(results, account))
+
+    placed = sum(1 for r in results if 'response' in r)
+    return {"placed": placed, "failed": len(results) - placed, "results": results}
+
+class TriggerRequest(BaseModel):
+    kind: str
+    symbol: str
+    side: str
+    quantity: float
+    trigger_price: Optional[float] = None
+    take_profit: Optional[float] = None
+    stop_price: Optional[float] = None
+    callback_rate: Optional[float] = None
+    reference_price: Optional[float] = None
+
+def pending_triggers(symbol=None):
+    return dict(trigger_engine.metrics(), triggers=trigger_engine.pending(symbol.upper() if symbol else None),
+                stream=price_stream.status() if price_stream else None)
+
+def create_triggers(trigger):
+    """
+    Validates a TriggerRequest (as a dict) and adds its trigger(s) to the engine.
+    """
     client = get_client()
     if not client or not client.client:
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "error": "API Keys not configured! Please set them in Settings.",
-            "history": get_history()
-        })
+        raise HTTPException(status_code=400, detail="API Keys not configured! Please set them in Settings.")
 
+    trigger = TriggerRequest(**trigger)
+    kind, symbol, side = trigger.kind.upper(), trigger.symbol.upper(), trigger.side.upper()
+    filters = get_exchange_filters(client.sync_client)
     try:
-        response = client.place_order(symbol, side, order_type, quantity, price, stop_price)
-        # Log to DB
-        order_data = {
-            "symbol": symbol, "side": side, "type": order_type, 
-            "quantity": quantity, "price": price
-        }
-        # Add stop price to response object for logging if it's not there
-        if stop_price:
-            response['stopPrice'] = stop_price
-            
-        log_order(order_data, response)
-        
-        return templates.TemplateResponse("index.html", {
-            "request": request, # Pass request context
-            "success": f"Order {response.get('status')}! ID: {response.get('orderId')}",
-            "history": get_history(),
-            "last_order": response,
-            "api_key": get_setting('BINANCE_API_KEY') or "",
-            "has_secret": bool(get_setting('BINANCE_API_SECRET'))
-        })
-    except Exception as e:
-        return templates.TemplateResponse("index.html", {
-            "request": request, # Pass request context
-            "error": f"Failed to place order: {str(e)}",
-            "history": get_history(),
-            "api_key": get_setting('BINANCE_API_KEY') or "",
-            "has_secret": bool(get_setting('BINANCE_API_SECRET'))
-        })
+        quantity = trigger.quantity
+        if filters:
+            # What will be sent when it fires
+            quantity = filters.validate_order(symbol, side, 'MARKET', quantity)[0]
+        if kind == 'STOP':
+            created = [trigger_engine.add_stop(symbol, side, quantity, trigger.trigger_price)]
+        elif kind == 'TAKE_PROFIT':
+            created = [trigger_engine.add_take_profit(symbol, side, quantity, trigger.trigger_price)]
+        elif kind == 'TRAILING_STOP':
+            if trigger.callback_rate is None:
+                raise TriggerError("callback_rate is required for TRAILING_STOP.")
+            created = [trigger_engine.add_trailing_stop(symbol, side, quantity, trigger.callback_rate,
+                                                        trigger.reference_price)]
+        elif kind == 'OCO':
+            if trigger.take_profit is None or trigger.stop_price is None:
+                raise TriggerError("take_profit and stop_price are required for OCO.")
+            created = trigger_engine.add_oco(symbol, side, quantity, trigger.take_profit, trigger.stop_price)
+        else:
+            raise TriggerError(f"Unknown trigger kind: {trigger.kind}")
+    except (OrderValidationError, TriggerError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"triggers": created}
+
+def cancel_pending_trigger(trigger_id):
+    trigger = trigger_engine.cancel(trigger_id)
+    if trigger is None:
+        raise HTTPException(status_code=404, detail="No pending trigger with that id.")
+    return trigger
+
+# The trigger engine and its price stream run only on the leader worker; the others forward to it
+LEADER_COMMANDS = {"mark_prices": stream_prices, "triggers": pending_triggers,
+                   "add_trigger": create_triggers, "cancel_trigger": cancel_pending_trigger}
+
+class LeaderService:
+    """
+    Answers other workers' forwarded requests on the leader socket: {"ok": True, "status", "body"|"detail"}.
+    """
+    def dispatch(self, command, message):
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        handler = LEADER_COMMANDS.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+        try:
+            return {"ok": True, "status": 200, "body": handler(**message)}
+        except HTTPException as e:
+            return {"ok": True, "status": e.status_code, "detail": e.detail}
+
+def on_leader(command, **payload):
+    """
+    Runs a LEADER_COMMANDS handler in this process on the leader, or forwards it to the leader.
+    """
+    if worker.leader:
+        return LEADER_COMMANDS[command](**payload)
+    try:
+        reply = leader_request(command, leader_socket(database.DB_FILE), **payload)
+    except DaemonUnavailable:
+        # Between a leader crash and its replacement starting
+        raise HTTPException(status_code=503, detail="Trigger engine unavailable, retry shortly.")
+    except DaemonError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if reply["status"] != 200:
+        raise HTTPException(status_code=reply["status"], detail=reply["detail"])
+    return reply["body"]
+
+@app.get("/triggers")
+def list_triggers(symbol: Optional[str] = None):
+    """
+    Pending client-side triggers, with the trigger engine's counters and price stream state.
+    """
+    return on_leader("triggers", symbol=symbol)
+
+@app.post("/triggers")
+def add_trigger(trigger: TriggerRequest):
+    """
+    Adds a client-side trigger, kept here until the price reaches it and then sent as a MARKET order:
+    STOP or TAKE_PROFIT (trigger_price), TRAILING_STOP (callback_rate in percent, optional
+    reference_price) or OCO (take_profit and stop_price, whichever fires first cancels the other).
+    """
+    return on_leader("add_trigger", trigger=trigger.model_dump())
+
+@app.delete("/triggers/{trigger_id}")
+def cancel_trigger(trigger_id: int):
+    """
+    Cancels a pending trigger; cancelling either leg of an OCO cancels both.
+    """
+    return on_leader("cancel_trigger", trigger_id=trigger_id)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Several workers need the app as an import string, so each process imports its own
+    uvicorn.run("server:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")), workers=WEB_CONCURRENCY)
@@ -1,15 +1,46 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 import os
 import sys
+import tempfile
+import io
+import json
+import re
+import asyncio
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from bot.validators import validate_symbol, validate_side, validate_order_type, validate_positive_float
-from bot.client import BinanceFuturesClient
-from bot.orders import OrderManager
+from bot.client import (BinanceFuturesClient, AsyncBinanceFuturesClient, get_client, close_clients,
+                        RateLimiter, PRIORITY_CANCEL, PRIORITY_ORDER, ORDER_RETRIES)
+from binance.exceptions import BinanceAPIException
+from bot.mock_exchange import MockExchange, DEFAULT_SYMBOLS
+from bot.matching import MatchingEngine, OrderRejected
+from bot.triggers import TriggerEngine, TriggerError, PriceStream
+from bot.exchange_info import ExchangeFilters, ExchangeInfoCache, OrderValidationError
+from bot.orders import OrderManager, load_batch_file, batch_log_entries, execute_for_accounts
+from bot.accounts import AccountPool, AccountError, account_credentials, parse_accounts
+from bot import database
+from bot.user_stream import UserDataStream, replay
+from bot.events import ChangeFeed, EventBroker
+from bot.positions import PositionBook, apply_fill
+from bot.backtest import Bars, BacktestClient, MovingAverageCross, load_bars, param_grid, run_backtest, sweep
+from bot.export import ExportError, export_history
+from bot.metrics import Histogram, HistogramFamily, render as render_metrics
+from bot.profiling import RequestProfiler
+from bot.workers import claim_slot
+from bot import logging_config
+from bot import daemon
+import logging
 import click
+import requests
+import uvicorn
 
 class TestValidators(unittest.TestCase):
     def test_validate_symbol(self):
@@ -43,7 +74,9 @@ class TestBinanceClient(unittest.TestCase):
     @patch.dict(os.environ, {'BINANCE_API_KEY': 'test_key', 'BINANCE_API_SECRET': 'test_secret'})
     def test_client_init(self, MockClient):
         client = BinanceFuturesClient(testnet=True)
-        MockClient.assert_called_with('test_key', 'test_secret', testnet=True)
+        # No blocking ping in the constructor; the health check thread verifies connectivity
+        MockClient.assert_called_with('test_key', 'test_secret', testnet=True, ping=False)
+        MockClient.return_value.ping.assert_not_called()
         self.assertIsNotNone(client.client)
 
     @patch('bot.client.Client')
@@ -63,10 +96,28 @@ class TestBinanceClient(unittest.TestCase):
             symbol='BTCUSDT',
             side='BUY',
             type='MARKET',
-            quantity=0.001
+            quantity=0.001,
+            newClientOrderId=ANY
         )
         self.assertEqual(response['orderId'], 12345)
 
+    @patch('bot.client.Client')
+    def test_only_order_requests_record_exchange_latency(self, MockClient):
+        from bot.metrics import STAGE_SECONDS
+        mock_instance = MockClient.return_value
+        mock_instance.futures_time.return_value = {'serverTime': int(time.time() * 1000)}
+        mock_instance.futures_create_order.return_value = {'orderId': 1, 'status': 'NEW'}
+        mock_instance.futures_cancel_order.return_value = {'orderId': 1, 'status': 'CANCELED'}
+        client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s")
+        count = lambda stage: STAGE_SECONDS.labels(stage).snapshot()['count']
+        before = count("exchange"), count("rate_limit")
+
+        client.sync_time()
+        client.check_health()
+        client.place_order(symbol="BTCUSDT", side="BUY", order_type="MARKET", quantity=0.001)
+        client.cancel_order("BTCUSDT", order_id=1)
+        self.assertEqual((count("exchange") - before[0], count("rate_limit") - before[1]), (2, 2))
+
     @patch('bot.client.Client')
     def test_place_order_limit(self, MockClient):
         mock_instance = MockClient.return_value
@@ -81,7 +132,8 @@ class TestBinanceClient(unittest.TestCase):
             type='LIMIT',
             quantity=1.5,
             price=2000,
-            timeInForce='GTC'
+            timeInForce='GTC',
+            newClientOrderId=ANY
         )
 
     def test_place_limit_order_without_price_raises_error(self):
@@ -93,6 +145,609 @@ class TestBinanceClient(unittest.TestCase):
         with self.assertRaises(ValueError):
             client.place_order(symbol="BTCUSDT", side="BUY", order_type="LIMIT", quantity=0.01)
 
+    def test_base_url_points_client_at_mock_exchange(self):
+        with MockExchange() as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            response = client.place_order(symbol="BTCUSDT", side="BUY", order_type="MARKET", quantity=0.002)
+
+        self.assertEqual(response['status'], 'FILLED')
+        self.assertEqual(response['symbol'], 'BTCUSDT')
+
+    @patch('bot.client.Client')
+    def test_place_batch_orders_chunks_and_reports_per_order(self, MockClient):
+        mock_instance = MockClient.return_value
+        mock_instance.futures_place_batch_order.side_effect = lambda batchOrders: [
+            {'orderId': int(float(o['price']))} for o in batchOrders
+        ]
+        mock_instance.futures_create_order.return_value = {'algoId': 99}
+
+        client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s")
+        orders = [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.01, 'price': p}
+                  for p in range(1, 13)]
+        orders.append({'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'STOP_MARKET', 'quantity': 0.01, 'stop_price': 5})
+        orders.append({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.01})
+
+        results = client.place_batch_orders(orders)
+
+        # 12 limit orders -> 3 batch calls of at most 5; the conditional order goes on its own
+        self.assertEqual(mock_instance.futures_place_batch_order.call_count, 3)
+        for call in mock_instance.futures_place_batch_order.call_args_list:
+            self.assertLessEqual(len(call.kwargs['batchOrders']), 5)
+        self.assertEqual([r['response']['orderId'] for r in results[:12]], list(range(1, 13)))
+        self.assertEqual(results[12]['response'], {'algoId': 99})
+        self.assertIn('Price is required', results[13]['error'])
+
+    @patch('bot.client.Client')
+    def test_place_batch_orders_maps_exchange_errors(self, MockClient):
+        mock_instance = MockClient.return_value
+        mock_instance.futures_place_batch_order.return_value = [
+            {'orderId': 1}, {'code': -4164, 'msg': 'Order notional must be at least 100'}
+        ]
+
+        client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s")
+        orders = [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': q} for q in (0.01, 0.0001)]
+        results = client.place_batch_orders(orders)
+
+        self.assertEqual(results[0]['response'], {'orderId': 1})
+        self.assertEqual(results[1]['code'], -4164)
+
+class TestClientRegistry(unittest.TestCase):
+    def tearDown(self):
+        close_clients()
+
+    @patch('bot.client.BinanceFuturesClient.start', lambda self: self)
+    def test_registry_reuses_client_per_key(self):
+        first = get_client("k1", "s1", testnet=True)
+        self.assertIs(get_client("k1", "s1", testnet=True), first)
+        self.assertIsNot(get_client("k2", "s2", testnet=True), first)
+
+        # Same key with a new secret replaces the cached client
+        replaced = get_client("k1", "s1-rotated", testnet=True)
+        self.assertIsNot(replaced, first)
+        self.assertIs(get_client("k1", "s1-rotated", testnet=True), replaced)
+
+    def test_health_check_syncs_time_over_pooled_session(self):
+        with MockExchange() as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            self.assertTrue(client.check_health())
+            self.assertIsNotNone(client.last_time_sync)
+            self.assertLess(abs(client.health()['time_offset_ms']), 1000)
+            client.close()
+
+    def test_health_check_reports_unreachable_exchange(self):
+        client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url="http://127.0.0.1:9")
+        self.assertFalse(client.check_health())
+        client.close()
+
+class TestRateLimiter(unittest.TestCase):
+    # Binance's limits scaled down to one-second windows so the tests run quickly
+    LIMITS = [
+        ('REQUEST_WEIGHT', 'weight', 60, 1, 'X-MBX-USED-WEIGHT-1M'),
+        ('ORDERS', 'orders', 10, 1, 'X-MBX-ORDER-COUNT-10S'),
+    ]
+
+    def test_cancel_is_served_before_queued_orders(self):
+        limiter = RateLimiter(limits=[('ORDERS', 'orders', 1, 0.5, 'h')], headroom=0)
+        limiter.acquire(orders=1)
+        served = []
+
+        def take(name, priority):
+            limiter.acquire(orders=1, priority=priority)
+            served.append(name)
+
+        order = threading.Thread(target=take, args=('order', PRIORITY_ORDER))
+        order.start()
+        while limiter.metrics()['queued'] < 1:
+            time.sleep(0.01)
+        cancel = threading.Thread(target=take, args=('cancel', PRIORITY_CANCEL))
+        cancel.start()
+        order.join(2)
+        cancel.join(2)
+
+        self.assertEqual(served, ['cancel', 'order'])
+        self.assertGreaterEqual(limiter.metrics()['throttled'], 2)
+
+    def test_headers_and_rejections_update_budget(self):
+        limiter = RateLimiter(limits=self.LIMITS, headroom=0)
+        limiter.acquire(weight=1)
+        limiter.update_from_headers({'X-MBX-USED-WEIGHT-1M': '40'})
+        self.assertEqual(limiter.metrics()['buckets']['REQUEST_WEIGHT']['remaining'], 20)
+
+        limiter.penalize(5)
+        metrics = limiter.metrics()
+        self.assertGreater(metrics['blocked_for'], 4)
+        self.assertEqual(metrics['rejections'], 1)
+
+    def _burst(self, exchange, limiter, count):
+        client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+        client.rate_limiter = limiter
+
+        def submit(_):
+            try:
+                return client.place_order("BTCUSDT", "BUY", "MARKET", 0.002)['status']
+            except BinanceAPIException as e:
+                return e.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(submit, range(count)))
+        client.close()
+        return statuses, time.perf_counter() - start
+
+    def test_paced_burst_stays_under_exchange_limits(self):
+        with MockExchange(rate_limits=self.LIMITS) as exchange:
+            statuses, elapsed = self._burst(exchange, RateLimiter(limits=self.LIMITS), 27)
+
+        self.assertEqual(statuses, ['FILLED'] * 27)
+        self.assertEqual(exchange.rejected, 0)
+        # 9 orders per window after headroom: three windows plus the partial one we started in
+        self.assertLess(elapsed, 4.5)
+
+    def test_unpaced_burst_trips_exchange_limits(self):
+        with MockExchange(rate_limits=self.LIMITS) as exchange:
+            statuses, _ = self._burst(exchange, RateLimiter(limits=[]), 15)
+
+        self.assertIn(429, statuses)
+        self.assertGreater(exchange.rejected, 0)
+
+class TestMatchingEngine(unittest.TestCase):
+    def _limit(self, engine, side, quantity, price, **extra):
+        return engine.submit(dict({'symbol': 'BTCUSDT', 'side': side, 'type': 'LIMIT', 'quantity': quantity,
+                                   'price': price}, **extra))
+
+    def test_price_time_priority_with_partial_fills(self):
+        engine = MatchingEngine(liquidity=False)
+        first = self._limit(engine, 'SELL', '1', '61000')
+        second = self._limit(engine, 'SELL', '1', '61000')
+        better = self._limit(engine, 'SELL', '1', '60500')
+
+        taker = self._limit(engine, 'BUY', '1.5', '61000')
+
+        self.assertEqual((taker['status'], taker['executedQty'], taker['avgPrice']), ('FILLED', '1.5', '60666.66666667'))
+        self.assertEqual(engine.get(better['orderId'])['status'], 'FILLED')
+        self.assertEqual(engine.get(first['orderId'])['executedQty'], '0.5')
+        self.assertEqual(engine.get(second['orderId'])['status'], 'NEW')
+        self.assertEqual(engine.depth('BTCUSDT')['asks'], [['61000', '1.5']])
+
+    def test_market_order_fills_at_reference_price_or_expires_without_liquidity(self):
+        filled = MatchingEngine(prices={'BTCUSDT': '60000'}).submit(
+            {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.002'})
+        expired = MatchingEngine(liquidity=False).submit(
+            {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.002'})
+
+        self.assertEqual((filled['status'], filled['avgPrice']), ('FILLED', '60000'))
+        self.assertEqual((expired['status'], expired['executedQty']), ('EXPIRED', '0'))
+
+    def test_time_in_force(self):
+        engine = MatchingEngine(liquidity=False)
+        self._limit(engine, 'SELL', '1', '60000')
+
+        with self.assertRaises(OrderRejected) as post_only:
+            self._limit(engine, 'BUY', '1', '60000', timeInForce='GTX')
+        with self.assertRaises(OrderRejected) as fill_or_kill:
+            self._limit(engine, 'BUY', '2', '60000', timeInForce='FOK')
+        ioc = self._limit(engine, 'BUY', '2', '60000', timeInForce='IOC')
+
+        self.assertEqual((post_only.exception.code, fill_or_kill.exception.code), (-5022, -5021))
+        self.assertEqual((ioc['status'], ioc['executedQty']), ('EXPIRED', '1'))
+        self.assertEqual(engine.open_orders(), [])
+
+    def test_stops_trigger_when_the_price_reaches_them(self):
+        updates = []
+        engine = MatchingEngine(prices={'BTCUSDT': '60000'}, on_update=lambda o, x, q, p: updates.append((o['orderId'], x)))
+        stop = engine.submit({'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'STOP_MARKET', 'quantity': '1',
+                              'stopPrice': '59000'})
+        stop_limit = engine.submit({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'STOP', 'quantity': '1',
+                                    'stopPrice': '61000', 'price': '60500'})
+        with self.assertRaises(OrderRejected) as immediate:
+            engine.submit({'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'STOP_MARKET', 'quantity': '1',
+                           'stopPrice': '60500'})
+
+        engine.set_price('BTCUSDT', '58900')
+        engine.set_price('BTCUSDT', '61000')
+
+        self.assertEqual(immediate.exception.code, -2021)
+        self.assertEqual((engine.get(stop['orderId'])['status'], engine.get(stop['orderId'])['avgPrice']),
+                         ('FILLED', '58900'))
+        # Triggered at 61000 but limited to 60500, so it rests on the book
+        self.assertEqual(engine.get(stop_limit['orderId'])['status'], 'NEW')
+        self.assertEqual(engine.depth('BTCUSDT')['bids'], [['60500', '1']])
+        self.assertIn((stop['orderId'], 'TRADE'), updates)
+
+    def test_rejects_and_cancels(self):
+        engine = MatchingEngine(symbols={'BTCUSDT'})
+        order = self._limit(engine, 'BUY', '1', '50000')
+
+        with self.assertRaises(OrderRejected) as symbol:
+            engine.submit({'symbol': 'DOGEUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '1'})
+        with self.assertRaises(OrderRejected) as price:
+            engine.submit({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '1'})
+        canceled = engine.cancel(order['orderId'])
+        with self.assertRaises(OrderRejected) as twice:
+            engine.cancel(order['orderId'])
+
+        self.assertEqual((symbol.exception.code, price.exception.code, twice.exception.code), (-1121, -1102, -2011))
+        self.assertEqual(canceled['status'], 'CANCELED')
+        self.assertEqual(engine.depth('BTCUSDT'), {'bids': [], 'asks': []})
+
+    @patch('bot.client.RETRY_BACKOFF', 0)
+    def test_client_sees_injected_errors_and_rejections(self):
+        with MockExchange() as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            exchange.inject_errors(ORDER_RETRIES + 1)
+            with self.assertRaises(BinanceAPIException) as injected:
+                client.place_order("BTCUSDT", "BUY", "MARKET", 0.002)
+            with self.assertRaises(BinanceAPIException) as rejected:
+                client.place_order("BTCUSDT", "SELL", "STOP_MARKET", 0.002, stop_price=61000)
+            filled = client.place_order("BTCUSDT", "BUY", "MARKET", 0.002)
+            client.close()
+
+        self.assertEqual((injected.exception.status_code, injected.exception.code), (503, -1001))
+        self.assertEqual(rejected.exception.code, -2021)
+        self.assertEqual(filled['status'], 'FILLED')
+        self.assertEqual(len(exchange.orders), 1)
+        self.assertEqual(client.order_retries, ORDER_RETRIES)
+
+    def test_conditional_orders_answer_in_the_algo_order_shape(self):
+        with MockExchange(prices={'BTCUSDT': '60000'}) as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            client.place_order("BTCUSDT", "BUY", "MARKET", 0.002)
+            stop = client.place_order("BTCUSDT", "SELL", "STOP_MARKET", 0.002, stop_price=59000, client_order_id='stop-1')
+            found = client.find_order("BTCUSDT", 'stop-1', conditional=True)
+            canceled = client.client.futures_cancel_order(symbol="BTCUSDT", algoId=stop['algoId'])
+            client.close()
+
+        self.assertNotIn('orderId', stop)
+        self.assertEqual((stop['clientAlgoId'], stop['algoStatus'], stop['orderType'], stop['triggerPrice']),
+                         ('stop-1', 'NEW', 'STOP_MARKET', '59000'))
+        self.assertEqual((found['algoId'], found['algoStatus']), (stop['algoId'], 'NEW'))
+        self.assertEqual((canceled['algoId'], canceled['msg']), (stop['algoId'], 'success'))
+        self.assertEqual(exchange.engine.get(stop['algoId'])['status'], 'CANCELED')
+
+    @patch('bot.client.RETRY_BACKOFF', 0)
+    def test_retries_never_execute_an_order_twice(self):
+        with MockExchange() as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            # Lost before the exchange acted: resent under the same client order id
+            exchange.inject_errors(2)
+            resent = client.place_order("BTCUSDT", "BUY", "MARKET", 0.002)
+            # Lost after the exchange acted: found by client order id instead of placed again
+            exchange.inject_errors(1, executed=True)
+            reconciled = client.place_order("BTCUSDT", "SELL", "LIMIT", 0.002, price=70000, client_order_id='mine-1')
+            exchange.inject_errors(1, status=502, code=-1007, msg='Timeout waiting for response', executed=True)
+            results = client.place_batch_orders([
+                {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.002, 'price': p}
+                for p in (50000, 50001)])
+            # Resubmitting under a caller's id returns the order it already placed
+            first = client.place_order("BTCUSDT", "SELL", "LIMIT", 0.002, price=70000, client_order_id='mine-2')
+            again = client.place_order("BTCUSDT", "SELL", "LIMIT", 0.002, price=70000, client_order_id='mine-2')
+            client.close()
+
+        self.assertEqual(resent['status'], 'FILLED')
+        self.assertEqual((reconciled['clientOrderId'], reconciled['status']), ('mine-1', 'NEW'))
+        self.assertEqual([r['response']['price'] for r in results], ['50000', '50001'])
+        self.assertEqual(again['orderId'], first['orderId'])
+        self.assertEqual(len(exchange.orders), 5)
+        self.assertEqual(len({o['clientOrderId'] for o in exchange.orders.values()}), 5)
+        self.assertEqual((client.order_retries, client.orders_reconciled), (4, 4))
+        self.assertEqual(client.in_flight, {})
+
+class TestTriggers(unittest.TestCase):
+    class Client:
+        def __init__(self):
+            self.orders = []
+
+        def place_order(self, symbol, side, order_type, quantity):
+            self.orders.append((symbol, side, order_type, quantity))
+            return {'orderId': len(self.orders), 'status': 'FILLED'}
+
+    def setUp(self):
+        self.client = self.Client()
+        self.engine = TriggerEngine(self.client)
+        self.engine.on_price('BTCUSDT', 60000.0)
+
+    def _ids(self, fired):
+        return [t['id'] for t in fired]
+
+    def test_stops_and_oco_fire_once_when_crossed(self):
+        stop = self.engine.add_stop('BTCUSDT', 'SELL', 0.01, 59000)
+        profit, oco_stop = self.engine.add_oco('BTCUSDT', 'SELL', 0.02, 62000, 58000)
+        with self.assertRaises(TriggerError):
+            self.engine.add_stop('BTCUSDT', 'SELL', 0.01, 61000)
+
+        self.assertEqual(self.engine.on_price('BTCUSDT', 59500.0), [])
+        self.assertEqual(self._ids(self.engine.on_price('BTCUSDT', 62100.0)), [profit['id']])
+        self.assertEqual(self._ids(self.engine.on_price('BTCUSDT', 57000.0)), [stop['id']])
+        self.engine.close()
+
+        self.assertEqual(self.client.orders, [('BTCUSDT', 'SELL', 'MARKET', 0.02), ('BTCUSDT', 'SELL', 'MARKET', 0.01)])
+        self.assertEqual(self.engine.get(oco_stop['id'])['status'], 'CANCELED')
+        self.assertEqual(self.engine.get(profit['id'])['status'], 'PLACED')
+
+    def test_trailing_stop_follows_the_peak(self):
+        trailing = self.engine.add_trailing_stop('BTCUSDT', 'SELL', 0.01, 1.0)
+        buy = self.engine.add_trailing_stop('BTCUSDT', 'BUY', 0.01, 2.0)
+
+        self.engine.on_price('BTCUSDT', 61000.0)
+        self.assertAlmostEqual(self.engine.get(trailing['id'])['trigger_price'], 60390.0)
+        self.assertEqual(self.engine.on_price('BTCUSDT', 60500.0), [])
+        self.assertEqual(self._ids(self.engine.on_price('BTCUSDT', 60390.0)), [trailing['id']])
+        # The buy side trails the lowest price (60000) and fires 2% above it
+        self.assertEqual(self._ids(self.engine.on_price('BTCUSDT', 61200.0)), [buy['id']])
+        self.engine.close()
+
+    def test_tick_only_fires_crossed_triggers(self):
+        for n in range(20000):
+            self.engine.add_stop('BTCUSDT', 'SELL', 0.001, 50000 + n * 0.25)
+        self.engine.cancel(1)
+
+        fired = self.engine.on_price('BTCUSDT', 53750.0)
+        self.engine.close()
+
+        # Sell stops at 53750 and above fire; the cancelled one (50000) and the lower ones stay
+        self.assertEqual(len(fired), 5000)
+        self.assertEqual(self.engine.metrics()['pending'], 14999)
+
+    def test_price_stream_fires_orders_on_mock_exchange(self):
+        with MockExchange(user_stream=True) as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            engine = TriggerEngine(client)
+            engine.on_price('BTCUSDT', 60000.0)
+            stop = engine.add_stop('BTCUSDT', 'SELL', 0.002, 59000)
+            stream = PriceStream(engine, client, ws_url=exchange.ws_url).start()
+            for _ in range(300):
+                if stream.status()['subscribed']:
+                    break
+                time.sleep(0.01)
+
+            exchange.set_price('BTCUSDT', 58500)
+            for _ in range(300):
+                if engine.metrics()['fired']:
+                    break
+                time.sleep(0.01)
+            stream.stop()
+            engine.close()
+            client.close()
+
+        self.assertEqual(engine.get(stop['id'])['status'], 'PLACED')
+        order = exchange.orders[engine.get(stop['id'])['order_id']]
+        self.assertEqual((order['side'], order['type'], order['status']), ('SELL', 'MARKET', 'FILLED'))
+
+class TestAccounts(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_patch = patch.object(database, 'DB_FILE', os.path.join(self.tmpdir.name, 'test.db'))
+        self.db_patch.start()
+        database.init_db()
+        self.exchange = MockExchange().start()
+
+    def tearDown(self):
+        self.exchange.stop()
+        close_clients()
+        database.close_connections()
+        self.db_patch.stop()
+        self.tmpdir.cleanup()
+
+    def test_parse_and_resolve_accounts(self):
+        self.assertEqual(parse_accounts(None), ['default'])
+        self.assertEqual(parse_accounts(['a, b', 'a', 'c']), ['a', 'b', 'c'])
+        database.save_account('sub1', 'key1', 'secret1', testnet=False)
+        self.assertEqual(account_credentials('sub1'), ('key1', 'secret1', False))
+        with self.assertRaises(AccountError):
+            account_credentials('missing')
+        self.assertEqual([a['name'] for a in database.get_accounts()], ['sub1'])
+        self.assertNotIn('api_secret', database.get_accounts()[0])
+        self.assertTrue(database.delete_account('sub1'))
+        self.assertFalse(database.delete_account('sub1'))
+
+    def test_pool_keeps_a_replaced_client_open_until_released(self):
+        pool = AccountPool(credentials=lambda name: (f"key-{name}", "secret", True), base_url=self.exchange.url)
+        with pool.use('sub1') as leased:
+            pool.invalidate('sub1')
+            replacement = pool.get('sub1')
+            self.assertIsNot(replacement, leased)
+            self.assertFalse(leased.sync_client._stop.is_set())
+            self.assertEqual(leased.sync_client.place_order('BTCUSDT', 'BUY', 'MARKET', 0.002)['status'], 'FILLED')
+        self.assertTrue(leased.sync_client._stop.is_set())
+
+        self.assertIsNot(pool.get('sub2').sync_client.rate_limiter, replacement.sync_client.rate_limiter)
+        self.assertEqual(set(pool.metrics()), {'sub1', 'sub2'})
+        pool.close()
+        self.assertTrue(replacement.sync_client._stop.is_set())
+
+    def test_fan_out_places_and_logs_per_account(self):
+        for name in ('sub1', 'sub2'):
+            database.save_account(name, f"key-{name}", 'secret')
+        out = io.StringIO()
+        with patch.dict(os.environ, {'BINANCE_FUTURES_URL': self.exchange.url}):
+            results = execute_for_accounts(['sub1', 'missing', 'sub2'],
+                                           lambda manager: manager.execute_batch(
+                                               [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.002}]),
+                                           out=out)
+        for name, account_results in results.items():
+            if account_results:
+                database.log_orders(batch_log_entries(account_results, name))
+
+        self.assertIsNone(results['missing'])
+        self.assertIn('Unknown account: missing', out.getvalue())
+        self.assertIn('Placed on 2/3 accounts.', out.getvalue())
+        self.assertEqual(len(self.exchange.orders), 2)
+        self.assertEqual([o['account'] for o in database.get_history(account='sub2')], ['sub2'])
+        self.assertEqual(len(database.get_history()), 2)
+
+class TestEventBroker(unittest.TestCase):
+    def test_events_from_other_threads_reach_subscribers(self):
+        broker = EventBroker()
+
+        async def run():
+            queue = broker.subscribe()
+            await asyncio.to_thread(broker.publish, "orders", orders=[{'id': 1}])
+            event = await asyncio.wait_for(queue.get(), 1)
+            broker.unsubscribe(queue)
+            return event
+
+        event = asyncio.run(run())
+        self.assertEqual((event['type'], event['orders']), ("orders", [{'id': 1}]))
+        self.assertEqual(broker.metrics()['subscribers'], 0)
+
+    def test_slow_subscriber_is_told_to_resync(self):
+        broker = EventBroker(queue_size=3)
+
+        async def run():
+            queue = broker.subscribe()
+            for n in range(5):
+                broker.publish("orders", orders=[{'id': n}])
+            await asyncio.sleep(0)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        events = asyncio.run(run())
+        self.assertEqual([e['type'] for e in events], ['resync', 'orders'])
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets_and_quantiles(self):
+        histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+        for value in [0.0005] * 90 + [0.05] * 9 + [2.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot()['counts'], [90, 0, 9, 1])
+        self.assertLessEqual(histogram.quantile(0.5), 0.001)
+        self.assertTrue(0.01 < histogram.quantile(0.95) <= 0.1)
+        self.assertEqual(histogram.quantile(1.0), 2.0)
+
+    def test_prometheus_exposition(self):
+        family = HistogramFamily("test_seconds", "Test latency.", ("stage",), buckets=(0.1, 1.0))
+        with family.labels("exchange").time():
+            pass
+        family.labels("db_log").observe(0.5)
+        text = render_metrics({"test_queue": ("Queue depth.", 3), "test_missing": ("Unset.", None)}, families=[family])
+
+        self.assertIn('# TYPE test_seconds histogram', text)
+        self.assertIn('test_seconds_bucket{stage="db_log",le="0.1"} 0', text)
+        self.assertIn('test_seconds_bucket{stage="db_log",le="1.0"} 1', text)
+        self.assertIn('test_seconds_bucket{stage="exchange",le="+Inf"} 1', text)
+        self.assertIn('test_seconds_count{stage="db_log"} 1', text)
+        self.assertIn('test_queue 3', text)
+        self.assertNotIn('test_missing', text)
+
+    def test_profiler_keeps_slow_requests_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = RequestProfiler(directory=tmp, keep=1)
+            with profiler.profile('/order'):
+                pass
+            self.assertEqual(profiler.profiled, 0)
+
+            profiler.configure(enabled=True, threshold_ms=5)
+            with profiler.profile('/order'):
+                pass
+            with profiler.profile('/events'):
+                time.sleep(0.01)
+            self.assertFalse(profiler.captures)
+
+            for _ in range(2):
+                with profiler.profile('/order'):
+                    time.sleep(0.01)
+            self.assertEqual(profiler.profiled, 3)
+            self.assertEqual(len(os.listdir(tmp)), 1)
+            self.assertEqual(profiler.status()['captures'][0]['path'], '/order')
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'bot.log')
+
+    def tearDown(self):
+        logging_config.shutdown_logging()
+        self.tmpdir.cleanup()
+
+    def test_setup_is_idempotent_and_queued(self):
+        logger = logging_config.setup_logging(self.path)
+        logging_config.setup_logging(self.path)
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], logging.handlers.QueueHandler)
+
+        response = {'status': 'NEW'}
+        logging.getLogger("trading_bot.test").warning("Order %s", response)
+        response['status'] = 'FILLED'
+        logging_config.shutdown_logging()
+        self.assertEqual(logger.handlers, [])
+        with open(self.path) as f:
+            self.assertIn("Order {'status': 'NEW'}", f.read())
+
+    def test_json_lines_keep_extra_fields_and_tracebacks(self):
+        logging_config.setup_logging(self.path, log_format='json')
+        log = logging.getLogger("trading_bot.test")
+        log.info("Placed %s", "BTCUSDT", extra={'order_id': 42})
+        try:
+            raise ValueError("bad fill")
+        except ValueError:
+            log.exception("Fill failed")
+        logging_config.shutdown_logging()
+
+        with open(self.path) as f:
+            placed, failed = [json.loads(line) for line in f]
+        self.assertEqual((placed['message'], placed['order_id'], placed['level']), ('Placed BTCUSDT', 42, 'INFO'))
+        self.assertIn('ValueError: bad fill', failed['exc_info'])
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, 'bot.sock')
+        self.db_patch = patch.object(database, 'DB_FILE', os.path.join(self.tmpdir.name, 'test.db'))
+        self.db_patch.start()
+        self.exchange = MockExchange().start()
+        client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=self.exchange.url)
+        self.server = daemon.OrderDaemon(self.socket_path, client=client).warm_up()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join(5)
+        self.exchange.stop()
+        database.close_connections()
+        self.db_patch.stop()
+        self.tmpdir.cleanup()
+
+    def test_orders_are_served_by_the_warm_client(self):
+        reply = daemon.request("order", self.socket_path, symbol="BTCUSDT", side="BUY", type="MARKET", quantity=0.002)
+        self.assertEqual(reply['response']['status'], 'FILLED')
+        self.assertIn('Order Placed Successfully', reply['output'])
+
+        orders = [{'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.002, 'price': p} for p in (60000, 61000)]
+        reply = daemon.request("batch", self.socket_path, orders=orders)
+        self.assertEqual(len(reply['results']), 2)
+        self.assertEqual(len(database.get_history()), 2)
+        self.assertEqual(daemon.request("ping", self.socket_path)['requests'], 3)
+
+        with self.assertRaises(daemon.DaemonError):
+            daemon.request("order", self.socket_path, symbol="BTCUSDT")
+        with self.assertRaises(daemon.DaemonError):
+            daemon.request("reboot", self.socket_path)
+
+    def test_second_daemon_and_missing_socket(self):
+        with self.assertRaises(RuntimeError):
+            daemon.OrderDaemon(self.socket_path, client=self.server.client).serve_forever()
+        with self.assertRaises(daemon.DaemonUnavailable):
+            daemon.request("ping", os.path.join(self.tmpdir.name, 'none.sock'))
+
+class TestAsyncClient(unittest.TestCase):
+    def test_orders_run_concurrently_off_the_event_loop(self):
+        sync_client = MagicMock()
+        sync_client.place_order.side_effect = lambda *a, **kw: time.sleep(0.2) or {'orderId': 1}
+        client = AsyncBinanceFuturesClient(sync_client, max_workers=5)
+
+        async def run():
+            start = time.perf_counter()
+            results = await asyncio.gather(*(client.place_order("BTCUSDT", "BUY", "MARKET", 0.1) for _ in range(5)))
+            return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(run())
+        client.close()
+        self.assertEqual(len(results), 5)
+        # Five 200ms calls overlap instead of taking a second end to end
+        self.assertLess(elapsed, 0.6)
+
 class TestOrderManager(unittest.TestCase):
     @patch('bot.client.BinanceFuturesClient')
     def test_execute_order_success(self, MockClient):
@@ -123,5 +778,983 @@ class TestOrderManager(unittest.TestCase):
          response = manager.execute_order("BTCUSDT", "BUY", "MARKET", 0.1)
          self.assertIsNone(response)
 
+class TestExchangeFilters(unittest.TestCase):
+    def setUp(self):
+        self.filters = ExchangeFilters({'symbols': DEFAULT_SYMBOLS})
+
+    def test_rounds_to_step_and_tick(self):
+        qty, price, stop = self.filters.validate_order("BTCUSDT", "BUY", "LIMIT", 0.0029, price=60000.04)
+        self.assertEqual((qty, price, stop), (0.002, 60000.0, None))
+
+        qty, price, stop = self.filters.validate_order("BTCUSDT", "SELL", "STOP_MARKET", 0.3, stop_price=58000.06)
+        self.assertEqual((qty, stop), (0.3, 58000.1))
+
+    def test_rejects_locally(self):
+        with self.assertRaisesRegex(OrderValidationError, 'Unknown symbol'):
+            self.filters.validate_order("FOOUSDT", "BUY", "MARKET", 1)
+        with self.assertRaisesRegex(OrderValidationError, 'below the minimum'):
+            self.filters.validate_order("BTCUSDT", "BUY", "MARKET", 0.0004)
+        with self.assertRaisesRegex(OrderValidationError, 'notional'):
+            self.filters.validate_order("BTCUSDT", "BUY", "LIMIT", 0.001, price=50000)
+        with self.assertRaisesRegex(OrderValidationError, 'notional'):
+            self.filters.validate_order("BTCUSDT", "BUY", "MARKET", 0.001, reference_price=50000)
+
+    def test_batch_validation_is_aligned_with_input(self):
+        orders = [
+            {'symbol': 'ETHUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 1.23456, 'price': 3000.456},
+            {'symbol': 'NOPE', 'side': 'BUY', 'type': 'MARKET', 'quantity': 1},
+            {'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'MARKET', 'quantity': 0.01},
+        ]
+        results = self.filters.validate_orders(orders)
+        self.assertEqual(results[0][0]['quantity'], 1.234)
+        self.assertEqual(results[0][0]['price'], 3000.46)
+        self.assertIsNone(results[1][0])
+        self.assertEqual(results[2], (dict(orders[2]), None))
+
+    def test_fetch_is_charged_to_the_rate_limiter(self):
+        with MockExchange() as exchange, tempfile.TemporaryDirectory() as tmp:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            requests_before = client.rate_limiter.requests
+            self.assertIn('BTCUSDT', ExchangeInfoCache(client, path=os.path.join(tmp, 'info.json')).get())
+            client.close()
+        self.assertEqual(client.rate_limiter.requests, requests_before + 1)
+
+    def test_cache_persists_snapshot_and_refreshes_when_stale(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'info.json')
+            client = MagicMock()
+            client.exchange_info.side_effect = lambda: {'symbols': list(DEFAULT_SYMBOLS)}
+
+            self.assertIn('BTCUSDT', ExchangeInfoCache(client, path=path).get())
+            self.assertEqual(client.exchange_info.call_count, 1)
+
+            # A fresh process reads the snapshot from disk instead of the exchange
+            self.assertIn('ETHUSDT', ExchangeInfoCache(client, path=path).get())
+            self.assertEqual(client.exchange_info.call_count, 1)
+
+            # Past the TTL the stale copy is served while a refresh runs in the background
+            stale = ExchangeInfoCache(client, path=path, ttl=0)
+            self.assertIn('BTCUSDT', stale.get())
+            # Wait for the refresh to finish writing its snapshot before the directory goes away
+            for _ in range(100):
+                if not stale._refreshing:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(client.exchange_info.call_count, 2)
+
+    def test_concurrent_stale_reads_start_one_refresh(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'info.json')
+            release = threading.Event()
+
+            class SlowClient:
+                # Widens the gap between seeing a stale snapshot and starting its refresh
+                exchange_info = MagicMock(side_effect=lambda: {'symbols': list(DEFAULT_SYMBOLS)})
+
+                @property
+                def client(self):
+                    time.sleep(0.05)
+                    return True
+
+            client = SlowClient()
+            ExchangeInfoCache(client, path=path).get()
+            client.exchange_info.side_effect = lambda: release.wait(5) and {'symbols': list(DEFAULT_SYMBOLS)}
+
+            stale = ExchangeInfoCache(client, path=path, ttl=0)
+            start = threading.Barrier(8)
+
+            def read():
+                start.wait()
+                stale.get()
+
+            readers = [threading.Thread(target=read) for _ in range(8)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+            release.set()
+            for _ in range(100):
+                if not stale._refreshing:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(client.exchange_info.call_count, 2)
+
+class TestBatchFiles(unittest.TestCase):
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load_csv(self):
+        path = self._write('orders.csv', "symbol,side,type,quantity,price,stop_price\n"
+                                         "btcusdt,buy,limit,0.01,60000,\n"
+                                         "BTCUSDT,SELL,STOP_MARKET,0.01,,58000\n")
+        self.assertEqual(load_batch_file(path), [
+            {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.01, 'price': 60000.0},
+            {'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'STOP_MARKET', 'quantity': 0.01, 'stop_price': 58000.0},
+        ])
+
+    def test_load_jsonl_reports_bad_line(self):
+        path = self._write('orders.jsonl', '{"symbol": "ETHUSDT", "side": "BUY", "order_type": "MARKET", "quantity": 1}\n'
+                                           '{"symbol": "ETHUSDT", "side": "BUY"}\n')
+        with self.assertRaisesRegex(ValueError, 'line 2'):
+            load_batch_file(path)
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_patch = patch.object(database, 'DB_FILE', os.path.join(self.tmpdir.name, 'test.db'))
+        self.db_patch.start()
+        database.init_db()
+
+    def tearDown(self):
+        database.close_order_writer()
+        database.close_connections()
+        self.db_patch.stop()
+        self.tmpdir.cleanup()
+
+    def _log(self, symbol, side, status):
+        database.log_order(
+            {'symbol': symbol, 'side': side, 'type': 'MARKET', 'quantity': 0.1},
+            {'status': status, 'orderId': 1}
+        )
+
+    def test_history_keyset_pagination(self):
+        for _ in range(7):
+            self._log('BTCUSDT', 'BUY', 'NEW')
+
+        first = database.get_history_page(limit=3)
+        self.assertEqual([o['id'] for o in first['orders']], [7, 6, 5])
+        self.assertEqual(first['next_cursor'], 5)
+
+        second = database.get_history_page(limit=3, before_id=first['next_cursor'])
+        self.assertEqual([o['id'] for o in second['orders']], [4, 3, 2])
+
+        last = database.get_history_page(limit=3, before_id=second['next_cursor'])
+        self.assertEqual([o['id'] for o in last['orders']], [1])
+        self.assertIsNone(last['next_cursor'])
+
+    def test_history_filters(self):
+        self._log('BTCUSDT', 'BUY', 'NEW')
+        self._log('ETHUSDT', 'SELL', 'FILLED')
+        self._log('BTCUSDT', 'SELL', 'FILLED')
+
+        self.assertEqual(len(database.get_history(symbol='btcusdt')), 2)
+        self.assertEqual([o['id'] for o in database.get_history(side='SELL', status='FILLED')], [3, 2])
+        self.assertEqual(database.get_history(end='2000-01-01T00:00:00'), [])
+
+    def test_log_orders_single_transaction(self):
+        results = [
+            {'order': {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.1, 'price': 1.0},
+             'response': {'orderId': 5, 'status': 'NEW'}},
+            {'order': {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.1},
+             'error': 'Price is required for LIMIT orders.'},
+        ]
+        database.log_orders(batch_log_entries(results))
+
+        rows = database.get_history()
+        self.assertEqual([(r['status'], r['order_id']) for r in rows], [('REJECTED', ''), ('NEW', '5')])
+
+    def test_connection_is_pooled_per_thread(self):
+        import threading
+        conn = database.get_connection()
+        self.assertIs(database.get_connection(), conn)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+
+        other = []
+        t = threading.Thread(target=lambda: other.append(database.get_connection()))
+        t.start()
+        t.join()
+        self.assertIsNot(other[0], conn)
+
+    def test_settings_served_from_cache(self):
+        database.save_setting('BINANCE_API_KEY', 'key1')
+        self.assertEqual(database.get_setting('BINANCE_API_KEY'), 'key1')
+
+        with patch.object(database, 'GET_SETTINGS_SQL', 'SELECT broken'):
+            # Neither a cache hit nor an unrelated order insert re-reads the table
+            self._log('BTCUSDT', 'BUY', 'NEW')
+            self.assertEqual(database.get_setting('BINANCE_API_KEY'), 'key1')
+
+            # A write through save_setting updates the cache in place
+            database.save_setting('BINANCE_API_KEY', 'key2')
+            self.assertEqual(database.get_setting('BINANCE_API_KEY'), 'key2')
+
+    def test_settings_change_from_other_process_is_seen(self):
+        self.assertIsNone(database.get_setting('BINANCE_API_SECRET'))
+
+        # Simulates another worker process writing through its own connection
+        conn = database.sqlite3.connect(database.DB_FILE)
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('BINANCE_API_SECRET', 's3')")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(database.get_setting('BINANCE_API_SECRET'), 's3')
+        self.assertEqual(database.get_settings(), {'BINANCE_API_SECRET': 's3'})
+
+    def test_logged_rows_are_returned_by_id(self):
+        row_id = database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.1},
+                                    {'status': 'FILLED', 'orderId': 7})
+        ids = database.log_orders([
+            ({'symbol': 'ETHUSDT', 'side': 'SELL', 'type': 'MARKET', 'quantity': 1}, {'status': 'NEW', 'orderId': n})
+            for n in (8, 9)
+        ])
+        self.assertEqual(ids, [row_id + 1, row_id + 2])
+        self.assertEqual([o['order_id'] for o in database.get_orders(ids)], ['9', '8'])
+        self.assertEqual([o['id'] for o in database.get_orders(order_ids=[7])], [row_id])
+
+    def _count(self):
+        return database.get_connection().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def _record(self, n):
+        return database._order_record({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.1},
+                                      {'status': 'FILLED', 'orderId': n})
+
+    def test_order_writer_acks_from_journal_and_batches_inserts(self):
+        writer = database.OrderWriter(batch_size=1000, flush_interval=3600, fsync=False).start()
+        for future in [writer.submit([self._record(n)]) for n in range(20)]:
+            future.result(5)
+
+        # Acknowledged orders are in the journal before any of them reach the table
+        with open(writer.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 20)
+        self.assertEqual(self._count(), 0)
+
+        writer.close()
+        self.assertEqual(self._count(), 20)
+        self.assertEqual(writer.metrics()['batches'], 1)
+        self.assertEqual(os.path.getsize(writer.journal_path), 0)
+
+    def test_journal_is_replayed_after_crash(self):
+        journal = os.path.join(self.tmpdir.name, 'crashed.journal')
+        with open(journal, 'w') as f:
+            for seq in (1, 2, 3):
+                f.write(json.dumps(dict(self._record(seq), seq=seq)) + '\n')
+            f.write('{"timestamp": "2026-')
+        # Record 1 made it into the database before the crash
+        with database.get_connection() as conn:
+            record = self._record(1)
+            conn.execute(database.INSERT_ORDER_SQL, database._order_row(record['order'], record['response']))
+            conn.execute(database.SET_JOURNAL_SEQ_SQL, ('crashed.journal', 1))
+
+        writer = database.OrderWriter(journal_path=journal, fsync=False).start()
+        self.assertEqual(writer.replayed, 2)
+        writer.submit([self._record(4)]).result(5)
+        writer.close()
+
+        order_ids = [r[0] for r in database.get_connection().execute("SELECT order_id FROM orders ORDER BY id")]
+        self.assertEqual(order_ids, ['1', '2', '3', '4'])
+        # Nothing is replayed twice
+        self.assertEqual(database.OrderWriter(journal_path=journal, fsync=False).replay(), 0)
+
+    def test_order_writer_survives_journal_and_insert_errors(self):
+        writer = database.OrderWriter(batch_size=1000, flush_interval=0.05, fsync=False).start()
+        real_journal = writer._journal
+        writer._journal = MagicMock(wraps=real_journal)
+        writer._journal.flush.side_effect = OSError("disk full")
+        with self.assertRaises(OSError):
+            writer.submit([self._record(1)]).result(5)
+        # A failed journal write leaves nothing pending to be inserted later
+        self.assertEqual((writer.metrics()['pending_rows'], writer._seq), (0, 0))
+        writer._journal = real_journal
+
+        # Errors other than sqlite3.Error while flushing don't kill the writer thread
+        with patch.object(writer, '_rotate', side_effect=OSError("truncate failed")):
+            writer.submit([self._record(2)]).result(5)
+            time.sleep(0.3)
+        self.assertTrue(writer._thread.is_alive())
+        writer.submit([self._record(3)]).result(5)
+        writer.close()
+        order_ids = [r[0] for r in database.get_connection().execute("SELECT order_id FROM orders ORDER BY id")]
+        self.assertEqual(order_ids, ['2', '3'])
+
+    def test_async_logging_goes_through_writer(self):
+        entries = [({'symbol': 'ETHUSDT', 'side': 'SELL', 'type': 'MARKET', 'quantity': 1}, {'status': 'NEW', 'orderId': n})
+                   for n in range(10)]
+
+        async def run():
+            await asyncio.gather(database.log_orders_async(entries[:5]),
+                                 *(database.log_order_async(*entry) for entry in entries[5:]))
+
+        asyncio.run(run())
+        database.close_order_writer()
+        self.assertEqual(self._count(), 10)
+
+    def test_raw_response_is_compressed_and_optional(self):
+        response = {'orderId': 5, 'symbol': 'BTCUSDT', 'status': 'NEW', 'clientOrderId': 'x-abc', 'price': '60000',
+                    'avgPrice': '0.00', 'origQty': '0.002', 'executedQty': '0', 'type': 'LIMIT', 'side': 'BUY',
+                    'stopPrice': '0', 'timeInForce': 'GTC', 'updateTime': 1760000000000}
+        raw = database.pack_response(response)
+        self.assertLess(len(raw), len(json.dumps(response)) / 2)
+        self.assertEqual(database.unpack_response(raw), response)
+
+        row_id = database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.002}, response)
+        self.assertEqual(database.get_order_response(row_id), response)
+        self.assertNotIn('raw', database.get_history_page()['orders'][0])
+        with patch.object(database, 'ORDER_STORE_RAW', False):
+            row_id = database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.002},
+                                        dict(response, clientOrderId='x-def'))
+        self.assertIsNone(database.get_order_response(row_id))
+
+    def test_logging_an_order_twice_keeps_one_row(self):
+        order = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 0.1}
+        first = database.log_order(order, {'orderId': 1, 'clientOrderId': 'tb-a', 'status': 'NEW'})
+        ids = database.log_orders([(order, {'orderId': 2, 'clientOrderId': 'tb-b'}),
+                                   (order, {'orderId': 1, 'clientOrderId': 'tb-a'}),
+                                   (order, {'orderId': 3}),
+                                   (order, {'orderId': 2, 'clientOrderId': 'tb-b'})])
+        self.assertEqual(database.log_order(order, {'orderId': 1, 'clientOrderId': 'tb-a'}), first)
+
+        stored = {row['order_id']: row['id'] for row in database.get_history()}
+        self.assertEqual(ids, [stored['2'], first, stored['3'], stored['2']])
+        self.assertEqual(len(stored), 3)
+
+    def test_row_ids_of_filled_batches_with_duplicates(self):
+        # Fills triggers and skipped duplicates must not shift the ids handed back
+        order = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 1}
+        filled = {'status': 'FILLED', 'executedQty': '1', 'avgPrice': '10'}
+        [first] = database.log_orders([(order, dict(filled, orderId=1, clientOrderId='tb-a'))])
+        ids = database.log_orders([(order, dict(filled, orderId=1, clientOrderId='tb-a')),
+                                   (order, dict(filled, orderId=2, clientOrderId='tb-b')),
+                                   (order, dict(filled, orderId=3))])
+        stored = {row['order_id']: row['id'] for row in database.get_history()}
+        self.assertEqual(ids, [first, stored['2'], stored['3']])
+
+    def test_client_order_id_index_made_unique_on_old_databases(self):
+        conn = database.get_connection()
+        with conn:
+            conn.execute("DROP INDEX idx_orders_client_order_id")
+            conn.execute("CREATE INDEX idx_orders_client_order_id ON orders (client_order_id)")
+            conn.executemany("INSERT INTO orders (symbol, client_order_id) VALUES ('BTCUSDT', ?)",
+                             [('a',), ('a',), ('',), ('',), ('b',)])
+        database.init_db()
+
+        rows = conn.execute("SELECT client_order_id FROM orders ORDER BY id").fetchall()
+        self.assertEqual([r[0] for r in rows], ['a', None, None, None, 'b'])
+        with self.assertRaises(database.sqlite3.IntegrityError):
+            conn.execute("INSERT INTO orders (symbol, client_order_id) VALUES ('BTCUSDT', 'b')")
+
+    def test_history_query_uses_index(self):
+        conn = database.sqlite3.connect(database.DB_FILE)
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM orders WHERE symbol = ? AND id < ? ORDER BY id DESC LIMIT 50",
+            ('BTCUSDT', 100)
+        ).fetchall()
+        conn.close()
+        self.assertIn('idx_orders_symbol', ' '.join(str(row) for row in plan))
+
+    def test_export_streams_in_chunks(self):
+        for i in range(5):
+            self._log('BTCUSDT', 'BUY', 'NEW')
+        self._log('ETHUSDT', 'SELL', 'FILLED')
+
+        chunks = list(database.iter_history(chunk_size=2))
+        self.assertEqual([len(rows) for rows in chunks], [2, 2, 2])
+        self.assertEqual(chunks[0][0][0], 1)
+
+        lines = b''.join(export_history('csv', symbol='btcusdt')).decode().splitlines()
+        self.assertEqual(lines[0].split(','), list(database.HISTORY_COLUMNS))
+        self.assertEqual(len(lines), 6)
+        rows = [json.loads(line) for line in b''.join(export_history('jsonl', status='filled')).splitlines()]
+        self.assertEqual([(row['id'], row['symbol']) for row in rows], [(6, 'ETHUSDT')])
+        with self.assertRaises(ExportError):
+            export_history('xlsx')
+
+    def test_export_module_imports_pyarrow_only_for_parquet(self):
+        # cli.py imports bot.export on every call; pyarrow must not come with it
+        code = ("import sys\n"
+                "class Recorder:\n"
+                "    def find_spec(self, name, path=None, target=None):\n"
+                "        if name.startswith('pyarrow'):\n"
+                "            print(name)\n"
+                "sys.meta_path.insert(0, Recorder())\n"
+                "import bot.export\n")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout, '')
+
+    def test_summary_aggregates_volume_and_vwap(self):
+        fills = [('BTCUSDT', 'BUY', '1', '100'), ('BTCUSDT', 'BUY', '3', '200'),
+                 ('BTCUSDT', 'SELL', '2', '150'), ('BTCUSDT', 'BUY', '0', '0')]
+        for symbol, side, qty, price in fills:
+            database.log_order({'symbol': symbol, 'side': side, 'type': 'MARKET', 'quantity': 1},
+                               {'orderId': 1, 'status': 'FILLED', 'executedQty': qty, 'avgPrice': price})
+
+        buy, sell = database.summarize_history(symbol='BTCUSDT')
+        self.assertEqual((buy['side'], buy['orders'], buy['filled_orders'], buy['volume']), ('BUY', 3, 2, 4.0))
+        self.assertAlmostEqual(buy['vwap'], 175.0)
+        self.assertEqual((sell['notional'], sell['vwap']), (300.0, 150.0))
+        self.assertEqual(buy['day'], database.get_history(limit=1)[0]['timestamp'][:10])
+
+        database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': 1, 'account': 'sub1'},
+                           {'orderId': 2, 'status': 'FILLED', 'executedQty': '5', 'avgPrice': '300'})
+        [sub] = database.summarize_history(account='sub1')
+        self.assertEqual((sub['orders'], sub['volume']), (1, 5.0))
+        self.assertEqual(database.summarize_history(account='default')[0]['volume'], 4.0)
+        rows = [json.loads(line) for line in b''.join(export_history('jsonl', account='sub1')).splitlines()]
+        self.assertEqual([row['account'] for row in rows], ['sub1'])
+
+class TestPositions(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_patch = patch.object(database, 'DB_FILE', os.path.join(self.tmpdir.name, 'test.db'))
+        self.db_patch.start()
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        self.db_patch.stop()
+        self.tmpdir.cleanup()
+
+    def _fill(self, side, qty, price, order_id, account=None):
+        database.log_order({'symbol': 'BTCUSDT', 'side': side, 'type': 'MARKET', 'quantity': qty, 'account': account},
+                           {'orderId': order_id, 'clientOrderId': f"c{order_id}", 'status': 'FILLED',
+                            'executedQty': str(qty), 'avgPrice': str(price)})
+
+    def test_average_cost_accounting(self):
+        position = {'net_qty': 0.0, 'avg_entry': 0.0, 'realized_pnl': 0.0}
+        apply_fill(position, 'BUY', 1, 100)
+        apply_fill(position, 'BUY', 3, 200)
+        self.assertEqual((position['net_qty'], position['avg_entry']), (4, 175))
+        apply_fill(position, 'SELL', 2, 200)
+        self.assertEqual((position['net_qty'], position['avg_entry'], position['realized_pnl']), (2, 175, 50))
+        # Crossing zero closes the long and opens a short at the fill price
+        apply_fill(position, 'SELL', 3, 150)
+        self.assertEqual((position['net_qty'], position['avg_entry'], position['realized_pnl']), (-1, 150, 0))
+        apply_fill(position, 'BUY', 1, 100)
+        self.assertEqual((position['net_qty'], position['avg_entry'], position['realized_pnl']), (0, 0, 50))
+
+    def test_partial_fills_from_order_updates(self):
+        database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 2, 'price': 100},
+                           {'orderId': 7, 'status': 'NEW', 'executedQty': '0', 'avgPrice': '0'})
+        database.update_orders([{'order_id': 7, 'status': 'PARTIALLY_FILLED', 'executed_qty': 1.0,
+                                 'avg_price': 100.0, 'update_time': 1}])
+        database.update_orders([{'order_id': 7, 'status': 'FILLED', 'executed_qty': 2.0,
+                                 'avg_price': 110.0, 'update_time': 2}])
+
+        self.assertEqual([fill[4:] for fill in database.get_fills()], [(1.0, 100.0), (1.0, 120.0)])
+        [position] = PositionBook().load().positions(prices={'BTCUSDT': 130.0})
+        self.assertEqual((position['net_qty'], position['avg_entry'], position['unrealized_pnl']), (2, 110, 40))
+
+    def test_restart_applies_snapshot_plus_tail(self):
+        self._fill('BUY', 2, 100, 1)
+        self._fill('BUY', 1, 50, 2, account='sub')
+        book = PositionBook().load()
+        self.assertEqual(book.last_fill_id, 2)
+
+        self._fill('SELL', 1, 130, 3)
+        # The snapshot is still at fill 2; a new book applies only fill 3 on top of it
+        with patch('bot.positions.get_fills', wraps=database.get_fills) as get_fills:
+            restarted = PositionBook().load()
+        self.assertEqual(get_fills.call_args_list[0].args[0], 2)
+        book.refresh()
+        numbers = lambda book: [(p['account'], p['net_qty'], p['avg_entry'], p['realized_pnl']) for p in book.positions()]
+        self.assertEqual(numbers(restarted), numbers(book))
+        default, sub = restarted.positions()
+        self.assertEqual((default['net_qty'], default['realized_pnl']), (1, 30))
+        self.assertEqual((sub['account'], sub['net_qty']), ('sub', 1))
+        self.assertEqual([p['symbol'] for p in restarted.positions(account='sub')], ['BTCUSDT'])
+
+class TestBacktest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _bars(self, closes):
+        closes = [float(c) for c in closes]
+        opens = closes[:1] + closes[:-1]
+        return Bars.from_arrays([60000 * i for i in range(len(closes))], opens,
+                                [max(o, c) for o, c in zip(opens, closes)],
+                                [min(o, c) for o, c in zip(opens, closes)], closes)
+
+    def test_fill_model(self):
+        client = BacktestClient('BTCUSDT', self._bars([100, 100, 97, 90, 104, 110]), slippage_bps=10)
+        market = client.place_order('BTCUSDT', 'BUY', 'MARKET', 1)
+        self.assertEqual((market['status'], market['avgPrice']), ('FILLED', '100.1'))
+        limit = client.place_order('BTCUSDT', 'BUY', 'LIMIT', 1, price=98)
+        cancelled = client.place_order('BTCUSDT', 'BUY', 'LIMIT', 1, price=50)
+        stop = client.place_order('BTCUSDT', 'BUY', 'STOP_MARKET', 1, stop_price=105)
+        with self.assertRaises(OrderRejected) as rejected:
+            client.place_order('BTCUSDT', 'SELL', 'STOP_MARKET', 1, stop_price=101)
+        self.assertEqual(rejected.exception.code, -2021)
+
+        client.advance(3)
+        client.cancel_order('BTCUSDT', order_id=cancelled['orderId'])
+        client.advance(5)
+        statuses = {o['orderId']: (o['status'], o['avgPrice'], o['updateTime']) for o in map(client._response, client.orders)}
+        # Each fills on the first bar that reaches its price; the stop pays slippage
+        self.assertEqual(statuses[limit['orderId']], ('FILLED', '98', 120000))
+        self.assertEqual(statuses[cancelled['orderId']], ('CANCELED', '0', 180000))
+        self.assertEqual(statuses[stop['orderId']], ('FILLED', '105.105', 300000))
+        self.assertEqual(client.position['net_qty'], 3)
+        self.assertEqual(client.open_orders(), [])
+
+    def test_csv_klines_and_trades_are_converted_once(self):
+        klines = os.path.join(self.tmpdir.name, 'BTCUSDT-1m.csv')
+        with open(klines, 'w') as f:
+            f.write("1700000060000,2,3,1,2.5,10,0,0,0,0,0,0\n1700000000000,1,2,0.5,2,5,0,0,0,0,0,0\n")
+        bars = load_bars(klines)
+        self.assertEqual(bars.time.tolist(), [1700000000000, 1700000060000])
+        self.assertEqual(bars.close.tolist(), [2, 2.5])
+        self.assertTrue(os.path.exists(klines + '.npy'))
+
+        trades = os.path.join(self.tmpdir.name, 'trades.csv')
+        with open(trades, 'w') as f:
+            f.write("id,price,qty,quote_qty,time,is_buyer_maker\n1,100.5,0.2,20.1,1700000000000,true\n")
+        bars = load_bars(trades)
+        self.assertEqual([bars.open[0], bars.high[0], bars.low[0], bars.close[0], bars.volume[0]], [100.5] * 4 + [0.2])
+
+    def test_sweep_writes_orders_schema(self):
+        path = os.path.join(self.tmpdir.name, 'bars.npy')
+        closes = [100 + 10 * ((i // 20) % 2) + (i % 20) * (1 if (i // 20) % 2 == 0 else -1) for i in range(200)]
+        self._bars(closes).save(path)
+        db_path = os.path.join(self.tmpdir.name, 'backtest.db')
+
+        runs = param_grid({'fast': [2, 3], 'slow': [8]})
+        results = sweep(path, 'BTCUSDT', MovingAverageCross, runs, processes=1, db_path=db_path)
+        self.assertEqual([r['params'] for r in results], runs)
+        expected = run_backtest(MovingAverageCross(fast=2, slow=8), load_bars(path), 'BTCUSDT').summary()
+        self.assertEqual((results[0]['orders'], results[0]['pnl']), (expected['orders'], expected['pnl']))
+
+        with patch.object(database, 'DB_FILE', db_path):
+            try:
+                orders = database.get_history(limit=1000, account=results[1]['run_id'])
+                book = PositionBook().load()
+            finally:
+                database.close_connections()
+        self.assertEqual(len(orders), results[1]['orders'])
+        [position] = book.positions(account=results[1]['run_id'])
+        self.assertAlmostEqual(position['realized_pnl'], results[1]['realized_pnl'])
+
+    def test_order_manager_drives_backtest_client(self):
+        client = BacktestClient('BTCUSDT', self._bars([100, 101]))
+        with patch('bot.exchange_info.get_exchange_filters', return_value=None):
+            response = OrderManager(client=client, out=io.StringIO()).execute_order('BTCUSDT', 'SELL', 'MARKET', 0.5)
+        self.assertEqual((response['status'], client.position['net_qty']), ('FILLED', -0.5))
+
+class TestWorkers(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_patch = patch.object(database, 'DB_FILE', os.path.join(self.tmpdir.name, 'test.db'))
+        self.db_patch.start()
+        database.init_db()
+
+    def tearDown(self):
+        close_clients()
+        database.close_connections()
+        self.db_patch.stop()
+        self.tmpdir.cleanup()
+
+    def _other_process(self, sql, params):
+        # Another worker writes through its own connection
+        conn = database._connect(database.DB_FILE)
+        with conn:
+            conn.execute(sql, params)
+        conn.close()
+
+    def test_workers_claim_distinct_slots(self):
+        leader, other = claim_slot(database.DB_FILE), claim_slot(database.DB_FILE)
+        self.assertEqual((leader.number, leader.leader, other.number, other.leader), (0, True, 1, False))
+        self.assertNotEqual(database.order_journal_path(leader.number), database.order_journal_path(other.number))
+        # A dead leader's slot goes to the next worker that starts
+        leader.release()
+        replacement = claim_slot(database.DB_FILE)
+        self.assertEqual(replacement.number, 0)
+        replacement.release()
+        other.release()
+
+    def test_concurrent_startup_migrates_once(self):
+        os.remove(database.DB_FILE)
+        connections = [database._connect(database.DB_FILE) for _ in range(4)]
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(database.init_db, connections))
+        for conn in connections:
+            conn.close()
+        self.assertEqual(database.credentials_version(), (0, 0))
+
+    def test_keys_saved_by_another_worker_replace_the_client(self):
+        replaced = []
+        with MockExchange() as exchange:
+            pool = AccountPool(base_url=exchange.url, on_replace=replaced.append)
+            database.save_account('sub1', 'key1', 'secret1')
+            first = pool.get('sub1')
+            self.assertIs(pool.get('sub1'), first)
+
+            self._other_process(database.SAVE_ACCOUNT_SQL, ('sub1', 'key2', 'secret2', 1, 'now'))
+            second = pool.get('sub1')
+            self.assertIsNot(second, first)
+            self.assertEqual(second.sync_client.api_key, 'key2')
+            self.assertTrue(first.sync_client._stop.is_set())
+
+            self._other_process(database.SAVE_SETTING_SQL, ('BINANCE_API_KEY', 'default-key'))
+            self.assertIs(pool.get('sub1'), second)
+            self.assertEqual(replaced, ['sub1'])
+            pool.close()
+
+    def test_change_feed_delivers_rows_written_by_any_connection(self):
+        delivered = []
+        feed = ChangeFeed(on_orders=delivered.append)
+        database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 1, 'price': 100},
+                           {'orderId': 7, 'status': 'NEW', 'executedQty': '0', 'avgPrice': '0'})
+        database.log_order({'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'LIMIT', 'quantity': 1, 'price': 200},
+                           {'orderId': 8, 'status': 'NEW', 'executedQty': '0', 'avgPrice': '0'})
+        self.assertEqual(feed.poll(), 2)
+        self.assertEqual(feed.poll(), 0)
+
+        self._other_process(database.UPDATE_ORDER_SQL, ('FILLED', 1.0, 100.0, 5, '7', 5))
+        self.assertEqual(feed.poll(), 1)
+        first, second = database.get_history()[::-1]
+        self.assertEqual(delivered, [[first['id'], second['id']], [first['id']]])
+        self.assertEqual(database.prune_order_events(1), 2)
+        self.assertEqual(database.get_order_events(0), [(3, first['id'])])
+
+class TestUserStream(unittest.TestCase):
+    FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'user_stream_events.jsonl')
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_patch = patch.object(database, 'DB_FILE', os.path.join(self.tmpdir.name, 'test.db'))
+        self.db_patch.start()
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        self.db_patch.stop()
+        self.tmpdir.cleanup()
+
+    def _order(self, order_id):
+        return database.get_connection().execute(
+            "SELECT status, executed_qty, avg_price FROM orders WHERE order_id = ?", (str(order_id),)).fetchone()
+
+    def test_replay_recorded_events(self):
+        database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.01, 'price': 60000},
+                           {'status': 'NEW', 'orderId': 1001, 'executedQty': '0'})
+        database.log_order({'symbol': 'ETHUSDT', 'side': 'SELL', 'type': 'LIMIT', 'quantity': 0.5, 'price': 4000},
+                           {'status': 'NEW', 'orderId': 1002, 'executedQty': '0'})
+        stream = UserDataStream(None)
+        replay(self.FIXTURE, stream)
+
+        # The late, out-of-order partial fill doesn't roll the filled order back
+        self.assertEqual(tuple(self._order(1001)), ('FILLED', 0.01, 59999.94))
+        self.assertEqual(self._order(1002)['status'], 'CANCELED')
+        # An order this bot never logged is held back briefly in case its insert is in flight
+        self.assertEqual(stream.status()['pending_updates'], 1)
+
+    def test_existing_orders_table_is_migrated(self):
+        database.close_connections()
+        path = os.path.join(self.tmpdir.name, 'old.db')
+        response = {'orderId': 42, 'status': 'NEW', 'clientOrderId': 'web_42', 'executedQty': '0.004',
+                    'avgPrice': '60000.5', 'stopPrice': '59000', 'updateTime': 1760000000000}
+        conn = database.sqlite3.connect(path)
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, symbol TEXT, "
+                     "side TEXT, type TEXT, quantity REAL, price REAL, status TEXT, order_id TEXT, details TEXT)")
+        conn.execute("INSERT INTO orders (timestamp, symbol, side, type, quantity, price, status, order_id, details) "
+                     "VALUES ('2026-01-01T00:00:00', 'BTCUSDT', 'BUY', 'STOP', 0.01, 60000, 'NEW', '42', ?)",
+                     (json.dumps(response),))
+        conn.commit()
+        conn.close()
+
+        with patch.object(database, 'DB_FILE', path):
+            database.init_db()
+            columns = {row[1] for row in database.get_connection().execute("PRAGMA table_info(orders)")}
+            order = database.get_orders([1])[0]
+            stored = database.get_order_response(1)
+            database.close_connections()
+
+        self.assertNotIn('details', columns)
+        self.assertEqual((order['client_order_id'], order['executed_qty'], order['avg_price'], order['stop_price'],
+                          order['update_time']), ('web_42', 0.004, 60000.5, 59000.0, 1760000000000))
+        self.assertEqual(stored, response)
+
+    def test_stream_tracks_orders_on_mock_exchange(self):
+        with MockExchange(user_stream=True) as exchange:
+            client = BinanceFuturesClient(testnet=True, api_key="k", api_secret="s", base_url=exchange.url)
+            stream = UserDataStream(client, ws_url=exchange.ws_url).start()
+            for _ in range(200):
+                if stream.connected:
+                    break
+                time.sleep(0.01)
+
+            response = client.place_order("BTCUSDT", "BUY", "LIMIT", 0.002, price=59000)
+            database.log_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': 0.002}, response)
+            client.cancel_order("BTCUSDT", order_id=response['orderId'])
+            for _ in range(300):
+                if self._order(response['orderId'])['status'] == 'CANCELED':
+                    break
+                time.sleep(0.01)
+
+            stream.stop()
+            client.close()
+
+        self.assertEqual(self._order(response['orderId'])['status'], 'CANCELED')
+        self.assertEqual(exchange.listen_keys, set())
+
+class TestServer(unittest.TestCase):
+    """
+    The HTTP endpoints, served by uvicorn in a thread (as benchmarks/load_orders.py runs the app)
+    against the mock exchange and a throwaway database. The server module can only be started once
+    per process, so the whole class shares one running server.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.exchange = MockExchange(user_stream=True).start()
+        cls.patches = [
+            patch.object(database, 'DB_FILE', os.path.join(cls.tmpdir.name, 'test.db')),
+            patch.dict(os.environ, {'BINANCE_FUTURES_URL': cls.exchange.url,
+                                    'BINANCE_FUTURES_WS_URL': cls.exchange.ws_url}),
+        ]
+        for p in cls.patches:
+            p.start()
+        database.init_db()
+        database.save_setting('BINANCE_API_KEY', 'test-key')
+        database.save_setting('BINANCE_API_SECRET', 'test-secret')
+
+        # Templates and static files are looked up relative to the working directory
+        cls.cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import server
+        cls.server = server
+        log_file = os.path.join(cls.tmpdir.name, 'server.log')
+        cls.patches.append(patch.object(server, 'setup_logging', lambda: logging_config.setup_logging(log_file)))
+        cls.patches[-1].start()
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        cls.uvicorn = uvicorn.Server(uvicorn.Config(server.app, host='127.0.0.1', port=port, log_level='warning'))
+        cls.thread = threading.Thread(target=cls.uvicorn.run, daemon=True)
+        cls.thread.start()
+        while not cls.uvicorn.started:
+            time.sleep(0.05)
+        cls.url = f"http://127.0.0.1:{port}"
+        cls.http = requests.Session()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.http.close()
+        cls.uvicorn.should_exit = True
+        cls.thread.join(10)
+        cls.exchange.stop()
+        close_clients()
+        database.close_connections()
+        os.chdir(cls.cwd)
+        for p in reversed(cls.patches):
+            p.stop()
+        cls.tmpdir.cleanup()
+
+    def _get(self, path, **kwargs):
+        return self.http.get(self.url + path, timeout=10, **kwargs)
+
+    def _post(self, path, **kwargs):
+        return self.http.post(self.url + path, timeout=10, **kwargs)
+
+    def _order(self, account=None, **fields):
+        form = dict({'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': '0.002'}, **fields)
+        if account:
+            form['account'] = account
+        return self._post('/order', data=form, headers={'Accept': 'application/json'})
+
+    def _wait(self, predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while True:
+            result = predicate()
+            if result or time.monotonic() > deadline:
+                return result
+            time.sleep(0.02)
+
+    def _log(self, account, count, symbol='ETHUSDT', side='BUY'):
+        return [database.log_order({'symbol': symbol, 'side': side, 'type': 'MARKET', 'quantity': 1, 'account': account},
+                                   {'orderId': f"{account}-{n}", 'status': 'FILLED', 'executedQty': '1',
+                                    'avgPrice': str(2000 + n)}) for n in range(count)]
+
+    def test_order_replies_json_or_page(self):
+        from bot.metrics import STAGE_SECONDS
+        before = STAGE_SECONDS.labels("client").snapshot()['count']
+        reply = self._order()
+        self.assertEqual(reply.status_code, 200)
+        self.assertRegex(reply.json()['success'], r'^Order FILLED! ID: \d+$')
+        self.assertEqual(STAGE_SECONDS.labels("client").snapshot()['count'], before + 1)
+
+        page = self._post('/order', data={'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': '0.002'})
+        self.assertEqual(page.status_code, 200)
+        self.assertIn('text/html', page.headers['content-type'])
+        self.assertIn('Order FILLED!', page.text)
+
+        rejected = self._order(order_type='STOP_MARKET')
+        self.assertEqual(rejected.status_code, 400)
+        self.assertIn('Stop Price is required', rejected.json()['error'])
+        rejected = self._order(quantity='0.0001')
+        self.assertEqual(rejected.status_code, 400)
+        self.assertIn('Order rejected', rejected.json()['error'])
+
+    def test_client_lease_runs_off_the_event_loop(self):
+        # A settings save holds the settings lock; the version check must not block the loop behind it
+        threads = []
+        version = self.server.accounts.version
+
+        def record():
+            threads.append(threading.current_thread())
+            return version()
+
+        with patch.object(self.server.accounts, 'version', record):
+            self.assertEqual(self._order().status_code, 200)
+            reply = self._post('/orders/batch', json={'orders': [{'symbol': 'BTCUSDT', 'side': 'BUY',
+                                                                  'order_type': 'MARKET', 'quantity': 0.002}]})
+            self.assertEqual(reply.json()['placed'], 1)
+        self.assertTrue(threads)
+        self.assertNotIn(self.thread, threads)
+
+    def test_stop_market_order_is_logged_under_its_algo_id(self):
+        self.exchange.set_price('ETHUSDT', 3000)
+        reply = self._order(symbol='ETHUSDT', side='SELL', order_type='STOP_MARKET', quantity='0.01', stop_price='2900')
+        self.assertEqual(reply.status_code, 200)
+        status, algo_id = re.fullmatch(r'Order (\w+)! ID: (\d+)', reply.json()['success']).groups()
+        self.assertEqual(status, 'NEW')
+
+        def logged():
+            return next((o for o in self._get('/history', params={'limit': 50}).json()['orders']
+                         if o['order_id'] == algo_id), None)
+
+        row = self._wait(logged)
+        self.assertEqual((row['symbol'], row['status'], row['stop_price']), ('ETHUSDT', 'NEW', 2900.0))
+        self.assertTrue(row['client_order_id'].startswith('tb-'))
+
+        # The fill arrives on the user stream and lands on the same row
+        self.exchange.set_price('ETHUSDT', 2850)
+        self.assertTrue(self._wait(lambda: logged()['status'] == 'FILLED'))
+
+    def test_history_pages_follow_the_cursor(self):
+        ids = self._log('cursor', 5)
+        first = self._get('/history', params={'account': 'cursor', 'limit': 2}).json()
+        self.assertEqual([o['id'] for o in first['orders']], ids[:2:-1])
+        second = self._get('/history', params={'account': 'cursor', 'limit': 2,
+                                                'before_id': first['next_cursor']}).json()
+        self.assertEqual([o['id'] for o in second['orders']], ids[2:0:-1])
+        last = self._get('/history', params={'account': 'cursor', 'limit': 2,
+                                              'before_id': second['next_cursor']}).json()
+        self.assertEqual(([o['id'] for o in last['orders']], last['next_cursor']), ([ids[0]], None))
+
+    def test_events_stream_pushes_new_orders(self):
+        with self._get('/events', stream=True) as stream:
+            lines = stream.iter_lines(decode_unicode=True)
+            # The subscription exists once the first line arrives
+            self.assertEqual(next(lines), 'retry: 3000')
+            order_id = str(self._order().json()['success'].rsplit(' ', 1)[1])
+            event = None
+            for line in lines:
+                if line.startswith('data: '):
+                    event = json.loads(line[6:])
+                    if event['type'] == 'orders' and any(o['order_id'] == order_id for o in event['orders']):
+                        break
+        self.assertEqual(event['type'], 'orders')
+        self.assertEqual(stream.headers['content-type'].split(';')[0], 'text/event-stream')
+
+    def test_batch_orders_and_order_detail(self):
+        orders = [{'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': 0.002},
+                  {'symbol': 'BTCUSDT', 'side': 'BUY', 'order_type': 'MARKET', 'quantity': 0.0001}]
+        reply = self._post('/orders/batch', json={'orders': orders, 'account': 'default'}).json()
+        self.assertEqual((reply['placed'], reply['failed']), (1, 1))
+        self.assertEqual(self._post('/orders/batch', json={'orders': []}).status_code, 400)
+
+        order_id = str(next(r['response']['orderId'] for r in reply['results'] if 'response' in r))
+        row = self._wait(lambda: next((o for o in self._get('/history', params={'limit': 50}).json()['orders']
+                                       if o['order_id'] == order_id), None))
+        detail = self._get(f"/orders/{row['id']}").json()
+        self.assertEqual((detail['order_id'], str(detail['response']['orderId'])), (order_id, order_id))
+        self.assertEqual(self._get('/orders/999999').status_code, 404)
+
+    def test_export_and_summary_by_account(self):
+        self._log('export', 3)
+        self._log('other', 2)
+        lines = self._get('/history/export', params={'format': 'csv', 'account': 'export'}).text.splitlines()
+        self.assertEqual(lines[0].split(','), list(database.HISTORY_COLUMNS))
+        self.assertEqual(len(lines), 4)
+        rows = [json.loads(line) for line in
+                self._get('/history/export', params={'format': 'jsonl', 'account': 'other'}).text.splitlines()]
+        self.assertEqual({row['account'] for row in rows}, {'other'})
+        self.assertEqual(self._get('/history/export', params={'format': 'xlsx'}).status_code, 400)
+
+        [summary] = self._get('/history/summary', params={'account': 'export'}).json()['summary']
+        self.assertEqual((summary['symbol'], summary['orders'], summary['volume']), ('ETHUSDT', 3, 3.0))
+
+    def test_accounts_and_order_fan_out(self):
+        for name in ('fan1', 'fan2'):
+            reply = self._post('/accounts', json={'name': name, 'api_key': f"key-{name}", 'api_secret': 'secret'})
+            self.assertEqual(reply.status_code, 200)
+        self.assertEqual(self._post('/accounts', json={'name': 'default', 'api_key': 'k', 'api_secret': 's'}).status_code, 400)
+        self.assertTrue({'fan1', 'fan2'} <= {a['name'] for a in self._get('/accounts').json()['accounts']})
+
+        reply = self._order(account='fan1,fan2').json()
+        self.assertEqual((reply['placed'], reply['failed']), (2, 0))
+        reply = self._order(account='fan1,missing').json()
+        self.assertEqual((reply['placed'], reply['failed']), (1, 1))
+        self.assertIn('missing', reply['error'])
+        self.assertEqual(self._order(account='missing').status_code, 400)
+        self.assertTrue(self._wait(lambda: len(self._get('/history', params={'account': 'fan1'}).json()['orders']) == 2))
+
+        self.assertEqual(self.http.delete(self.url + '/accounts/fan2', timeout=10).status_code, 200)
+        self.assertEqual(self.http.delete(self.url + '/accounts/fan2', timeout=10).status_code, 404)
+
+    def test_positions(self):
+        self._log('pos', 2, symbol='BTCUSDT')
+        self._log('pos', 1, symbol='BTCUSDT', side='SELL')
+        reply = self._get('/positions', params={'account': 'pos'}).json()
+        [position] = reply['positions']
+        self.assertEqual((position['symbol'], position['net_qty'], position['avg_entry']), ('BTCUSDT', 1.0, 2000.5))
+        self.assertEqual(position['realized_pnl'], -0.5)
+        self.assertGreaterEqual(reply['last_fill_id'], 3)
+
+    def test_status_and_metrics(self):
+        status = self._get('/status').json()
+        self.assertEqual((status['worker']['slot'], status['worker']['leader']), (0, True))
+        self.assertIn('committed', status['order_log'])
+        self.assertIn('healthy', status['exchange'])
+        self.assertIn('buckets', self._get('/rate-limits').json())
+
+        self._order()
+        metrics = self._get('/metrics')
+        self.assertTrue(metrics.headers['content-type'].startswith('text/plain'))
+        for stage in ('client', 'validate', 'rate_limit', 'exchange', 'db_log'):
+            self.assertIn(f'trading_bot_stage_seconds_count{{stage="{stage}"}}', metrics.text)
+        self.assertIn('trading_bot_order_log_committed', metrics.text)
+        self.assertIn('route="/order"', metrics.text)
+
+    def test_triggers(self):
+        added = self._post('/triggers', json={'kind': 'STOP', 'symbol': 'btcusdt', 'side': 'SELL',
+                                               'quantity': 0.002, 'trigger_price': 59000})
+        self.assertEqual(added.status_code, 200)
+        [stop] = added.json()['triggers']
+        self.assertEqual((stop['symbol'], stop['status']), ('BTCUSDT', 'PENDING'))
+        oco = self._post('/triggers', json={'kind': 'OCO', 'symbol': 'BTCUSDT', 'side': 'SELL', 'quantity': 0.002,
+                                             'take_profit': 70000, 'stop_price': 50000}).json()['triggers']
+        self.assertEqual(len(oco), 2)
+        self.assertEqual(self._post('/triggers', json={'kind': 'TRAILING_STOP', 'symbol': 'BTCUSDT', 'side': 'SELL',
+                                                        'quantity': 0.002}).status_code, 400)
+        self.assertEqual(self._post('/triggers', json={'kind': 'NOPE', 'symbol': 'BTCUSDT', 'side': 'SELL',
+                                                        'quantity': 0.002}).status_code, 400)
+
+        pending = {t['id'] for t in self._get('/triggers', params={'symbol': 'BTCUSDT'}).json()['triggers']}
+        self.assertEqual(pending, {stop['id'], oco[0]['id'], oco[1]['id']})
+        # Cancelling one OCO leg cancels both
+        self.assertEqual(self.http.delete(f"{self.url}/triggers/{oco[0]['id']}", timeout=10).status_code, 200)
+        self.assertEqual(self.http.delete(f"{self.url}/triggers/{oco[1]['id']}", timeout=10).status_code, 404)
+
+        # The stop fires through the price stream and its MARKET order is logged
+        self.assertTrue(self._wait(lambda: self._get('/triggers').json()['stream']['subscribed']))
+        self.exchange.set_price('BTCUSDT', 60000)
+        self.exchange.set_price('BTCUSDT', 58500)
+        self.assertTrue(self._wait(lambda: not self._get('/triggers').json()['triggers']))
+        self.assertTrue(self._wait(lambda: self.server.trigger_engine.get(stop['id'])['status'] == 'PLACED'))
+
 if __name__ == '__main__':
     unittest.main()